@@ -1,24 +1,27 @@
 # alfred.py — Interface Streamlit Alfred v2.4 (stable, épuré)
 # - Sidebar : compteur + bouton "Gérer les souvenirs"
 # - Panneau de gestion des souvenirs
-# - Routeur intact (Drive & co)
-# - Fallback LLM enrichi par la mémoire
+# - Dispatch par manifest (skills/manifest.json) : mémoire -> email -> Drive, briques importées à la demande
+# - Fallback LLM enrichi par la mémoire, préparé en parallèle du dispatch (pipeline_tour.py)
+# - Logique d'un tour : moteur headless (moteur_alfred.AlfredEngine) sur st.session_state
 # - Intégration email : délégue tout à gestionemails.py (intention + UI persistante)
 
 import os
-import re
 import datetime
 import streamlit as st
 
-from router import router
-from lecturefichiersbase import lire_fichier
-from llm import set_runtime_model, get_model
-
-# --- Brique email (UNIQUEMENT les points d’entrée) ---
-from gestionemails import (
-    email_flow_persist,
-    maybe_bootstrap_email,
-    is_email_intent,
+from moteur_alfred import AlfredEngine
+from mesures_llm import stats_by_site
+import cache_semantique
+from llm import (
+    set_runtime_model,
+    get_model,
+    set_route_override,
+    MODEL_ROUTES,
+    PURPOSE_INTENT,
+    PURPOSE_EMAIL,
+    PURPOSE_RESUME,
+    PURPOSE_REPONSE,
 )
 
 # --- Mémoire ---
@@ -26,9 +29,7 @@ from memoire_alfred import (
     list_memories,
     vote_memory_item,
     confirm_delete,
-    try_handle_memory_command,
     find_memory_match,
-    answer_with_memories,
 )
 
 # --------------------------- Config page ---------------------------
@@ -70,40 +71,6 @@ def _get_password():
     except Exception:
         return ""
 
-def _render_mem_list(items):
-    if not items:
-        return "_Aucun souvenir._"
-    lines = []
-    for it in items:
-        if isinstance(it, dict):
-            d = it.get("date") or ""
-            txt = it.get("texte") or ""
-            lines.append(f"- **[{d}]** {txt}" if d else f"- {txt}")
-        else:
-            lines.append(f"- {str(it)}")
-    return "\n".join(lines)
-
-def _preprocess_delete_command(raw: str) -> str | None:
-    if not raw:
-        return None
-    s = raw.strip()
-    low = s.lower()
-    if low.startswith(("supprime", "oublie", "efface")):
-        mentions_memory = any(k in low for k in ["souvenir", "souvenirs", "mémoire", "memoire"])
-        verb = low.split()[0]
-        cleaned = re.sub(r"\b(le|la|les|un|une)\s+souvenir(s)?\b", "souvenir", low)
-        cleaned = re.sub(r"\b(le|la|les|un|une)\s+mémoire\b", "mémoire", cleaned)
-        if ("souvenir" not in cleaned) and mentions_memory:
-            parts = s.split(" ", 1)
-            payload = parts[1] if len(parts) > 1 else ""
-            cleaned = f"{verb} souvenir {payload}".strip()
-        if not any(k in cleaned for k in ["souvenir", "mémoire", "memoire"]):
-            return None
-        cleaned = re.sub(r"\b(souvenir|mémoire|memoire)\s+(que|qui|de|du|des)\s+", r"\1 ", cleaned)
-        cleaned = re.sub(r"\s{2,}", " ", cleaned).strip()
-        return cleaned
-    return None
-
 # --------------------------- Auth simple (optionnel) ---------------------------
 APP_PASSWORD = _get_password()
 if APP_PASSWORD:
@@ -129,6 +96,49 @@ with st.sidebar:
     model_choice = st.selectbox("Sélection du modèle", options=options, index=idx, help="Change à chaud le modèle de raisonnement")
     set_runtime_model(model_choice)
 
+    # Routage par usage : parsing d'intention / emails / résumés sur un modèle rapide
+    with st.expander("Routage par usage"):
+        labels = {
+            PURPOSE_INTENT: "Analyse d’intention",
+            PURPOSE_EMAIL: "Rédaction d’emails",
+            PURPOSE_RESUME: "Résumés",
+            PURPOSE_REPONSE: "Réponses",
+        }
+        for purpose, label in labels.items():
+            defaut = MODEL_ROUTES[purpose]
+            default_model = defaut.get("model") or "(modèle global)"
+            route_opts = ["(défaut)"] + options
+            choice = st.selectbox(
+                label, options=route_opts, index=0, key=f"route_{purpose}",
+                help=f"Défaut : {default_model}",
+            )
+            # 0 = valeur par défaut de la route (MODEL_ROUTES)
+            col_tokens, col_timeout = st.columns(2)
+            max_tokens = col_tokens.number_input(
+                "Tokens max", min_value=0, value=0, step=500, key=f"route_{purpose}_tokens",
+                help=f"0 = défaut ({defaut.get('max_tokens') or 'sans plafond'})",
+            )
+            timeout = col_timeout.number_input(
+                "Timeout (s)", min_value=0, value=0, step=10, key=f"route_{purpose}_timeout",
+                help=f"0 = défaut ({defaut.get('timeout')} s)",
+            )
+            set_route_override(
+                purpose,
+                model=None if choice == "(défaut)" else choice,
+                max_tokens=int(max_tokens) or None,
+                timeout=float(timeout) or None,
+            )
+
+    # Cache sémantique (opt-in) : questions récurrentes servies sans appel LLM
+    sem_on = st.toggle(
+        "Cache sémantique des réponses", value=cache_semantique.is_enabled(),
+        help="Ressert une réponse passée à une question quasi identique si les souvenirs utilisés n’ont pas changé.",
+    )
+    cache_semantique.set_enabled(sem_on)
+
+# --------------------------- Moteur (l'historique reste tenu par l'UI) ---------------------------
+ENGINE = AlfredEngine(k=7, historiser=False)
+
 # --------------------------- States divers ---------------------------
 st.session_state.setdefault("messages", [])
 st.session_state.setdefault("pending_delete", None)
@@ -192,6 +202,54 @@ with st.sidebar:
         _push_history("assistant", "🔎 J’ouvre le panneau de gestion des souvenirs.", "info")
         st.rerun()
 
+# --------------------------- Sidebar Mesures LLM ---------------------------
+def _render_llm_stats_panel():
+    stats = stats_by_site()
+    if not stats:
+        st.caption("Aucun appel LLM enregistré pour l’instant.")
+        return
+    rows = []
+    for site, s in sorted(stats.items()):
+        rows.append({
+            "site": site,
+            "appels": s["calls"],
+            "p50 (s)": s["p50_s"],
+            "p95 (s)": s["p95_s"],
+            "1er token p50 (s)": s["ttft_p50_s"],
+            "tokens in": s["prompt_tokens"],
+            "dont cache": s["cached_tokens"],
+            "% cache": round(100 * s["cached_ratio"]),
+            "tokens out": s["completion_tokens"],
+            "coût ($)": s["cost_usd"],
+        })
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+    total_cost = sum(s["cost_usd"] for s in stats.values())
+    st.caption(f"Coût estimé total : {total_cost:.4f} $")
+
+with st.sidebar:
+    with st.expander("📊 Mesures LLM"):
+        _render_llm_stats_panel()
+
+def _render_quota_google_panel():
+    from quota_google import compteurs
+    rows = [
+        {
+            "API": api,
+            "requêtes": c["requetes"],
+            "limitées": c["limitees"],
+            "attente (s)": c["attente_s"],
+            "refus quota": c["refus_quota"],
+            "reprises": c["reprises"],
+            "échecs": c["echecs"],
+        }
+        for api, c in compteurs().items()
+    ]
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+
+with st.sidebar:
+    with st.expander("🚦 Quotas Google"):
+        _render_quota_google_panel()
+
 # --------------------------- Panneau gestion souvenirs (zone principale) ---------------------------
 def _render_mem_management_panel():
     st.markdown("## 🧠 Gestion des souvenirs")
@@ -244,9 +302,11 @@ with st.container():
     with cols[1]:
         uploaded_file = st.file_uploader("Joindre (optionnel)", type=None, label_visibility="collapsed")
 
-# ======= PERSISTENCE UI EMAIL : déléguée à la brique métier =======
-if email_flow_persist(_push_history=_push_history):
-    st.stop()
+# ======= PERSISTENCE UI EMAIL : déléguée à la brique métier (importée seulement si un email est en cours) =======
+if st.session_state.get("email_ctx") is not None or st.session_state.get("email_result") is not None:
+    from gestionemails import email_flow_persist
+    if email_flow_persist(_push_history=_push_history):
+        st.stop()
 
 # --------------------------- Prompt utilisateur ---------------------------
 prompt = st.chat_input("Parle à Alfred...")
@@ -262,67 +322,36 @@ if prompt:
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Pré-traitement suppression par texte
-    pre = _preprocess_delete_command(prompt)
-    prompt_for_memory = pre if (pre and pre != prompt) else prompt
-
-    # Commandes mémoire (NLU)
-    result = try_handle_memory_command(prompt_for_memory)
-    handled = False; mem_resp = None; mem_subtype = None; pending_payload = None
-    if isinstance(result, tuple):
-        if   len(result) == 4: handled, mem_resp, mem_subtype, pending_payload = result
-        elif len(result) == 3: handled, mem_resp, mem_subtype = result
-        elif len(result) == 2: handled, mem_resp = result
-
-    if handled:
-        if isinstance(mem_resp, dict) and mem_resp.get("_type") == "confirm_delete":
-            txt_preview = mem_resp.get("item", {}).get("texte", "") or mem_resp.get("texte", "")
-            _push_history("assistant", f"⚠️ Tu me demandes d’effacer ce souvenir : “{txt_preview}”.", "warning")
-            st.session_state["pending_delete"] = mem_resp
-            st.rerun()
-
-        if isinstance(mem_resp, list):
-            mem_resp = _render_mem_list(mem_resp)
-            if mem_subtype is None: mem_subtype = "info"
-
-        if pending_payload:
-            txt_preview = pending_payload.get("item", {}).get("texte", "") or pending_payload.get("texte", "")
-            _push_history("assistant", f"⚠️ Tu me demandes d’effacer ce souvenir : “{txt_preview}”.", "warning")
-            st.session_state["pending_delete"] = pending_payload
-            st.rerun()
-
-        _push_history("assistant", mem_resp, mem_subtype or "info")
-        with st.chat_message("assistant"):
-            if (mem_subtype or "info") == "info": st.info(mem_resp)
-            elif mem_subtype == "success":        st.success(mem_resp)
-            elif mem_subtype == "warning":        st.warning(mem_resp)
-            elif mem_subtype == "error":          st.error(mem_resp)
-            else:                                  st.markdown(mem_resp)
-
-    # ======= Intention email : on bootstrap et on laisse la brique afficher l'UI =======
-    if is_email_intent(prompt):
-        maybe_bootstrap_email(prompt)   # crée le contexte et relance la page
-        st.stop()
+    # Fichier joint : son contenu n'enrichit que la réponse LLM (pas le routage) ;
+    # lu seulement si le tour finit en réponse LLM (une brique qui prend le prompt n'en a pas besoin)
+    prompt_final = None
+    if uploaded_file is not None:
+        def prompt_final():
+            from lecturefichiersbase import lire_fichier
+            return f"{prompt}\n\nVoici le contenu du fichier :\n{lire_fichier(uploaded_file)}"
+
+    # ------------------- Tour : dispatch des briques ∥ mémoire (∥ réponse LLM spéculative) -------------------
+    # Pièce jointe accessible aux briques (« enregistre la pièce jointe dans le dossier X »)
+    st.session_state["piece_jointe"] = uploaded_file
+    # Les briques longues (résumé de dossier…) affichent leur avancement ici
+    zone_progression = st.empty()
+    st.session_state["progression"] = zone_progression.caption
+    try:
+        reponse = ENGINE.handle(prompt, st.session_state, prompt_reponse=prompt_final, use_cache=uploaded_file is None)
+    finally:
+        st.session_state.pop("progression", None)
+        zone_progression.empty()
 
-    # ------------------- Routeur (Drive & co) -------------------
-    reponse = router(prompt)
+    if reponse.kind == "confirm_delete":
+        _push_history("assistant", reponse.content, "warning")
+        st.rerun()   # pending_delete est posé par le moteur : la bannière prend le relais
 
-    # ------------------- Fallback LLM enrichi par la mémoire -------------------
-    if reponse is None:
-        if uploaded_file is not None:
-            contenu = lire_fichier(uploaded_file)
-            prompt_final = f"{prompt}\n\nVoici le contenu du fichier :\n{contenu}"
-        else:
-            prompt_final = prompt
-        text = answer_with_memories(prompt_final, k=7)
-        reponse = {"content": text, "subtype": None}
+    # ======= Intention email : le contexte est créé, la brique affiche l'UI =======
+    if reponse.kind == "email_draft":
+        st.rerun()   # relance la page : email_flow_persist affiche le brouillon
 
     # ------------------- Affichage final -------------------
-    if isinstance(reponse, dict):
-        content = reponse.get("content", "")
-        subtype = reponse.get("subtype")
-    else:
-        content = str(reponse); subtype = None
+    content, subtype = reponse.content, reponse.subtype
 
     _push_history("assistant", content, subtype)
     with st.chat_message("assistant"):
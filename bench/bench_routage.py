@@ -0,0 +1,231 @@
+# bench/bench_routage.py — Banc de mesure du routage des intentions (latence par étape, appels LLM, exactitude)
+#
+# Rejoue un corpus étiqueté d'énoncés français à travers la chaîne de routage réelle :
+#   dispatch (skills/registry) -> mémoire (préprocess + try_handle_memory_command)
+#   -> email (is_email_intent) -> Drive (analyser_prompt_drive)
+# Par défaut HORS LIGNE : le LLM est remplacé par les réponses "llm" du corpus (replay)
+# et la mémoire travaille sur un bac à sable en RAM (aucune écriture Drive/disque).
+# Un énoncé peut aussi attendre "speculable" : réponse LLM lancée ou non en spéculatif (pipeline_tour).
+#
+# Usage :
+#   python bench/bench_routage.py                      # replay hors ligne
+#   python bench/bench_routage.py --live               # vrais appels LLM (coûte des tokens)
+#   python bench/bench_routage.py --json rapport.json  # rapport machine-lisible
+#   python bench/bench_routage.py --repeat 20          # plus d'itérations pour des latences stables
+
+from __future__ import annotations
+import os, sys, json, time, argparse, statistics
+from typing import Dict, Any, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus_routage.jsonl")
+SLOTS = ("action", "type", "nom", "parent", "index")
+
+# Mémoire de départ du bac à sable (pour les commandes rappel / suppression)
+_FIXTURE_MEMOIRE = {
+    "souvenirs": [
+        {"date": "2025-10-01 10:00:00", "texte": "Mon code portail est 4589", "importance": 0.0, "fb": 0.0},
+        {"date": "2025-10-02 10:00:00", "texte": "Mon numéro client EDF est 123456789", "importance": 0.0, "fb": 0.0},
+    ],
+    "souvenirs_par_categorie": {
+        "travail": [{"date": "2025-10-03 09:00:00", "texte": "Réunion d'équipe le lundi à 9h", "importance": 0.0, "fb": 0.0}],
+    },
+}
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(l) for l in f if l.strip()]
+
+# ====================== Bac à sable ======================
+class _LLMReplay:
+    """Remplace llm._create_chat_completion : compte les appels, renvoie la réponse rejouée."""
+    def __init__(self):
+        self.calls = 0
+        self.reply: Optional[Dict[str, Any]] = None
+
+    def __call__(self, messages, *args, **kwargs) -> str:
+        self.calls += 1
+        return json.dumps(self.reply if self.reply is not None else {"action": "fallback"}, ensure_ascii=False)
+
+class _LLMCounter:
+    """Mode --live : laisse passer l'appel réel en le comptant."""
+    def __init__(self, real):
+        self.real = real
+        self.calls = 0
+        self.reply = None
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.real(*args, **kwargs)
+
+def _install_sandbox(live: bool):
+    if not live:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-bench-offline")  # OpenAI() exige une clé à l'import
+    import llm
+    import memoire_alfred
+
+    stub = _LLMCounter(llm._create_chat_completion) if live else _LLMReplay()
+    llm._create_chat_completion = stub
+    llm.embed_texts = lambda *a, **k: None
+
+    memoire_alfred.save_memory = lambda data=None: None
+    memoire_alfred.log_event = lambda message: None
+    memoire_alfred._memory_ram = memoire_alfred._ensure_schema(json.loads(json.dumps(_FIXTURE_MEMOIRE)))
+    return stub
+
+def _email_intent_fn():
+    try:
+        from gestionemails import is_email_intent
+        return is_email_intent
+    except Exception:
+        # gestionemails exige les bibliothèques Google : mêmes déclencheurs, lus dans le manifest
+        from skills.registry import triggers
+        declencheurs = triggers("email")
+        return lambda text: any(t in (text or "").lower() for t in declencheurs)
+
+# ====================== Exécution ======================
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - t0) * 1e6  # µs
+
+def route_one(texte: str, stages: Dict[str, Any]) -> Dict[str, Any]:
+    """Rejoue la chaîne de dispatch sur un énoncé ; renvoie prédiction + latences par étape."""
+    timings: Dict[str, float] = {}
+    candidates, timings["dispatch"] = _timed(stages["candidates"], texte)
+    predicted: Dict[str, Any] = {"skill": "llm"}
+
+    for skill in candidates:
+        if skill == "memoire":
+            pre, t_pre = _timed(stages["preprocess"], texte)
+            timings["preprocess"] = t_pre
+            prompt_mem = pre if (pre and pre != texte) else texte
+            res, timings["memoire"] = _timed(stages["memoire"], prompt_mem)
+            if isinstance(res, tuple) and res and res[0]:
+                predicted = {"skill": "memoire"}
+                break
+        elif skill == "email":
+            ok, timings["email"] = _timed(stages["email"], texte)
+            if ok:
+                predicted = {"skill": "email"}
+                break
+        elif skill == "drive":
+            intent, timings["drive"] = _timed(stages["drive"], texte)
+            if isinstance(intent, dict) and intent.get("action") not in (None, "fallback"):
+                predicted = {"skill": "drive", **{k: intent.get(k) for k in SLOTS if intent.get(k) is not None}}
+                break
+    return {"predicted": predicted, "timings": timings}
+
+def _match(expected: Dict[str, Any], predicted: Dict[str, Any]) -> bool:
+    for k, v in expected.items():
+        pv = predicted.get(k)
+        if isinstance(v, str) and isinstance(pv, str):
+            if v.strip().lower() != pv.strip().lower():
+                return False
+        elif v != pv:
+            return False
+    return True
+
+def run(corpus: List[Dict[str, Any]], live: bool = False, repeat: int = 5) -> Dict[str, Any]:
+    stub = _install_sandbox(live)
+    from skills.registry import candidate_skills
+    from skills.memoire import preprocess_delete_command
+    from memoire_alfred import try_handle_memory_command
+    from interpreteur import analyser_prompt_drive
+    from pipeline_tour import _reponse_speculable
+
+    stages = {
+        "candidates": candidate_skills,
+        "preprocess": preprocess_delete_command,
+        "memoire": try_handle_memory_command,
+        "email": _email_intent_fn(),
+        "drive": analyser_prompt_drive,
+    }
+
+    per_stage: Dict[str, List[float]] = {}
+    rows = []
+    for entry in corpus:
+        texte = entry["texte"]
+        stub.reply = entry.get("llm")
+        calls_before = stub.calls
+        result = None
+        for _ in range(max(1, repeat)):
+            result = route_one(texte, stages)
+            for stage, us in result["timings"].items():
+                per_stage.setdefault(stage, []).append(us)
+        llm_calls = (stub.calls - calls_before) / max(1, repeat)
+        if "speculable" in entry["attendu"]:
+            result["predicted"]["speculable"] = _reponse_speculable(texte)
+        ok = _match(entry["attendu"], result["predicted"])
+        rows.append({
+            "texte": texte,
+            "attendu": entry["attendu"],
+            "predit": result["predicted"],
+            "ok": ok,
+            "llm_calls": llm_calls,
+            "total_us": round(sum(result["timings"].values()), 1),
+        })
+
+    by_skill: Dict[str, List[bool]] = {}
+    for r in rows:
+        by_skill.setdefault(r["attendu"]["skill"], []).append(r["ok"])
+
+    def _pct(vals, q):
+        vals = sorted(vals)
+        return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))] if vals else 0.0
+
+    return {
+        "mode": "live" if live else "replay",
+        "utterances": len(rows),
+        "accuracy": round(sum(r["ok"] for r in rows) / max(1, len(rows)), 4),
+        "accuracy_by_skill": {k: round(sum(v) / len(v), 4) for k, v in sorted(by_skill.items())},
+        "llm_calls_per_utterance": round(sum(r["llm_calls"] for r in rows) / max(1, len(rows)), 3),
+        "llm_calls_by_skill": {
+            k: round(sum(r["llm_calls"] for r in rows if r["attendu"]["skill"] == k) / len(v), 3)
+            for k, v in sorted(by_skill.items())
+        },
+        "stage_latency_us": {
+            s: {"n": len(v), "p50": round(_pct(v, 0.5), 1), "p95": round(_pct(v, 0.95), 1), "mean": round(statistics.mean(v), 1)}
+            for s, v in per_stage.items()
+        },
+        "errors": [r for r in rows if not r["ok"]],
+        "rows": rows,
+    }
+
+def print_report(rep: Dict[str, Any]) -> None:
+    print(f"== Banc de routage ({rep['mode']}) — {rep['utterances']} énoncés ==")
+    print(f"Exactitude globale : {rep['accuracy']:.1%}")
+    for skill, acc in rep["accuracy_by_skill"].items():
+        print(f"  - {skill:<8} {acc:.1%}  (appels LLM / énoncé : {rep['llm_calls_by_skill'][skill]})")
+    print(f"Appels LLM / énoncé : {rep['llm_calls_per_utterance']}")
+    print("Latence par étape (µs, hors LLM en replay) :")
+    for stage, s in rep["stage_latency_us"].items():
+        print(f"  - {stage:<10} n={s['n']:<5} p50={s['p50']:<10} p95={s['p95']:<10} moy={s['mean']}")
+    if rep["errors"]:
+        print("Erreurs :")
+        for r in rep["errors"]:
+            print(f"  ✗ {r['texte']!r}\n      attendu={r['attendu']}\n      prédit ={r['predit']}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Banc de mesure du routage des intentions Alfred")
+    ap.add_argument("--corpus", default=CORPUS_PATH)
+    ap.add_argument("--live", action="store_true", help="appels LLM réels au lieu du replay")
+    ap.add_argument("--repeat", type=int, default=5, help="itérations par énoncé (latences)")
+    ap.add_argument("--json", help="écrit le rapport complet dans ce fichier")
+    ap.add_argument("--min-accuracy", type=float, default=None, help="code retour 1 si l'exactitude est inférieure")
+    args = ap.parse_args(argv)
+
+    rep = run(load_corpus(args.corpus), live=args.live, repeat=1 if args.live else args.repeat)
+    print_report(rep)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rep, f, ensure_ascii=False, indent=2)
+    if args.min_accuracy is not None and rep["accuracy"] < args.min_accuracy:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
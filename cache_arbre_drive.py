@@ -0,0 +1,290 @@
+# cache_arbre_drive.py — Cache local des métadonnées de l'arbre Drive (sous FOLDER_ID)
+# - Construit une fois (parcours complet), puis tenu à jour via changes.list : seuls les deltas
+#   passent par le réseau (jeton de page conservé entre deux synchronisations).
+# - Index nom -> ids et chemin -> id : résolution de dossier et recherche deviennent des
+#   opérations en mémoire.
+# - Les mutations faites par Alfred (création, corbeille) sont répercutées localement tout de suite.
+
+from __future__ import annotations
+import os, time, threading
+from typing import Callable, Dict, Any, List, Optional, Iterator, Iterable, Set
+
+from quota_google import executer
+
+MIME_DOSSIER = "application/vnd.google-apps.folder"
+CHAMPS_NOEUD = "id,name,mimeType,parents,size,modifiedTime,md5Checksum,trashed"
+
+# Délai minimal entre deux appels changes.list (les lectures rapprochées restent 100 % locales)
+SYNC_INTERVAL_S = float(os.getenv("ALFRED_DRIVE_SYNC_S", "30"))
+
+def _norm(nom: str) -> str:
+    return (nom or "").strip().lower()
+
+class ArbreDrive:
+    """Miroir en mémoire de l'arbre sous root_id : id, name, mimeType, parents, size, modifiedTime, md5Checksum."""
+
+    def __init__(
+        self,
+        service,
+        root_id: str,
+        sync_interval: float = SYNC_INTERVAL_S,
+        parcourir: Optional[Callable[[str], Iterable[Dict[str, Any]]]] = None,
+    ):
+        """
+        service : client Drive, ou fonction sans argument qui le fournit (construction paresseuse).
+        parcourir(root_id) : descendance complète, chaque parent avant ses enfants (ex. parcours par niveaux).
+        """
+        self._service = service
+        self.root_id = root_id
+        self.parcourir = parcourir
+        self.sync_interval = sync_interval
+        self._noeuds: Dict[str, Dict[str, Any]] = {}
+        self._enfants: Dict[str, Set[str]] = {}
+        self._par_nom: Dict[str, Set[str]] = {}
+        self._par_chemin: Optional[Dict[str, str]] = None   # reconstruit paresseusement après mutation
+        self._page_token: Optional[str] = None
+        self._derniere_sync = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def service(self):
+        return self._service() if callable(self._service) else self._service
+
+    # ====================== Construction / synchronisation ======================
+    @property
+    def construit(self) -> bool:
+        return self._page_token is not None
+
+    def ensure_fresh(self, force: bool = False) -> None:
+        """Construit l'arbre au premier appel, puis applique les deltas au plus toutes les sync_interval s."""
+        with self._lock:
+            if not self.construit:
+                self.construire()
+            elif force or time.time() - self._derniere_sync >= self.sync_interval:
+                self.synchroniser()
+
+    def _lister_enfants(self, parent_id: str) -> Iterator[Dict[str, Any]]:
+        token = None
+        while True:
+            res = executer(self.service.files().list(
+                q=f"'{parent_id}' in parents and trashed=false",
+                fields=f"nextPageToken,files({CHAMPS_NOEUD})",
+                pageSize=1000,
+                pageToken=token,
+            ))
+            yield from res.get("files", [])
+            token = res.get("nextPageToken")
+            if not token:
+                return
+
+    def construire(self) -> None:
+        """Parcours complet. Le jeton est pris AVANT le parcours : rien de ce qui change pendant n'est perdu."""
+        with self._lock:
+            token = executer(self.service.changes().getStartPageToken()).get("startPageToken")
+            self._noeuds.clear(); self._enfants.clear(); self._par_nom.clear()
+            self._par_chemin = None
+            racine = executer(self.service.files().get(fileId=self.root_id, fields=CHAMPS_NOEUD))
+            self._noeuds[self.root_id] = {**racine, "parents": []}
+            if self.parcourir is not None:
+                for f in self.parcourir(self.root_id):
+                    self._inserer(f)
+            else:
+                a_visiter = [self.root_id]
+                while a_visiter:
+                    pid = a_visiter.pop()
+                    for f in self._lister_enfants(pid):
+                        self._inserer(f)
+                        if f.get("mimeType") == MIME_DOSSIER:
+                            a_visiter.append(f["id"])
+            self._page_token = token
+            self._derniere_sync = time.time()
+
+    def synchroniser(self) -> int:
+        """Applique les changements depuis le dernier jeton. Retourne le nb de changements lus."""
+        with self._lock:
+            token, vus, en_attente = self._page_token, 0, []
+            while token:
+                res = executer(self.service.changes().list(
+                    pageToken=token,
+                    spaces="drive",
+                    pageSize=1000,
+                    includeRemoved=True,
+                    fields=f"nextPageToken,newStartPageToken,changes(fileId,removed,file({CHAMPS_NOEUD}))",
+                ))
+                for ch in res.get("changes", []):
+                    vus += 1
+                    if not self._appliquer(ch):
+                        en_attente.append(ch)
+                if res.get("newStartPageToken"):
+                    self._page_token = res["newStartPageToken"]
+                token = res.get("nextPageToken")
+            # Un enfant peut arriver avant son dossier parent dans le flux : on repasse jusqu'à stabilité
+            while en_attente:
+                restants = [ch for ch in en_attente if not self._appliquer(ch)]
+                if len(restants) == len(en_attente):
+                    break
+                en_attente = restants
+            self._derniere_sync = time.time()
+            return vus
+
+    def _appliquer(self, ch: Dict[str, Any]) -> bool:
+        """True si le changement est traité (ou hors périmètre) ; False s'il attend son dossier parent."""
+        fid = ch.get("fileId")
+        f = ch.get("file") or {}
+        if ch.get("removed") or f.get("trashed"):
+            self.retirer(fid)
+            return True
+        if fid == self.root_id:
+            self._noeuds[fid].update({k: v for k, v in f.items() if k != "parents"})
+            return True
+        if any(p in self._noeuds for p in f.get("parents") or []):
+            self.noter(f)
+            return True
+        if fid in self._noeuds:   # sorti du périmètre (déplacé ailleurs)
+            self.retirer(fid)
+            return True
+        return False
+
+    # ====================== Mutations locales ======================
+    def _inserer(self, f: Dict[str, Any]) -> None:
+        fid = f["id"]
+        self._noeuds[fid] = {k: f.get(k) for k in ("id", "name", "mimeType", "parents", "size", "modifiedTime", "md5Checksum")}
+        self._noeuds[fid]["parents"] = [p for p in (f.get("parents") or []) if p in self._noeuds]
+        for p in self._noeuds[fid]["parents"]:
+            self._enfants.setdefault(p, set()).add(fid)
+        self._par_nom.setdefault(_norm(f.get("name")), set()).add(fid)
+        self._par_chemin = None
+
+    def _detacher(self, fid: str) -> None:
+        ancien = self._noeuds.get(fid)
+        if not ancien:
+            return
+        for p in ancien.get("parents") or []:
+            self._enfants.get(p, set()).discard(fid)
+        ids = self._par_nom.get(_norm(ancien.get("name")))
+        if ids is not None:
+            ids.discard(fid)
+            if not ids:
+                del self._par_nom[_norm(ancien.get("name"))]
+
+    def noter(self, f: Dict[str, Any]) -> None:
+        """Ajoute / met à jour un élément (création, renommage, déplacement)."""
+        with self._lock:
+            if not f.get("id"):
+                return
+            self._detacher(f["id"])
+            self._inserer(f)
+
+    def retirer(self, fid: str) -> None:
+        """Retire un élément et toute sa descendance (corbeille, suppression, sortie du périmètre)."""
+        with self._lock:
+            pile = [fid]
+            while pile:
+                cur = pile.pop()
+                if cur == self.root_id or cur not in self._noeuds:
+                    continue
+                pile.extend(self._enfants.pop(cur, set()))
+                self._detacher(cur)
+                del self._noeuds[cur]
+            self._par_chemin = None
+
+    # ====================== Lectures ======================
+    def contient(self, fid: str) -> bool:
+        return fid in self._noeuds
+
+    def noeud(self, fid: str) -> Optional[Dict[str, Any]]:
+        return self._noeuds.get(fid)
+
+    def est_descendant(self, fid: str, ancetre_id: str) -> bool:
+        if ancetre_id == self.root_id:
+            return fid in self._noeuds
+        pile, vus = [fid], set()
+        while pile:
+            cur = pile.pop()
+            if cur == ancetre_id:
+                return True
+            if cur in vus:
+                continue
+            vus.add(cur)
+            pile.extend((self._noeuds.get(cur) or {}).get("parents") or [])
+        return False
+
+    def chemin(self, fid: str) -> str:
+        """Chemin lisible depuis la racine partagée (« Projets/2025/devis.pdf »)."""
+        morceaux, cur = [], fid
+        while cur and cur != self.root_id and cur in self._noeuds:
+            n = self._noeuds[cur]
+            morceaux.append(n.get("name") or "")
+            cur = (n.get("parents") or [None])[0]
+        return "/".join(reversed(morceaux))
+
+    def _index_chemins(self) -> Dict[str, str]:
+        if self._par_chemin is None:
+            self._par_chemin = {_norm(self.chemin(fid)): fid for fid in self._noeuds if fid != self.root_id}
+        return self._par_chemin
+
+    def id_par_chemin(self, chemin: str) -> Optional[str]:
+        """Résout « A/B/C » (casse insensible) ; '' désigne la racine."""
+        c = "/".join(p.strip() for p in (chemin or "").strip("/ ").split("/") if p.strip())
+        if not c:
+            return self.root_id
+        with self._lock:
+            return self._index_chemins().get(_norm(c))
+
+    def par_nom(self, nom: str, parent_id: Optional[str] = None, dossier: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Éléments de nom exact (casse insensible), sous parent_id (toute profondeur) si fourni."""
+        with self._lock:
+            out = []
+            for fid in self._par_nom.get(_norm(nom), ()):
+                n = self._noeuds[fid]
+                if dossier is not None and (n.get("mimeType") == MIME_DOSSIER) != dossier:
+                    continue
+                if parent_id and not self.est_descendant(fid, parent_id):
+                    continue
+                out.append(n)
+            return sorted(out, key=lambda n: self.chemin(n["id"]).lower())
+
+    def enfant_par_nom(self, parent_id: str, nom: str, dossier: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for fid in self._par_nom.get(_norm(nom), ()):
+                n = self._noeuds[fid]
+                if parent_id in (n.get("parents") or []):
+                    if dossier is None or (n.get("mimeType") == MIME_DOSSIER) == dossier:
+                        return n
+            return None
+
+    def descendants(self, parent_id: str) -> Iterator[Dict[str, Any]]:
+        """Parcours en profondeur (préordre, noms triés) de la descendance de parent_id."""
+        with self._lock:
+            ordre: List[Dict[str, Any]] = []
+            pile = [parent_id]
+            while pile:
+                cur = pile.pop()
+                if cur != parent_id:
+                    ordre.append(self._noeuds[cur])
+                enfants = sorted(self._enfants.get(cur, ()), key=lambda c: _norm(self._noeuds[c].get("name")), reverse=True)
+                pile.extend(enfants)
+        yield from ordre
+
+    def rechercher(self, nom: Optional[str] = None, extension: Optional[str] = None, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fichiers (hors dossiers) dont le nom contient 'nom' et se termine par '.extension'."""
+        nom_n = _norm(nom)
+        ext = (extension or "").strip().lower().lstrip(".") or None
+        out = []
+        with self._lock:
+            for fid, n in self._noeuds.items():
+                if fid == self.root_id or n.get("mimeType") == MIME_DOSSIER:
+                    continue
+                fname = _norm(n.get("name"))
+                if nom_n and nom_n not in fname:
+                    continue
+                if ext and "." in fname and not fname.endswith("." + ext):
+                    continue
+                if parent_id and parent_id != self.root_id and not self.est_descendant(fid, parent_id):
+                    continue
+                out.append(n)
+            out.sort(key=lambda n: self.chemin(n["id"]).lower())
+        return out
+
+    def taille(self) -> int:
+        return max(0, len(self._noeuds) - 1)
@@ -0,0 +1,108 @@
+# cache_extraction.py — Cache du texte extrait des fichiers Drive (adressé par contenu)
+# - Clé = (id du fichier, version = md5Checksum ou modifiedTime, options d'extraction) :
+#   un fichier modifié change de clé, l'ancienne entrée vieillit et disparaît d'elle-même.
+# - Niveau 1 : LRU en mémoire (quelques dizaines d'extraits).
+# - Niveau 2 : disque sous <tmp>/alfred_cache/extraction, taille bornée (les moins récemment lus partent).
+# Une relecture ou un « résume-le » qui suit ne retélécharge ni ne reparse rien.
+
+from __future__ import annotations
+import os, json, hashlib, tempfile, threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+# ====================== Réglages ======================
+MEMOIRE_MAX_ENTREES = int(os.getenv("ALFRED_EXTRACTION_CACHE_ENTRIES", "64"))
+DISQUE_MAX_OCTETS = int(os.getenv("ALFRED_EXTRACTION_CACHE_MB", "200")) * 1024 * 1024
+DOSSIER = Path(os.getenv("ALFRED_CACHE_DIR") or Path(tempfile.gettempdir()) / "alfred_cache") / "extraction"
+
+_memoire: "OrderedDict[str, str]" = OrderedDict()
+_lock = threading.Lock()
+_compteurs = {"hits_memoire": 0, "hits_disque": 0, "miss": 0}
+
+# ====================== Clés ======================
+def version_de(meta: Dict[str, Any]) -> Optional[str]:
+    """md5Checksum (fichiers binaires) sinon modifiedTime (Google Docs) ; None => pas de mise en cache."""
+    return (meta or {}).get("md5Checksum") or (meta or {}).get("modifiedTime")
+
+def cle(file_id: str, version: str, **options) -> str:
+    brut = json.dumps({"id": file_id, "v": version, "o": options}, sort_keys=True)
+    return hashlib.sha256(brut.encode("utf-8")).hexdigest()
+
+def _chemin(k: str) -> Path:
+    return DOSSIER / k[:2] / f"{k}.txt"
+
+# ====================== Lecture / écriture ======================
+def _memoriser(k: str, texte: str) -> None:
+    _memoire[k] = texte
+    _memoire.move_to_end(k)
+    while len(_memoire) > MEMOIRE_MAX_ENTREES:
+        _memoire.popitem(last=False)
+
+def lire(k: str) -> Optional[str]:
+    with _lock:
+        if k in _memoire:
+            _memoire.move_to_end(k)
+            _compteurs["hits_memoire"] += 1
+            return _memoire[k]
+    p = _chemin(k)
+    try:
+        texte = p.read_text(encoding="utf-8")
+        os.utime(p)  # date d'accès => ordre d'éviction LRU côté disque
+    except OSError:
+        with _lock:
+            _compteurs["miss"] += 1
+        return None
+    with _lock:
+        _memoriser(k, texte)
+        _compteurs["hits_disque"] += 1
+    return texte
+
+def ecrire(k: str, texte: str) -> None:
+    if texte is None:
+        return
+    with _lock:
+        _memoriser(k, texte)
+    p = _chemin(k)
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".part")
+        tmp.write_text(texte, encoding="utf-8")
+        os.replace(tmp, p)
+        _elaguer_disque()
+    except OSError:
+        pass  # le disque est un bonus : le niveau mémoire suffit à rendre service
+
+def _elaguer_disque() -> None:
+    fichiers = []
+    total = 0
+    for p in DOSSIER.glob("*/*.txt"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        fichiers.append((st.st_mtime, st.st_size, p))
+        total += st.st_size
+    if total <= DISQUE_MAX_OCTETS:
+        return
+    for _, taille, p in sorted(fichiers):
+        try:
+            p.unlink()
+        except OSError:
+            continue
+        total -= taille
+        if total <= DISQUE_MAX_OCTETS:
+            break
+
+def vider() -> None:
+    with _lock:
+        _memoire.clear()
+    for p in DOSSIER.glob("*/*.txt"):
+        try:
+            p.unlink()
+        except OSError:
+            pass
+
+def stats() -> Dict[str, int]:
+    with _lock:
+        return {**_compteurs, "entrees_memoire": len(_memoire)}
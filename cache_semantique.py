@@ -0,0 +1,96 @@
+# cache_semantique.py — Cache sémantique (opt-in) des réponses enrichies par la mémoire
+# - La question est embarquée (embeddings) ; une réponse passée est resservie si la
+#   similarité cosinus dépasse le seuil ET si les souvenirs qui l'ont nourrie existent toujours.
+# - Invalidation : suppression/édition d'un souvenir => les entrées qui s'appuyaient dessus tombent ;
+#   ajout d'un souvenir => les entrées sans souvenir support tombent (le nouveau pourrait compter).
+
+from __future__ import annotations
+import os, math, time, threading
+from typing import Dict, Any, List, Optional, Iterable
+
+# ====================== Réglages ======================
+SIMILARITY_THRESHOLD = float(os.getenv("ALFRED_SEMANTIC_CACHE_THRESHOLD", "0.90"))
+TTL_SECONDS = int(os.getenv("ALFRED_SEMANTIC_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = 300
+
+_enabled: bool = os.getenv("ALFRED_SEMANTIC_CACHE") == "1"
+_entries: List[Dict[str, Any]] = []
+_lock = threading.Lock()
+
+def set_enabled(value: bool) -> None:
+    global _enabled
+    _enabled = bool(value)
+
+def is_enabled() -> bool:
+    return _enabled
+
+# ====================== Vecteurs ======================
+def _normalize(vec: List[float]) -> List[float]:
+    n = math.sqrt(sum(x * x for x in vec)) or 1.0
+    return [x / n for x in vec]
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    # vecteurs déjà normalisés
+    return sum(x * y for x, y in zip(a, b))
+
+def embed_question(question: str) -> Optional[List[float]]:
+    from llm import embed_texts  # import local : évite un cycle llm <-> mémoire
+    vecs = embed_texts([(question or "").strip()], site="cache_semantique.embed")
+    return _normalize(vecs[0]) if vecs else None
+
+# ====================== Lecture / écriture ======================
+def lookup(vec: List[float], live_memory_keys: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """Meilleure entrée au-dessus du seuil dont tous les souvenirs supports existent encore."""
+    if not vec:
+        return None
+    live = set(live_memory_keys)
+    now = time.time()
+    best, best_sim = None, SIMILARITY_THRESHOLD
+    with _lock:
+        _entries[:] = [e for e in _entries if now - e["ts"] <= TTL_SECONDS]
+        for e in _entries:
+            if not e["memory_keys"] <= live:
+                continue
+            sim = _cosine(vec, e["vec"])
+            if sim >= best_sim:
+                best, best_sim = e, sim
+    if best is None:
+        return None
+    return {"answer": best["answer"], "question": best["question"], "similarity": round(best_sim, 4)}
+
+def store(question: str, vec: List[float], answer: str, memory_keys: Iterable[str]) -> None:
+    if not vec or not answer or answer.startswith("Erreur LLM"):
+        return
+    with _lock:
+        _entries.append({
+            "question": question,
+            "vec": vec,
+            "answer": answer,
+            "memory_keys": set(memory_keys),
+            "ts": time.time(),
+        })
+        if len(_entries) > MAX_ENTRIES:
+            del _entries[: len(_entries) - MAX_ENTRIES]
+
+# ====================== Invalidation ======================
+def invalidate_memory(key: str) -> int:
+    """Retire les entrées qui s'appuyaient sur le souvenir 'key' (date|texte). Retourne le nb retiré."""
+    with _lock:
+        before = len(_entries)
+        _entries[:] = [e for e in _entries if key not in e["memory_keys"]]
+        return before - len(_entries)
+
+def invalidate_unsupported() -> int:
+    """Retire les entrées sans souvenir support (appelé après l'ajout d'un souvenir)."""
+    with _lock:
+        before = len(_entries)
+        _entries[:] = [e for e in _entries if e["memory_keys"]]
+        return before - len(_entries)
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+def size() -> int:
+    with _lock:
+        return len(_entries)
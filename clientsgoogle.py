@@ -0,0 +1,97 @@
+# clientsgoogle.py — Clients Google (Drive, Gmail) partagés, construits paresseusement
+# - Identifiants chargés une seule fois par API (parse du secret, éventuel OAuth), puis
+#   rafraîchis sous verrou quand ils expirent : un seul refresh même si plusieurs threads tirent.
+# - build(..., static_discovery=True) : document de découverte embarqué dans
+#   google-api-python-client, aucun aller-retour réseau de découverte.
+# - Le client (Resource) est partagé ; les requêtes s'exécutent sur un transport httplib2
+#   propre à chaque thread (http_local), httplib2 n'étant pas thread-safe.
+
+from __future__ import annotations
+import os, json, threading
+from typing import Any, Callable, Dict
+
+import httplib2
+import google_auth_httplib2
+from googleapiclient.discovery import build
+
+SCOPES_DRIVE = ["https://www.googleapis.com/auth/drive"]
+VERSIONS = {"drive": "v3", "gmail": "v1"}
+
+_lock = threading.RLock()
+_identifiants: Dict[str, Any] = {}
+_clients: Dict[str, Any] = {}
+_local = threading.local()
+
+# ====================== Identifiants ======================
+def _identifiants_drive():
+    """Compte de service : GOOGLE_DRIVE_JSON (contenu) ou GOOGLE_DRIVE_JSON_PATH (fichier)."""
+    from google.oauth2 import service_account
+
+    if os.getenv("GOOGLE_DRIVE_JSON"):
+        return service_account.Credentials.from_service_account_info(
+            json.loads(os.environ["GOOGLE_DRIVE_JSON"]), scopes=SCOPES_DRIVE
+        )
+    return service_account.Credentials.from_service_account_file(
+        os.environ["GOOGLE_DRIVE_JSON_PATH"], scopes=SCOPES_DRIVE
+    )
+
+def _identifiants_gmail():
+    """Compte utilisateur OAuth (secrets, fichiers ou OAuth local : voir connexiongmail)."""
+    from connexiongmail import charger_identifiants_gmail
+    return charger_identifiants_gmail()
+
+_CHARGEURS: Dict[str, Callable[[], Any]] = {"drive": _identifiants_drive, "gmail": _identifiants_gmail}
+
+def identifiants(api: str):
+    """Identifiants de l'API, chargés au premier appel et rafraîchis s'ils ont expiré."""
+    with _lock:
+        creds = _identifiants.get(api)
+        if creds is None:
+            creds = _identifiants[api] = _CHARGEURS[api]()
+        if not creds.valid:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+        return creds
+
+# ====================== Clients ======================
+def client(api: str):
+    """Resource googleapiclient partagé (construit une fois, sans découverte réseau)."""
+    with _lock:
+        svc = _clients.get(api)
+        if svc is None:
+            svc = _clients[api] = build(
+                api, VERSIONS[api], credentials=identifiants(api),
+                cache_discovery=False, static_discovery=True,
+            )
+        return svc
+
+def drive():
+    return client("drive")
+
+def gmail():
+    return client("gmail")
+
+def http_local(api: str = "drive") -> google_auth_httplib2.AuthorizedHttp:
+    """
+    Transport autorisé du thread courant pour l'API (à passer à req.execute(http=...)).
+    Les identifiants partagés sont revérifiés à chaque appel : le refresh se fait ici, sous verrou.
+    """
+    creds = identifiants(api)
+    par_api = getattr(_local, "http", None)
+    if par_api is None:
+        par_api = _local.http = {}
+    http = par_api.get(api)
+    if http is None or http.credentials is not creds:
+        http = par_api[api] = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http())
+    return http
+
+def reinitialiser_http(api: str = "drive") -> None:
+    """Oublie le transport du thread courant (coupure : le prochain appel en reconstruit un)."""
+    getattr(_local, "http", {}).pop(api, None)
+
+def oublier(api: str) -> None:
+    """Invalide identifiants et client (ex. token Gmail révoqué puis régénéré)."""
+    with _lock:
+        _identifiants.pop(api, None)
+        _clients.pop(api, None)
+    reinitialiser_http(api)
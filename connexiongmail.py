@@ -12,12 +12,14 @@ from typing import List, Optional, Dict
 from email.message import EmailMessage
 from email.utils import formatdate, make_msgid
 
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+import clientsgoogle
+from quota_google import executer
+
 # -------------------------------------------------------------------
 # Logging
 # -------------------------------------------------------------------
@@ -123,9 +125,9 @@ def _headless_mode_detected() -> bool:
 # -------------------------------------------------------------------
 # Auth principale : secrets -> fichiers -> (optionnel) OAuth interactif en local
 # -------------------------------------------------------------------
-def get_gmail_service() -> "googleapiclient.discovery.Resource":
+def charger_identifiants_gmail() -> Credentials:
     """
-    Retourne un client Gmail authentifié. Priorité aux secrets JSON.
+    Identifiants Gmail (chargés une fois par clientsgoogle). Priorité aux secrets JSON.
     - Prod/cloud : JAMAIS d'OAuth interactif ni d'écriture disque.
     - Local : fallback fichiers + OAuth interactif possible pour régénérer un token.
     """
@@ -137,8 +139,7 @@ def get_gmail_service() -> "googleapiclient.discovery.Resource":
 
     if creds_json and token_json:
         logger.info("Auth Gmail : utilisation des secrets JSON (headless=%s).", headless)
-        creds = _build_creds_from_authorized_info(token_json, SCOPES)
-        return build("gmail", "v1", credentials=creds, cache_discovery=False)
+        return _build_creds_from_authorized_info(token_json, SCOPES)
 
     # 2) Fichiers (local dev)
     if os.path.exists(DEFAULT_TOKEN_FILE):
@@ -147,7 +148,7 @@ def get_gmail_service() -> "googleapiclient.discovery.Resource":
                 token_info = json.load(f)
             creds = _build_creds_from_authorized_info(token_info, SCOPES)
             logger.info("Auth Gmail : token fichier local.")
-            return build("gmail", "v1", credentials=creds, cache_discovery=False)
+            return creds
         except Exception as e:
             logger.warning("Token local illisible/expiré : %s", e)
 
@@ -169,7 +170,7 @@ def get_gmail_service() -> "googleapiclient.discovery.Resource":
             logger.info("Token local sauvegardé : %s", DEFAULT_TOKEN_FILE)
         except Exception as e:
             logger.warning("Impossible d'écrire le token local : %s", e)
-        return build("gmail", "v1", credentials=creds, cache_discovery=False)
+        return creds
 
     # 3) Rien de disponible
     raise RuntimeError(
@@ -178,12 +179,16 @@ def get_gmail_service() -> "googleapiclient.discovery.Resource":
         "  ou fournis GMAIL_CREDENTIALS_FILE / GMAIL_TOKEN_FILE en local."
     )
 
+def get_gmail_service() -> "googleapiclient.discovery.Resource":
+    """Client Gmail authentifié, partagé et construit une seule fois (voir clientsgoogle)."""
+    return clientsgoogle.gmail()
+
 # -------------------------------------------------------------------
 # Utilitaires
 # -------------------------------------------------------------------
 def who_am_i(service) -> str:
     """Retourne l'adresse principale du compte authentifié."""
-    profile = service.users().getProfile(userId="me").execute()
+    profile = executer(service.users().getProfile(userId="me"), "gmail")
     return profile.get("emailAddress")
 
 def list_send_as(service) -> List[str]:
@@ -192,7 +197,7 @@ def list_send_as(service) -> List[str]:
     Requiert le scope gmail.settings.basic.
     """
     try:
-        resp = service.users().settings().sendAs().list(userId="me").execute()
+        resp = executer(service.users().settings().sendAs().list(userId="me"), "gmail")
         return [s.get("sendAsEmail") for s in resp.get("sendAs", []) if s.get("sendAsEmail")]
     except HttpError as e:
         if e.resp.status == 403:
@@ -328,7 +333,8 @@ def send_email(
     raw = _b64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
 
     try:
-        sent = service.users().messages().send(userId="me", body={"raw": raw}).execute()
+        # Envoi non idempotent : repris uniquement si Gmail l'a refusé pour quota
+        sent = executer(service.users().messages().send(userId="me", body={"raw": raw}), "gmail", idempotent=False)
         return sent
     except HttpError as e:
         if e.resp.status == 403:
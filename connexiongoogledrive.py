@@ -1,35 +1,140 @@
 import os
 import io
 import json
-from typing import List, Dict, Optional, Tuple
+import time
+import tempfile
+import mimetypes
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, List, Dict, Optional, Tuple, Iterator, Iterable, Union
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
+import httplib2
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseDownload
 
 from lecturefichiersbase import (
-    lire_txt_bytes, lire_pdf_bytes, lire_docx_bytes, lire_csv_bytes, PDF_MAX_PAGES_DEFAULT
+    lire_source, PDF_MAX_PAGES_DEFAULT
 )
+from cache_arbre_drive import ArbreDrive, MIME_DOSSIER, CHAMPS_NOEUD
+import cache_extraction
+import quota_google
+import clientsgoogle
 
-SERVICE_ACCOUNT_INFO = json.loads(os.getenv("GOOGLE_DRIVE_JSON"))
-SCOPES = ["https://www.googleapis.com/auth/drive"]
 FOLDER_ID = "1stVsLUW4HUDAU8O7GgAqHbASf0DlzQNI"
 
-MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024
+# Téléchargement par morceaux vers un fichier temporaire : la RAM ne borne plus la taille lisible
+MAX_FILE_SIZE_BYTES = int(os.getenv("ALFRED_DRIVE_MAX_MB", "200")) * 1024 * 1024
+CHUNK_TELECHARGEMENT = 8 * 1024 * 1024
+EN_MEMOIRE_MAX_OCTETS = 4 * 1024 * 1024   # en dessous : tampon mémoire ; au-delà : fichier temporaire
 DEFAULT_PDF_MAX_PAGES = PDF_MAX_PAGES_DEFAULT
 
-credentials = service_account.Credentials.from_service_account_info(
-    SERVICE_ACCOUNT_INFO, scopes=SCOPES
+# ====================== Client Drive (partagé, construit au premier usage) ======================
+# Voir clientsgoogle : identifiants chargés une fois, découverte statique, transport par thread.
+_drive = clientsgoogle.drive
+
+def __getattr__(nom: str):
+    """Compatibilité : connexiongoogledrive.service / .credentials restent accessibles (paresseux)."""
+    if nom == "service":
+        return clientsgoogle.drive()
+    if nom == "credentials":
+        return clientsgoogle.identifiants("drive")
+    raise AttributeError(f"module {__name__!r} has no attribute {nom!r}")
+
+# ====================== Exécution des requêtes ======================
+# httplib2 n'est pas thread-safe : chaque thread exécute ses requêtes sur son propre transport.
+def _http_local():
+    return clientsgoogle.http_local("drive")
+
+def _executer(req, idempotent: bool = True):
+    """Exécute une requête googleapiclient sur le transport du thread courant (limiteur + reprises partagés)."""
+    return quota_google.executer(req, "drive", http=_http_local(), idempotent=idempotent)
+
+# ====================== Parcours de l'arbre (largeur d'abord, par lots) ======================
+PARENTS_PAR_REQUETE = 40   # « 'a' in parents or 'b' in parents … » : reste loin de la limite de taille de q
+PAGE_SIZE = 1000
+CHAMPS_PARCOURS = "id,name,mimeType,parents,size"
+WORKERS_PARCOURS = int(os.getenv("ALFRED_DRIVE_WORKERS", "1"))   # > 1 : lots d'un même niveau en parallèle
+
+def _lister_enfants_lot(parent_ids: List[str], champs: str = CHAMPS_PARCOURS, filtre: str = "") -> List[Dict]:
+    """Enfants directs de plusieurs dossiers en une requête, pagination suivie jusqu'au bout."""
+    q = "(" + " or ".join(f"'{pid}' in parents" for pid in parent_ids) + ") and trashed=false"
+    if filtre:
+        q += f" and {filtre}"
+    out, token = [], None
+    while True:
+        res = _executer(_drive().files().list(
+            q=q, spaces="drive", pageSize=PAGE_SIZE, pageToken=token,
+            fields=f"nextPageToken,files({champs})",
+        ))
+        out.extend(res.get("files", []))
+        token = res.get("nextPageToken")
+        if not token:
+            return out
+
+def parcourir_arbre(
+    racine_id: str = FOLDER_ID,
+    champs: str = CHAMPS_PARCOURS,
+    profondeur_max: Optional[int] = None,
+    workers: Optional[int] = None,
+    filtre: str = "",
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Parcours en largeur : tous les dossiers d'un niveau sont interrogés ensemble, par lots de
+    PARENTS_PAR_REQUETE parents. Produit (profondeur, fichier), profondeur 0 = enfants de la racine.
+    workers > 1 : les lots d'un même niveau partent en parallèle.
+    filtre : clause ajoutée à la requête (ex. ne suivre que les dossiers).
+    """
+    workers = WORKERS_PARCOURS if workers is None else workers
+    niveau, profondeur = [racine_id], 0
+    while niveau and (profondeur_max is None or profondeur <= profondeur_max):
+        lots = [niveau[i:i + PARENTS_PAR_REQUETE] for i in range(0, len(niveau), PARENTS_PAR_REQUETE)]
+        if workers > 1 and len(lots) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(lots))) as pool:
+                resultats = list(pool.map(lambda lot: _lister_enfants_lot(lot, champs, filtre), lots))
+        else:
+            resultats = [_lister_enfants_lot(lot, champs, filtre) for lot in lots]
+        suivant = []
+        for fichiers in resultats:
+            for f in fichiers:
+                yield profondeur, f
+                if f.get("mimeType") == MIME_DOSSIER:
+                    suivant.append(f["id"])
+        niveau, profondeur = suivant, profondeur + 1
+
+# Cache des métadonnées de l'arbre partagé (construit au premier besoin, deltas via changes.list)
+USE_TREE_CACHE = os.getenv("ALFRED_DRIVE_TREE_CACHE", "1") == "1"
+ARBRE = ArbreDrive(
+    _drive, FOLDER_ID,
+    parcourir=lambda racine: (f for _, f in parcourir_arbre(racine, champs=CHAMPS_NOEUD)),
 )
-service = build("drive", "v3", credentials=credentials)
+
+def _arbre_pret(parent_id: Optional[str] = None, construire: bool = True) -> Optional[ArbreDrive]:
+    """
+    Arbre à jour si le cache est actif et couvre parent_id ; None => parcours réseau historique.
+    construire=False : seulement s'il est déjà construit (un démarrage à froid ne paie pas le parcours complet).
+    """
+    if not USE_TREE_CACHE or (not construire and not ARBRE.construit):
+        return None
+    try:
+        ARBRE.ensure_fresh()
+    except Exception:
+        return None
+    if parent_id and not ARBRE.contient(parent_id):
+        return None
+    return ARBRE
 
 def chercher_id_par_nom(nom_dossier, parent_id=FOLDER_ID):
+    arbre = _arbre_pret(parent_id)
+    if arbre:
+        n = arbre.enfant_par_nom(parent_id, nom_dossier, dossier=True)
+        return n["id"] if n else None
     nom_dossier = (nom_dossier or "").lower()
-    results = service.files().list(
+    results = _executer(_drive().files().list(
         q=f"'{parent_id}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false",
         spaces="drive",
         fields="files(id, name)"
-    ).execute()
+    ))
     dossiers = results.get("files", [])
     for d in dossiers:
         if (d.get("name", "").lower() == nom_dossier):
@@ -37,22 +142,26 @@ def chercher_id_par_nom(nom_dossier, parent_id=FOLDER_ID):
     return None
 
 def _iter_dossier_recursif(parent_id: str):
+    """Toute la descendance de parent_id (parcours par niveaux, pagination complète)."""
     try:
-        res = service.files().list(
-            q=f"'{parent_id}' in parents and trashed=false",
-            fields="files(id,name,mimeType,size)"
-        ).execute()
+        for _, f in parcourir_arbre(parent_id):
+            yield f
     except HttpError:
-        res = {"files": []}
-    for f in res.get("files", []):
-        yield f
-        if f.get("mimeType") == "application/vnd.google-apps.folder":
-            yield from _iter_dossier_recursif(f.get("id"))
+        return
 
 def trouver_id_dossier_recursif(nom_dossier: str, parent_id: str = FOLDER_ID) -> Optional[str]:
     nom = (nom_dossier or "").strip().lower()
     if not nom:
         return parent_id
+    arbre = _arbre_pret(parent_id)
+    if arbre:
+        # « A/B » = chemin depuis la racine partagée ; sinon nom exact n'importe où sous parent_id
+        if "/" in nom and parent_id == FOLDER_ID:
+            fid = arbre.id_par_chemin(nom)
+            if fid and (arbre.noeud(fid) or {}).get("mimeType") == MIME_DOSSIER:
+                return fid
+        trouves = arbre.par_nom(nom, parent_id=parent_id, dossier=True)
+        return trouves[0]["id"] if trouves else None
     # recherche par nom exact (casse insensible) dans tout l'arbre
     for f in _iter_dossier_recursif(parent_id):
         if f.get("mimeType") == "application/vnd.google-apps.folder":
@@ -60,6 +169,16 @@ def trouver_id_dossier_recursif(nom_dossier: str, parent_id: str = FOLDER_ID) ->
                 return f.get("id")
     return None
 
+def _enfants_par_parent(parent_id: str) -> Dict[str, List[Dict]]:
+    """Descendance de parent_id regroupée par dossier parent (cache d'arbre, sinon parcours par niveaux)."""
+    arbre = _arbre_pret(parent_id)
+    noeuds = arbre.descendants(parent_id) if arbre else _iter_dossier_recursif(parent_id)
+    groupes: Dict[str, List[Dict]] = {}
+    for f in noeuds:
+        for p in f.get("parents") or []:
+            groupes.setdefault(p, []).append(f)
+    return groupes
+
 def lister_fichiers_dossier(nom_dossier=None, parent_id=FOLDER_ID, niveau=0):
     if nom_dossier:
         id_cible = chercher_id_par_nom(nom_dossier, parent_id)
@@ -67,22 +186,83 @@ def lister_fichiers_dossier(nom_dossier=None, parent_id=FOLDER_ID, niveau=0):
             return f"❌ Le sous-dossier « {nom_dossier} » est introuvable."
         parent_id = id_cible
 
-    results = service.files().list(
-        q=f"'{parent_id}' in parents and trashed=false",
-        fields="files(id, name, mimeType)"
-    ).execute()
-
-    fichiers = results.get("files", [])
+    groupes = _enfants_par_parent(parent_id)
     lignes = []
-    for f in fichiers:
-        indent = "    " * niveau
-        if f["mimeType"] == "application/vnd.google-apps.folder":
+
+    def _rendre(pid: str, niv: int):
+        for f in groupes.get(pid, []):
+            indent = "    " * niv
+            if f["mimeType"] == MIME_DOSSIER:
+                lignes.append(f"{indent}📁 {f['name']}")
+                _rendre(f["id"], niv + 1)
+            else:
+                lignes.append(f"{indent}📄 {f['name']}")
+
+    _rendre(parent_id, niveau)
+    return "\n".join(lignes) if lignes else "📂 Ce dossier est vide."
+
+# ====================== Listage paginé ======================
+# Le curseur est une pile de parcours en profondeur, sérialisable (stockée en session) :
+#   {"pile": [{"id", "niveau", "token", "tampon"}], "profondeur_max", "taille_page"}
+# Chaque appel ne lit que les pages Drive nécessaires pour remplir UNE page d'affichage.
+LISTING_TAILLE_PAGE = 40
+LISTING_PROFONDEUR = 1   # 1 = enfants directs seulement
+
+def _enfants_tries(folder_id: str, token: Optional[str], taille: int) -> Tuple[List[Dict], Optional[str]]:
+    """Une page d'enfants (dossiers d'abord, puis par nom) : cache d'arbre s'il est construit, sinon une requête."""
+    if _arbre_pret(folder_id, construire=False):
+        enfants = [n for n in ARBRE.descendants(folder_id) if folder_id in (n.get("parents") or [])]
+        enfants.sort(key=lambda n: (n.get("mimeType") != MIME_DOSSIER, (n.get("name") or "").lower()))
+        return [{k: n.get(k) for k in ("id", "name", "mimeType")} for n in enfants], None
+    res = _executer(_drive().files().list(
+        q=f"'{folder_id}' in parents and trashed=false",
+        spaces="drive", orderBy="folder,name_natural", pageSize=taille, pageToken=token,
+        fields="nextPageToken,files(id,name,mimeType)",
+    ))
+    return res.get("files", []), res.get("nextPageToken")
+
+def lister_page(
+    parent_id: str = FOLDER_ID,
+    profondeur_max: int = LISTING_PROFONDEUR,
+    taille_page: int = LISTING_TAILLE_PAGE,
+    curseur: Optional[Dict] = None,
+) -> Dict:
+    """
+    Une page du listage indenté de parent_id.
+    Retourne {"texte": str, "nb": int, "curseur": dict | None} — curseur None = listage terminé.
+    Reprendre avec lister_page(curseur=...) (les autres paramètres sont alors ceux du curseur).
+    """
+    if curseur:
+        pile = curseur["pile"]
+        profondeur_max = curseur.get("profondeur_max", profondeur_max)
+        taille_page = curseur.get("taille_page", taille_page)
+    else:
+        pile = [{"id": parent_id, "niveau": 0, "token": None, "tampon": None}]
+
+    lignes: List[str] = []
+    while pile and len(lignes) < taille_page:
+        cadre = pile[-1]
+        if cadre["tampon"] is None or (not cadre["tampon"] and cadre["token"]):
+            cadre["tampon"], cadre["token"] = _enfants_tries(cadre["id"], cadre["token"], taille_page)
+        if not cadre["tampon"]:
+            pile.pop()
+            continue
+        f = cadre["tampon"].pop(0)
+        indent = "    " * cadre["niveau"]
+        if f.get("mimeType") == MIME_DOSSIER:
             lignes.append(f"{indent}📁 {f['name']}")
-            contenu = lister_fichiers_dossier(None, f["id"], niveau + 1)
-            lignes.append(contenu)
+            if cadre["niveau"] + 1 < profondeur_max:
+                pile.append({"id": f["id"], "niveau": cadre["niveau"] + 1, "token": None, "tampon": None})
         else:
             lignes.append(f"{indent}📄 {f['name']}")
-    return "\n".join(lignes) if lignes else "📂 Ce dossier est vide."
+
+    # pile restante sans rien à lire => terminé
+    while pile and not pile[-1]["tampon"] and not pile[-1]["token"] and pile[-1]["tampon"] is not None:
+        pile.pop()
+    suite = {"pile": pile, "profondeur_max": profondeur_max, "taille_page": taille_page} if pile else None
+    if not lignes and not curseur:
+        return {"texte": "📂 Ce dossier est vide.", "nb": 0, "curseur": None}
+    return {"texte": "\n".join(lignes), "nb": len(lignes), "curseur": suite}
 
 def creer_dossier(nom_dossier, parent_id=FOLDER_ID):
     if chercher_id_par_nom(nom_dossier, parent_id):
@@ -93,7 +273,9 @@ def creer_dossier(nom_dossier, parent_id=FOLDER_ID):
             "mimeType": "application/vnd.google-apps.folder",
             "parents": [parent_id]
         }
-        service.files().create(body=metadata, fields="id").execute()
+        cree = _executer(_drive().files().create(body=metadata, fields=CHAMPS_NOEUD), idempotent=False)
+        if ARBRE.construit:
+            ARBRE.noter(cree)
         return f"✅ Dossier « {nom_dossier} » créé avec succès."
     except Exception as e:
         return f"❌ Erreur lors de la création : {str(e)}"
@@ -103,8 +285,11 @@ def supprimer_element(nom, parent_id: Optional[str] = None):
     try:
         if parent_id:
             query = f"'{parent_id}' in parents and name='{nom}' and trashed=false"
-            results = service.files().list(q=query, fields="files(id, name, mimeType)").execute()
+            results = _executer(_drive().files().list(q=query, fields="files(id, name, mimeType)"))
             fichiers = results.get("files", [])
+        elif _arbre_pret():
+            # index nom -> ids du cache (nom exact, casse respectée comme la requête Drive)
+            fichiers = [n for n in ARBRE.par_nom(nom) if n.get("name") == nom]
         else:
             # recherche récursive : on prend le premier match rencontré
             fichiers = []
@@ -115,11 +300,160 @@ def supprimer_element(nom, parent_id: Optional[str] = None):
         if not fichiers:
             return f"❌ Aucun élément nommé « {nom} » n’a été trouvé."
         file_id = fichiers[0]['id']
-        service.files().update(fileId=file_id, body={"trashed": True}).execute()
+        _executer(_drive().files().update(fileId=file_id, body={"trashed": True}))
+        if ARBRE.construit:
+            ARBRE.retirer(file_id)
         return f"🗑️ L’élément « {nom} » a été déplacé dans la corbeille."
     except Exception as e:
         return f"❌ Erreur lors de la suppression : {str(e)}"
 
+# ====================== Opérations par lots (requêtes HTTP batch) ======================
+# Une requête batch regroupe jusqu'à 100 appels : N éléments = ceil(N / 100) allers-retours.
+BATCH_MAX = 100
+
+def _executer_lot(
+    requetes: List[Tuple[str, object]], idempotent: bool = True,
+) -> Dict[str, Tuple[Optional[Dict], Optional[str]]]:
+    """
+    Exécute [(clé, requête)] par batchs de BATCH_MAX. Retourne {clé: (réponse, erreur)}.
+    Un batch coûte autant de jetons que d'appels ; les sous-requêtes refusées pour quota
+    (429 / 403 rateLimit : non traitées) repartent dans un batch suivant après backoff.
+    idempotent=False (lots qui modifient Drive) : pas de rejeu du batch entier après 5xx / coupure,
+    une partie des sous-requêtes a pu être appliquée.
+    """
+    resultats: Dict[str, Tuple[Optional[Dict], Optional[str]]] = {}
+    a_reprendre: List[str] = []
+
+    def _rappel(request_id, response, exception):
+        if exception is not None and quota_google.est_refus_quota(exception):
+            a_reprendre.append(request_id)
+        resultats[request_id] = (response, str(exception) if exception else None)
+
+    restantes = list(requetes)
+    for essai in range(quota_google.ESSAIS_MAX):
+        a_reprendre.clear()
+        for i in range(0, len(restantes), BATCH_MAX):
+            lot = restantes[i:i + BATCH_MAX]
+            batch = _drive().new_batch_http_request(callback=_rappel)
+            for cle, req in lot:
+                batch.add(req, request_id=cle)
+            quota_google.executer(batch, "drive", http=_http_local(), idempotent=idempotent, cout=len(lot))
+        if not a_reprendre or essai == quota_google.ESSAIS_MAX - 1:
+            break
+        cles = set(a_reprendre)
+        restantes = [(cle, req) for cle, req in restantes if cle in cles]
+        time.sleep(quota_google.delai_reprise(essai))
+    return resultats
+
+def mettre_en_corbeille_lot(ids: List[str]) -> List[Dict]:
+    """Corbeille pour N ids en batch ; résultat par élément {id, name, ok, erreur}."""
+    ids = list(dict.fromkeys(ids))
+    res = _executer_lot([
+        (fid, _drive().files().update(fileId=fid, body={"trashed": True}, fields="id,name")) for fid in ids
+    ], idempotent=False)
+    out = []
+    for fid in ids:
+        meta, err = res.get(fid, (None, "pas de réponse"))
+        if err is None and ARBRE.construit:
+            ARBRE.retirer(fid)
+        out.append({"id": fid, "name": (meta or {}).get("name"), "ok": err is None, "erreur": err})
+    return out
+
+def _ids_par_noms(noms: List[str], parent_id: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """Premier élément portant exactement chaque nom : cache d'arbre, sinon UNE requête « name='a' or name='b' … »."""
+    if _arbre_pret(parent_id):
+        out = {}
+        for nom in noms:
+            trouves = [n for n in ARBRE.par_nom(nom, parent_id=parent_id) if n.get("name") == nom]
+            out[nom] = trouves[0]["id"] if trouves else None
+        return out
+    out = {nom: None for nom in noms}
+    portee = f"'{parent_id}' in parents and " if parent_id else ""
+    for i in range(0, len(noms), PARENTS_PAR_REQUETE):
+        lot = noms[i:i + PARENTS_PAR_REQUETE]
+        q = portee + "(" + " or ".join(f"name='{_echapper_q(n)}'" for n in lot) + ") and trashed=false"
+        token = None
+        while True:
+            res = _executer(_drive().files().list(
+                q=q, spaces="drive", pageSize=PAGE_SIZE, pageToken=token, fields="nextPageToken,files(id,name,parents)",
+            ))
+            for f in res.get("files", []):
+                if out.get(f["name"], "") is None and (parent_id or _dans_racine(f)):
+                    out[f["name"]] = f["id"]
+            token = res.get("nextPageToken")
+            if not token:
+                break
+    return out
+
+def _dans_racine(f: Dict) -> bool:
+    return bool(_dossiers_sous(FOLDER_ID).intersection(f.get("parents") or []))
+
+def supprimer_elements(noms: List[str], parent_id: Optional[str] = None) -> str:
+    """Corbeille de plusieurs éléments nommés : résolution groupée + un batch ; message récapitulatif."""
+    try:
+        ids = _ids_par_noms(noms, parent_id)
+        introuvables = [n for n, fid in ids.items() if not fid]
+        resultats = mettre_en_corbeille_lot([fid for fid in ids.values() if fid])
+    except Exception as e:
+        return f"❌ Erreur lors de la suppression : {str(e)}"
+    nom_par_id = {fid: n for n, fid in ids.items() if fid}
+    lignes = []
+    for r in resultats:
+        nom = nom_par_id.get(r["id"], r.get("name") or r["id"])
+        lignes.append(f"🗑️ « {nom} »" if r["ok"] else f"❌ « {nom} » : {r['erreur']}")
+    lignes += [f"❌ « {n} » introuvable" for n in introuvables]
+    ok = sum(1 for r in resultats if r["ok"])
+    return f"{ok}/{len(noms)} élément(s) déplacé(s) dans la corbeille :\n" + "\n".join(lignes)
+
+def creer_chemin_dossiers(chemin: str, parent_id: str = FOLDER_ID) -> str:
+    """
+    Crée « A/B/C » sous parent_id : la partie existante est réutilisée, les ids des dossiers
+    manquants sont réservés (generateIds) puis tous créés dans un seul batch.
+    """
+    segments = [p.strip() for p in (chemin or "").split("/") if p.strip()]
+    if not segments:
+        return "❌ Chemin de dossier vide."
+    try:
+        courant, i = parent_id, 0
+        while i < len(segments):
+            fid = chercher_id_par_nom(segments[i], courant)
+            if not fid:
+                break
+            courant, i = fid, i + 1
+        manquants = segments[i:]
+        if not manquants:
+            return f"⚠️ Le dossier « {'/'.join(segments)} » existe déjà."
+
+        ids = _executer(_drive().files().generateIds(count=len(manquants), space="drive", type="files")).get("ids", [])
+        a_creer, parent = [], courant
+        for nom, fid in zip(manquants, ids):
+            a_creer.append({"id": fid, "name": nom, "mimeType": MIME_DOSSIER, "parents": [parent]})
+            parent = fid
+        # Un batch ne garantit pas l'ordre d'exécution : un enfant servi avant son parent est rejoué
+        restant, erreurs = a_creer, {}
+        for _ in range(len(a_creer)):
+            res = _executer_lot(
+                [(b["id"], _drive().files().create(body=b, fields=CHAMPS_NOEUD)) for b in restant], idempotent=False,
+            )
+            suivant = []
+            for b in restant:
+                meta, err = res.get(b["id"], (None, "pas de réponse"))
+                if err is None:
+                    if ARBRE.construit:
+                        ARBRE.noter(meta)
+                else:
+                    erreurs[b["id"]] = err
+                    suivant.append(b)
+            if not suivant or len(suivant) == len(restant):
+                restant = suivant
+                break
+            restant = suivant
+        if restant:
+            return f"❌ Création partielle de « {'/'.join(segments)} » : {erreurs[restant[0]['id']]}"
+        return f"✅ Dossier « {'/'.join(segments)} » créé ({len(manquants)} niveau(x) ajouté(s))."
+    except Exception as e:
+        return f"❌ Erreur lors de la création : {str(e)}"
+
 MIME_GOOGLE_DOC = "application/vnd.google-apps.document"
 MIME_GOOGLE_SHEET = "application/vnd.google-apps.spreadsheet"
 MIME_GOOGLE_SLIDES = "application/vnd.google-apps.presentation"
@@ -130,41 +464,179 @@ EXPORT_MIME = {
     MIME_GOOGLE_SLIDES: "application/pdf"
 }
 
-def rechercher_fichiers(nom: Optional[str] = None, extension: Optional[str] = None, parent_id: str = FOLDER_ID) -> List[Dict[str, str]]:
-    nom = (nom or "").strip().lower()
-    ext = (extension or "").strip().lower().lstrip('.') or None
-    matches: List[Dict[str, str]] = []
-    for f in _iter_dossier_recursif(parent_id):
-        mt = f.get("mimeType", "")
-        if mt == "application/vnd.google-apps.folder":
-            continue
-        fname = f.get("name", "")
-        if nom and (nom not in fname.lower()):
-            continue
-        if ext:
-            if "." in fname:
-                if not fname.lower().endswith("." + ext):
+# ====================== Recherche ======================
+# Extensions -> types MIME poussés dans la requête (Drive n'a pas de critère « extension » dans q)
+MIME_PAR_EXTENSION = {
+    "pdf": ["application/pdf"],
+    "txt": ["text/plain"],
+    "csv": ["text/csv"],
+    "doc": ["application/msword"],
+    "docx": ["application/vnd.openxmlformats-officedocument.wordprocessingml.document", MIME_GOOGLE_DOC],
+    "xls": ["application/vnd.ms-excel"],
+    "xlsx": ["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", MIME_GOOGLE_SHEET],
+    "pptx": ["application/vnd.openxmlformats-officedocument.presentationml.presentation", MIME_GOOGLE_SLIDES],
+}
+CHAMPS_RECHERCHE = "id,name,mimeType,parents,size,modifiedTime,md5Checksum"
+ANCETRES_TTL_S = 300
+
+_ancetres: Dict[str, Tuple[float, set]] = {}
+_ancetres_lock = threading.Lock()
+
+def _echapper_q(texte: str) -> str:
+    return (texte or "").replace("\\", "\\\\").replace("'", "\\'")
+
+def _dossiers_sous(parent_id: str) -> set:
+    """Ensemble {parent_id + tous ses sous-dossiers} : cache d'arbre, sinon parcours des seuls dossiers (mis en cache)."""
+    if ARBRE.construit and ARBRE.contient(parent_id):
+        return {parent_id} | {n["id"] for n in ARBRE.descendants(parent_id) if n.get("mimeType") == MIME_DOSSIER}
+    with _ancetres_lock:
+        ts, ids = _ancetres.get(parent_id, (0.0, None))
+        if ids is not None and time.time() - ts < ANCETRES_TTL_S:
+            return ids
+    ids = {parent_id} | {f["id"] for _, f in parcourir_arbre(parent_id, champs="id,mimeType", filtre=f"mimeType='{MIME_DOSSIER}'")}
+    with _ancetres_lock:
+        _ancetres[parent_id] = (time.time(), ids)
+    return ids
+
+def _rang(nom_fichier: str, terme: str) -> int:
+    """0 = nom exact (avec ou sans extension), 1 = préfixe, 2 = contient, 3 = sans rapport."""
+    n = (nom_fichier or "").strip().lower()
+    if not terme:
+        return 2
+    if n == terme or os.path.splitext(n)[0] == terme:
+        return 0
+    if n.startswith(terme):
+        return 1
+    return 2 if terme in n else 3
+
+def _extension_ok(nom_fichier: str, ext: Optional[str]) -> bool:
+    if not ext or "." not in (nom_fichier or ""):
+        return True
+    return nom_fichier.lower().endswith("." + ext)
+
+def chercher_fichiers(
+    terme: Optional[str] = None,
+    extension: Optional[str] = None,
+    parent_id: str = FOLDER_ID,
+    limite: Optional[int] = None,
+    mime_types: Optional[List[str]] = None,
+) -> List[Dict]:
+    """
+    Fichiers sous parent_id (toute profondeur) dont le nom contient 'terme', classés
+    exact > préfixe > contient (puis plus récent d'abord).
+    - Cache d'arbre déjà construit : recherche en mémoire, aucun appel réseau.
+    - Sinon : 'name contains' + mimeType poussés dans la requête Drive, restriction à la
+      descendance via l'ensemble des dossiers sous parent_id, arrêt dès 'limite' noms exacts.
+      (Côté Drive, 'name contains' ne trouve que les débuts de mots.)
+    """
+    t = (terme or "").strip().lower()
+    ext = (extension or "").strip().lower().lstrip(".") or None
+    mimes = list(mime_types or MIME_PAR_EXTENSION.get(ext or "", []))
+
+    if _arbre_pret(parent_id, construire=False):
+        trouves = ARBRE.rechercher(t, ext, parent_id)
+    else:
+        dossiers = _dossiers_sous(parent_id)
+        clauses = ["trashed=false", f"mimeType!='{MIME_DOSSIER}'"]
+        if t:
+            clauses.append(f"name contains '{_echapper_q(terme.strip())}'")
+        if mimes:
+            clauses.append("(" + " or ".join(f"mimeType='{m}'" for m in mimes) + ")")
+        q = " and ".join(clauses)
+        trouves, exacts, token = [], 0, None
+        while True:
+            res = _executer(_drive().files().list(
+                q=q, spaces="drive", pageSize=PAGE_SIZE, pageToken=token,
+                fields=f"nextPageToken,files({CHAMPS_RECHERCHE})",
+            ))
+            for f in res.get("files", []):
+                if not dossiers.intersection(f.get("parents") or []):
                     continue
-        matches.append({
-            "id": f.get("id"),
-            "name": fname,
-            "mimeType": mt,
-            "size": f.get("size")
-        })
-    return matches
+                if not mimes and not _extension_ok(f.get("name", ""), ext):
+                    continue
+                trouves.append(f)
+                exacts += _rang(f.get("name", ""), t) == 0
+            token = res.get("nextPageToken")
+            if not token or (limite and exacts >= limite):
+                break
+
+    classes = sorted(trouves, key=lambda f: f.get("modifiedTime") or "", reverse=True)
+    classes.sort(key=lambda f: _rang(f.get("name", ""), t))
+    classes = [f for f in classes if _rang(f.get("name", ""), t) < 3]
+    return classes[:limite] if limite else classes
+
+def rechercher_fichiers(
+    nom: Optional[str] = None,
+    extension: Optional[str] = None,
+    parent_id: str = FOLDER_ID,
+    limite: Optional[int] = None,
+) -> List[Dict[str, str]]:
+    return [
+        {"id": f["id"], "name": f.get("name", ""), "mimeType": f.get("mimeType", ""), "size": f.get("size")}
+        for f in chercher_fichiers(nom, extension, parent_id or FOLDER_ID, limite=limite)
+    ]
 
 def telecharger_fichier(file_id: str, mimeType: Optional[str] = None) -> Tuple[bytes, str]:
-    meta = service.files().get(fileId=file_id, fields="id,name,mimeType,size").execute()
-    mt = meta.get("mimeType")
+    """Contenu complet en bytes (pièces jointes, petits fichiers) ; pour lire un gros fichier, voir fichier_telecharge."""
+    with fichier_telecharge(file_id, mimeType) as (source, mt):
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                return f.read(), mt
+        return source.read(), mt
 
+@contextmanager
+def fichier_telecharge(
+    file_id: str,
+    mimeType: Optional[str] = None,
+    taille: Optional[int] = None,
+    progression: Optional[Callable[[int, Optional[int]], None]] = None,
+):
+    """
+    Télécharge (ou exporte) par morceaux de CHUNK_TELECHARGEMENT via MediaIoBaseDownload.
+    Produit (source, mime effectif) : source = flux mémoire si le fichier est petit, sinon
+    chemin d'un fichier temporaire (supprimé à la sortie du bloc).
+    progression(octets_reçus, total) est appelé après chaque morceau.
+    """
+    mt = mimeType or _executer(_drive().files().get(fileId=file_id, fields="mimeType")).get("mimeType")
     if mt in EXPORT_MIME:
-        export_mt = EXPORT_MIME[mt]
-        data = service.files().export_media(fileId=file_id, mimeType=export_mt).execute()
-        return (data, export_mt)
+        effective = EXPORT_MIME[mt]
+        request = _drive().files().export_media(fileId=file_id, mimeType=effective)
+    else:
+        effective = mt or "application/octet-stream"
+        request = _drive().files().get_media(fileId=file_id)
+    request.http = _http_local()
 
-    data = service.files().get_media(fileId=file_id).execute()
-    effective = mt or "application/octet-stream"
-    return (data, effective)
+    en_memoire = taille is not None and int(taille) <= EN_MEMOIRE_MAX_OCTETS
+    chemin = None
+    if en_memoire:
+        fh = io.BytesIO()
+    else:
+        dossier = os.path.join(tempfile.gettempdir(), "alfred_cache", "telechargements")
+        os.makedirs(dossier, exist_ok=True)
+        fd, chemin = tempfile.mkstemp(dir=dossier, suffix=".part")
+        fh = os.fdopen(fd, "w+b")
+    try:
+        downloader = MediaIoBaseDownload(fh, request, chunksize=CHUNK_TELECHARGEMENT)
+        done = False
+        while not done:
+            quota_google.acquerir("drive")
+            status, done = downloader.next_chunk(num_retries=3)
+            if progression and status is not None:
+                progression(status.resumable_progress, status.total_size)
+        fh.flush()
+        fh.seek(0)
+        if en_memoire:
+            yield fh, effective
+        else:
+            fh.close()
+            yield chemin, effective
+    finally:
+        fh.close()
+        if chemin:
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
 
 def _check_size_allowed(meta: Dict[str, str]) -> Optional[str]:
     size_str = meta.get("size")
@@ -173,55 +645,232 @@ def _check_size_allowed(meta: Dict[str, str]) -> Optional[str]:
     try:
         sz = int(size_str)
         if sz > MAX_FILE_SIZE_BYTES:
-            return f"⚠️ Fichier volumineux ({sz // (1024*1024)} Mo). Lecture bloquée (>10 Mo)."
+            return f"⚠️ Fichier volumineux ({sz // (1024*1024)} Mo). Lecture bloquée (>{MAX_FILE_SIZE_BYTES // (1024*1024)} Mo)."
     except Exception:
         pass
     return None
 
+def meta_fichier(file_id: str) -> Dict:
+    """Métadonnées (avec version md5Checksum / modifiedTime) : cache d'arbre s'il est construit, sinon un get."""
+    arbre = _arbre_pret(construire=False)
+    return (arbre.noeud(file_id) if arbre else None) or _executer(_drive().files().get(
+        fileId=file_id, fields="id,name,mimeType,size,modifiedTime,md5Checksum"
+    ))
+
 def lire_contenu_fichier(
     nom_fichier: Optional[str] = None,
     file_id: Optional[str] = None,
     extension: Optional[str] = None,
     parent_id: str = FOLDER_ID,
-    pdf_max_pages: int = DEFAULT_PDF_MAX_PAGES
+    pdf_max_pages: int = DEFAULT_PDF_MAX_PAGES,
+    utiliser_cache: bool = True,
+    progression: Optional[Callable[[int, Optional[int]], None]] = None,
 ) -> str:
     try:
         if not file_id:
-            candidats = rechercher_fichiers(nom=nom_fichier, extension=extension, parent_id=parent_id)
+            candidats = chercher_fichiers(nom_fichier, extension=extension, parent_id=parent_id)
             if not candidats:
                 return "❌ Fichier introuvable dans le dossier partagé. Précise le nom ou le sous-dossier."
             meta = candidats[0]
             note = f"[Plusieurs correspondances : je lis le premier match « {meta['name']} » parmi {len(candidats)}.]\n\n" if len(candidats) > 1 else ""
         else:
-            meta = service.files().get(fileId=file_id, fields="id,name,mimeType,size").execute()
+            meta = meta_fichier(file_id)
             note = ""
 
         err = _check_size_allowed(meta)
         if err:
             return err
 
-        data, effective_mime = telecharger_fichier(meta["id"])
-
-        mt = effective_mime
-        out = ""
-        if mt == "text/plain":
-            out = lire_txt_bytes(data)
-        elif mt == "application/pdf":
-            out = lire_pdf_bytes(data, max_pages=pdf_max_pages)
-        elif mt == "text/csv":
-            out = lire_csv_bytes(data)
-        elif mt in ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword"):
-            out = lire_docx_bytes(data)
-        elif mt in ("application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"):
-            import pandas as pd, io as _io
-            df = pd.read_excel(_io.BytesIO(data))
-            out = df.head(50).to_string(index=False)
-            if len(df) >= 50:
-                out += "\n\n---\n[Affichage partiel : premières 50 lignes]"
-        else:
-            out = "Format non pris en charge pour la lecture texte."
+        # Cache d'extraction : même fichier, même version, mêmes options => ni téléchargement ni parsing
+        version = cache_extraction.version_de(meta) if utiliser_cache else None
+        k = cache_extraction.cle(meta["id"], version, pdf_max_pages=pdf_max_pages) if version else None
+        out = cache_extraction.lire(k) if k else None
+        if out is None:
+            with fichier_telecharge(meta["id"], meta.get("mimeType"), meta.get("size"), progression) as (source, mt):
+                out = lire_source(source, mt, pdf_max_pages)
+            if k:
+                cache_extraction.ecrire(k, out)
 
         out = (note + out).strip()
         return out if out else "(Fichier vide ou non lisible en texte)"
     except Exception as e:
         return f"❌ Erreur lors de la lecture : {e}"
+
+def chemin_dossier(file_id: str) -> str:
+    """Dossier d'un fichier, relatif à la racine partagée (cache d'arbre déjà construit) ; '' si inconnu."""
+    arbre = _arbre_pret(construire=False)
+    if not arbre or not arbre.contient(file_id):
+        return ""
+    return arbre.chemin(file_id).rpartition("/")[0]
+
+# ====================== Préchargement (pendant que l'utilisateur choisit) ======================
+PREFETCH_N = int(os.getenv("ALFRED_DRIVE_PREFETCH", "3"))
+# Au-delà, pas de préchargement : un choix non fait ne doit pas coûter des centaines de Mo
+PREFETCH_MAX_OCTETS = int(os.getenv("ALFRED_DRIVE_PREFETCH_MAX_MB", "10")) * 1024 * 1024
+_POOL_PREFETCH = ThreadPoolExecutor(max_workers=2, thread_name_prefix="alfred-prefetch")
+_prefetch: Dict[str, Future] = {}
+_prefetch_lock = threading.Lock()
+
+def _prechargeable(f: Dict[str, Any]) -> bool:
+    """Taille connue et sous PREFETCH_MAX_OCTETS (résultat de recherche, sinon cache d'arbre déjà construit)."""
+    meta = f
+    if f.get("size") is None and ARBRE.construit:
+        meta = ARBRE.noeud(f["id"]) or f
+    taille = meta.get("size")
+    if taille is None:
+        # Google Docs / Sheets / Slides : pas de taille, l'export texte reste léger
+        return (meta.get("mimeType") or "").startswith("application/vnd.google-apps.")
+    return int(taille) <= PREFETCH_MAX_OCTETS
+
+def precharger(fichiers: List[Dict[str, Any]], n: int = PREFETCH_N) -> None:
+    """
+    Télécharge et extrait en tâche de fond les n premiers résultats ({id, size?, mimeType?}) ;
+    le cache d'extraction les servira. Les fichiers trop gros (ou de taille inconnue) sont ignorés.
+    """
+    with _prefetch_lock:
+        for fid in [k for k, fut in _prefetch.items() if fut.done()]:
+            del _prefetch[fid]
+        for f in [f for f in fichiers if f.get("id")][:max(0, n)]:
+            if f["id"] not in _prefetch and _prechargeable(f):
+                _prefetch[f["id"]] = _POOL_PREFETCH.submit(lire_contenu_fichier, file_id=f["id"])
+
+def lire_contenu_precharge(file_id: str, attente_max: float = 60.0) -> str:
+    """
+    lire_contenu_fichier(file_id) qui reprend un préchargement du même fichier s'il existe :
+    terminé => réponse immédiate ; en cours => on l'attend plutôt que de retélécharger.
+    """
+    with _prefetch_lock:
+        fut = _prefetch.pop(file_id, None)
+    if fut is not None:
+        try:
+            out = fut.result(timeout=attente_max)
+            if not out.startswith("❌"):
+                return out
+        except Exception:
+            pass
+    return lire_contenu_fichier(file_id=file_id)
+
+# ====================== Téléversement (upload résumable par morceaux) ======================
+# Protocole « resumable » de Drive : une session (URI), puis des PUT de morceaux multiples de
+# 256 Ko. Drive répond 308 + « Range: bytes=0-N » tant que ce n'est pas fini. Après une coupure,
+# on lui demande où il en est (Content-Range: bytes */total) et on reprend à cet octet : seul le
+# morceau en cours est gardé en mémoire, la source (fichier, flux, générateur) est lue au fil de l'eau.
+URL_UPLOAD = "https://www.googleapis.com/upload/drive/v3/files"
+MORCEAU_UPLOAD_UNITE = 256 * 1024
+CHUNK_TELEVERSEMENT = int(os.getenv("ALFRED_DRIVE_UPLOAD_CHUNK_MB", "8")) * 1024 * 1024
+ESSAIS_UPLOAD = 5
+
+SourceUpload = Union[bytes, bytearray, str, Any, Iterable[bytes]]
+
+class ErreurTeleversement(Exception):
+    pass
+
+def _blocs_source(source: SourceUpload, taille_lecture: int) -> Iterator[bytes]:
+    """bytes | chemin (str) | flux binaire (.read) | itérable de bytes/str -> blocs de bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        yield bytes(source)
+    elif isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from iter(lambda: f.read(taille_lecture), b"")
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(taille_lecture), b"")
+    else:
+        for bloc in source:
+            if bloc:
+                yield bloc.encode("utf-8") if isinstance(bloc, str) else bytes(bloc)
+
+def _taille_source(source: SourceUpload) -> Optional[int]:
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    if isinstance(source, str):
+        return os.path.getsize(source)
+    return None   # flux / générateur : taille connue seulement au dernier morceau
+
+def _octets_acquittes(resp) -> int:
+    """Octets reçus par Drive d'après l'en-tête Range d'une réponse 308 (« bytes=0-N »)."""
+    plage = resp.get("range")
+    return int(plage.rsplit("-", 1)[1]) + 1 if plage else 0
+
+def _ouvrir_session_upload(nom: str, parent_id: str, mime_type: str, taille: Optional[int]) -> str:
+    entetes = {"Content-Type": "application/json; charset=UTF-8", "X-Upload-Content-Type": mime_type}
+    if taille is not None:
+        entetes["X-Upload-Content-Length"] = str(taille)
+    quota_google.acquerir("drive")
+    resp, contenu = _http_local().request(
+        f"{URL_UPLOAD}?uploadType=resumable&fields={CHAMPS_NOEUD}", "POST",
+        body=json.dumps({"name": nom, "parents": [parent_id]}), headers=entetes,
+    )
+    if resp.status != 200 or not resp.get("location"):
+        raise ErreurTeleversement(f"ouverture de session refusée (HTTP {resp.status}) : {contenu[:200]!r}")
+    return resp["location"]
+
+def _put_upload(uri: str, corps: bytes, content_range: str, total: str):
+    """PUT d'un morceau ; en cas de coupure / 5xx / 429, redemande l'état de la session (après backoff)."""
+    for essai in range(ESSAIS_UPLOAD):
+        quota_google.acquerir("drive")
+        try:
+            resp, contenu = _http_local().request(uri, "PUT", body=corps, headers={"Content-Range": content_range})
+            if resp.status < 500 and resp.status != 429:
+                return resp, contenu
+        except (httplib2.HttpLib2Error, OSError):
+            clientsgoogle.reinitialiser_http("drive")   # transport peut-être cassé : on en reconstruit un
+        time.sleep(quota_google.delai_reprise(essai))
+        try:
+            resp, contenu = _http_local().request(uri, "PUT", body=b"", headers={"Content-Range": f"bytes */{total}"})
+            if resp.status in (200, 201, 308):
+                return resp, contenu   # 308 : la boucle appelante reprend à l'octet acquitté
+        except (httplib2.HttpLib2Error, OSError):
+            clientsgoogle.reinitialiser_http("drive")
+    raise ErreurTeleversement(f"échec après {ESSAIS_UPLOAD} tentatives")
+
+def televerser_fichier(
+    source: SourceUpload,
+    nom: str,
+    parent_id: str = FOLDER_ID,
+    mime_type: Optional[str] = None,
+    taille: Optional[int] = None,
+    taille_morceau: int = CHUNK_TELEVERSEMENT,
+    progression: Optional[Callable[[int, Optional[int]], None]] = None,
+) -> Dict:
+    """
+    Téléverse 'source' sous le nom 'nom' dans parent_id ; retourne les métadonnées du fichier créé.
+    - source : bytes, chemin local, flux binaire ou générateur de bytes (lu morceau par morceau).
+    - taille_morceau : arrondie au multiple de 256 Ko (exigence Drive).
+    - progression(octets_acquittés, total ou None) après chaque morceau.
+    Lève ErreurTeleversement si Drive refuse ou si la reprise échoue.
+    """
+    morceau = max(MORCEAU_UPLOAD_UNITE, taille_morceau // MORCEAU_UPLOAD_UNITE * MORCEAU_UPLOAD_UNITE)
+    mime_type = mime_type or mimetypes.guess_type(nom)[0] or "application/octet-stream"
+    if taille is None:
+        taille = _taille_source(source)
+    uri = _ouvrir_session_upload(nom, parent_id, mime_type, taille)
+
+    blocs = _blocs_source(source, morceau)
+    tampon = bytearray()
+    acquitte, epuise = 0, False
+    while True:
+        while not epuise and len(tampon) <= morceau:   # un octet d'avance : on sait si c'est le dernier
+            try:
+                tampon += next(blocs)
+            except StopIteration:
+                epuise = True
+        dernier = epuise and len(tampon) <= morceau
+        envoi = bytes(tampon if dernier else tampon[:morceau])
+        total = str(acquitte + len(envoi)) if dernier else (str(taille) if taille is not None else "*")
+        plage = f"bytes {acquitte}-{acquitte + len(envoi) - 1}/{total}" if envoi else f"bytes */{total}"
+
+        resp, contenu = _put_upload(uri, envoi, plage, total)
+        if resp.status in (200, 201):
+            cree = json.loads(contenu)
+            if progression:
+                progression(int(total), int(total))
+            if ARBRE.construit:
+                ARBRE.noter(cree)
+            return cree
+        if resp.status != 308:
+            raise ErreurTeleversement(f"HTTP {resp.status} : {contenu[:200]!r}")
+        recu = max(acquitte, _octets_acquittes(resp))
+        del tampon[:recu - acquitte]
+        acquitte = recu
+        if progression:
+            progression(acquitte, taille)
@@ -11,21 +11,22 @@ import time
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 
-import streamlit as st
+# Streamlit n'est importé que dans les fonctions d'UI : la brique se charge aussi hors UI (moteur_alfred)
 from googleapiclient.http import MediaIoBaseDownload
 
+import quota_google
+from skills.registry import triggers as registry_triggers
+
 from memoire_alfred import answer_with_memories
+from llm import PURPOSE_EMAIL
 from connexiongmail import get_gmail_service, list_send_as, send_email
-from connexiongoogledrive import service as DRIVE_SERVICE  # client Drive global (peut être None)
+import clientsgoogle  # client Drive partagé (construit au premier besoin)
+from connexiongoogledrive import chercher_fichiers
 
 # ========================= Intention =========================
 
-TRIGGERS = [
-    "envoie un mail","envois un mail","envoyer un mail","envoi un mail","envoi d'un mail",
-    "envoie un email","envois un email","envoyer un email","envoi un email","envoi d'un email",
-    "écris un mail","ecris un mail","écris un email","ecris un email",
-    "écrire un mail","écrire un email","mail à","email à","/mail","/email"
-]
+# Déclencheurs : ceux de la brique "email" du manifest (skills/manifest.json), seule source
+TRIGGERS = registry_triggers("email")
 
 def is_email_intent(text: str) -> bool:
     low = (text or "").lower()
@@ -54,12 +55,18 @@ def _plain_to_html(text: str) -> str:
         lines.append(f"<p>{escape(line)}</p>" if line.strip() else "<br>")
     return "".join(lines)
 
+# Instructions statiques (préfixe stable => cache de prompt côté fournisseur)
+EMAIL_SYSTEM_PROMPT = (
+    "Tu es Alfred. Rédige un courriel clair et concis en HTML très simple."
+    "\nFormat attendu:\nOBJET: <une ligne>\nHTML:\n<p>…</p>\n"
+    "Si un contexte mémoire est fourni, utilise-le seulement s'il est pertinent."
+)
+
 def _llm_write_email(user_text: str, signature: str = "— Selwan") -> dict:
-    prompt_sys = (
-        "Tu es Alfred. Rédige un courriel clair et concis en HTML très simple."
-        "\nFormat attendu:\nOBJET: <une ligne>\nHTML:\n<p>…</p>\n"
+    raw = answer_with_memories(
+        f"INSTRUCTION:\n{user_text}\n", k=6,
+        purpose=PURPOSE_EMAIL, site="email.redaction", system_msg=EMAIL_SYSTEM_PROMPT,
     )
-    raw = answer_with_memories(f"{prompt_sys}\n\nINSTRUCTION:\n{user_text}\n", k=6)
 
     subj = "Message"
     html_out = f"<p>{user_text}</p>"
@@ -101,15 +108,9 @@ GOOGLE_EXPORT_MAP: Dict[str, Tuple[str, str]] = {
         ("application/pdf", ".pdf"),
 }
 
-def _drive_find_first_by_snippet(service, snippet: str) -> Optional[Dict[str, Any]]:
-    safe = (snippet or "").replace("'", "\\'")
-    q = f"name contains '{safe}' and trashed=false"
-    res = service.files().list(
-        q=q, spaces="drive",
-        fields="files(id,name,mimeType,modifiedTime,size,parents)",
-        pageSize=10
-    ).execute()
-    files = res.get("files", []) if isinstance(res, dict) else []
+def _drive_find_first_by_snippet(snippet: str) -> Optional[Dict[str, Any]]:
+    """Meilleur fichier du dossier partagé pour ce bout de nom (même recherche classée que le routeur)."""
+    files = chercher_fichiers(snippet, limite=1)
     return files[0] if files else None
 
 def _drive_download_or_export(service, file_id: str, name: str, mime_type: str) -> Tuple[bytes, str, str]:
@@ -128,10 +129,12 @@ def _drive_download_or_export(service, file_id: str, name: str, mime_type: str)
             guessed = mimetypes.guess_extension(final_mime) or ".bin"
             final_name = final_name + guessed
 
+    request.http = clientsgoogle.http_local("drive")   # transport du thread courant
     fh = io.BytesIO()
     downloader = MediaIoBaseDownload(fh, request)
     done = False
     while not done:
+        quota_google.acquerir("drive")
         _, done = downloader.next_chunk()
     data = fh.getvalue()
     return data, final_mime, final_name
@@ -145,6 +148,8 @@ def _tmp_root() -> Path:
     return root
 
 def _save_tmp(data: bytes, filename: str) -> Path:
+    import streamlit as st
+
     root = _tmp_root()
     safe = (filename or "piece_jointe.bin").replace("/", "_").replace("\\", "_")
     p = root / safe
@@ -169,14 +174,16 @@ def _cleanup_tmp_paths(paths: List[str]):
         pass
 
 def _resolve_drive_to_tmp(snippet: str) -> Tuple[Optional[Path], Optional[str]]:
-    if DRIVE_SERVICE is None:
+    try:
+        drive = clientsgoogle.drive()
+    except Exception:
         return None, "Service Drive indisponible (vérifie les identifiants/permissions)."
-    meta = _drive_find_first_by_snippet(DRIVE_SERVICE, snippet.strip())
+    meta = _drive_find_first_by_snippet(snippet.strip())
     if not meta:
         return None, "Fichier introuvable dans le dossier partagé. Précise le nom ou le sous-dossier."
     try:
         data, _, name = _drive_download_or_export(
-            DRIVE_SERVICE,
+            drive,
             meta["id"],
             meta.get("name", "fichier"),
             meta.get("mimeType", "application/octet-stream"),
@@ -194,7 +201,7 @@ def _verify_gmail_persisted(service, msg_id: str, expected_attachments: int, tim
     last_meta: Dict[str, Any] = {}
     while time.time() - t0 < timeout_s:
         try:
-            meta = service.users().messages().get(userId="me", id=msg_id, format="full").execute()
+            meta = quota_google.executer(service.users().messages().get(userId="me", id=msg_id, format="full"), "gmail")
             last_meta = meta or {}
             labels = set(meta.get("labelIds", []))
             # Compte des pièces jointes vues par Gmail
@@ -209,31 +216,38 @@ def _verify_gmail_persisted(service, msg_id: str, expected_attachments: int, tim
 
 # ========================= Contexte / UI persistente =========================
 
-def maybe_bootstrap_email(user_prompt: str) -> bool:
-    if not is_email_intent(user_prompt):
-        return False
-
-    st.session_state.setdefault("email_ctx", None)
-    st.session_state.setdefault("email_result", None)
+_CONTACTS = {
+    "guillaume": "guillaume@exemple.com",
+    "selwan": "selwan@selwancirque.com",
+}
 
-    contacts = {
-        "guillaume": "guillaume@exemple.com",
-        "selwan": "selwan@selwancirque.com",
-    }
+def rediger_brouillon(user_prompt: str) -> Dict[str, Any]:
+    """Brouillon complet (expéditeur, destinataire, sujet, corps) sans aucune UI — utilisable hors Streamlit."""
     draft = _llm_write_email(user_prompt)
     from_candidates = _list_possible_from_safe()
-
-    ctx = {
+    return {
         "from_address": _prefer_alfred(from_candidates),
-        "to_address": _extract_to_address(user_prompt, contacts),
+        "to_address": _extract_to_address(user_prompt, _CONTACTS),
         "subject": draft["subject"],
         "html": draft["html"],
         "text": draft["text"],
         "attachments": [],
     }
-    st.session_state["email_ctx"] = ctx
-    st.session_state["email_local_files"] = []
-    st.session_state["email_drive_added"] = []
+
+def maybe_bootstrap_email(user_prompt: str, etat=None) -> bool:
+    """Crée le contexte email dans la session (st.session_state par défaut, ou session du moteur)."""
+    if not is_email_intent(user_prompt):
+        return False
+    if etat is None:
+        import streamlit as st
+        etat = st.session_state
+
+    etat.setdefault("email_ctx", None)
+    etat.setdefault("email_result", None)
+
+    etat["email_ctx"] = rediger_brouillon(user_prompt)
+    etat["email_local_files"] = []
+    etat["email_drive_added"] = []
     return True
 
 def _list_possible_from_safe() -> List[str]:
@@ -250,6 +264,8 @@ def _prefer_alfred(cands: List[str]) -> Optional[str]:
     return cands[0] if cands else None
 
 def email_flow_persist(_push_history=None) -> bool:
+    import streamlit as st
+
     ctx = st.session_state.get("email_ctx")
     res = st.session_state.get("email_result")
     if ctx is None and res is None:
@@ -272,7 +288,7 @@ def email_flow_persist(_push_history=None) -> bool:
             if isinstance(res, dict) and res.get("id"):
                 try:
                     svc = get_gmail_service()
-                    meta = svc.users().messages().get(userId="me", id=res["id"], format="metadata").execute()
+                    meta = quota_google.executer(svc.users().messages().get(userId="me", id=res["id"], format="metadata"), "gmail")
                     thread_id = meta.get("threadId")
                     labels = ", ".join(meta.get("labelIds", []))
                     snippet = meta.get("snippet", "")
@@ -376,6 +392,8 @@ def email_flow_persist(_push_history=None) -> bool:
 # ========================= Envoi =========================
 
 def _materialize_all_tmp() -> List[Path]:
+    import streamlit as st
+
     tmp_paths: List[Path] = []
     for up in st.session_state.get("email_local_files", []):
         data = up.getvalue()
@@ -387,6 +405,8 @@ def _materialize_all_tmp() -> List[Path]:
     return tmp_paths
 
 def _do_send_now():
+    import streamlit as st
+
     ctx = st.session_state.get("email_ctx") or {}
     to_addr = (ctx.get("to_address") or "").strip()
     if not to_addr:
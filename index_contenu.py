@@ -0,0 +1,299 @@
+# index_contenu.py — Index plein texte du contenu des fichiers Drive (sous FOLDER_ID)
+# - Le texte extrait (mêmes extracteurs que la lecture, via le cache d'extraction) est découpé en
+#   passages d'une soixantaine de mots, indexés dans un index inversé classé BM25.
+# - Indexation incrémentale en tâche de fond : seuls les fichiers nouveaux ou modifiés
+#   (md5Checksum / modifiedTime) sont relus ; les fichiers disparus sont retirés.
+# - rechercher() : fichiers classés + extrait ; contexte_passages() : contexte pour le LLM de réponse.
+# - L'index est persisté sur disque (<tmp>/alfred_cache/index_contenu.json.gz) et rechargé au démarrage.
+
+from __future__ import annotations
+import os, re, gzip, json, math, time, tempfile, threading, unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable
+
+# ====================== Réglages ======================
+MOTS_PAR_PASSAGE = 60
+RECOUVREMENT = 15
+PDF_PAGES_INDEXEES = 50
+INTERVALLE_S = float(os.getenv("ALFRED_CONTENT_INDEX_INTERVAL_S", "600"))
+ACTIF = os.getenv("ALFRED_CONTENT_INDEX", "1") == "1"
+CHEMIN = Path(os.getenv("ALFRED_CACHE_DIR") or Path(tempfile.gettempdir()) / "alfred_cache") / "index_contenu.json.gz"
+K1, B = 1.5, 0.75
+
+TYPES_INDEXABLES = {
+    "text/plain", "text/csv", "application/pdf", "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "application/vnd.google-apps.document", "application/vnd.google-apps.spreadsheet",
+}
+
+# (sans accents : la comparaison se fait après normalisation)
+_MOTS_VIDES = set("""
+a au aux avec ce ces cet cette dans de des du elle en et est il ils je la le les leur lui ma mais me
+mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un
+une vos votre vous y sont ete etre avoir fait plus comme tout tous
+""".split())
+
+# ====================== Texte ======================
+def _sans_accents(t: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", t) if not unicodedata.combining(c))
+
+def tokeniser(texte: str) -> List[str]:
+    """Minuscules, sans accents, sans mots vides ; pluriels simples ramenés au singulier."""
+    out = []
+    for mot in re.findall(r"\w+", _sans_accents((texte or "").lower())):
+        if len(mot) < 2 or mot in _MOTS_VIDES or (mot.isdigit() and len(mot) < 3):
+            continue
+        if len(mot) > 3 and mot[-1] in "sx":
+            mot = mot[:-1]
+        out.append(mot)
+    return out
+
+def _decouper(texte: str) -> List[str]:
+    mots = (texte or "").split()
+    pas = MOTS_PAR_PASSAGE - RECOUVREMENT
+    return [" ".join(mots[i:i + MOTS_PAR_PASSAGE]) for i in range(0, max(1, len(mots) - RECOUVREMENT), pas)] if mots else []
+
+# ====================== Index ======================
+class IndexContenu:
+    """Index inversé par passage : terme -> {passage: tf}, classement BM25."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.fichiers: Dict[str, Dict[str, Any]] = {}      # id -> {name, version, passages: [pid]}
+        self.passages: Dict[str, Dict[str, Any]] = {}      # pid -> {file_id, texte, n}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self._longueur_totale = 0
+
+    # ----- écriture -----
+    def indexer(self, file_id: str, nom: str, version: Optional[str], texte: str) -> int:
+        """(Ré)indexe un fichier ; retourne le nb de passages."""
+        with self._lock:
+            self.retirer(file_id)
+            pids = []
+            # le nom du fichier compte comme un passage à part entière (« bail appartement.pdf »)
+            morceaux = [(f"{file_id}#nom", os.path.splitext(nom or "")[0])]
+            morceaux += [(f"{file_id}#{i}", passage) for i, passage in enumerate(_decouper(texte))]
+            for pid, passage in morceaux:
+                termes = tokeniser(passage)
+                if not termes:
+                    continue
+                self.passages[pid] = {"file_id": file_id, "texte": passage, "n": len(termes)}
+                self._longueur_totale += len(termes)
+                for terme, tf in Counter(termes).items():
+                    self.postings.setdefault(terme, {})[pid] = tf
+                pids.append(pid)
+            self.fichiers[file_id] = {"name": nom, "version": version, "passages": pids}
+            return len(pids)
+
+    def retirer(self, file_id: str) -> None:
+        with self._lock:
+            info = self.fichiers.pop(file_id, None)
+            if not info:
+                return
+            for pid in info["passages"]:
+                p = self.passages.pop(pid, None)
+                if not p:
+                    continue
+                self._longueur_totale -= p["n"]
+                for terme in set(tokeniser(p["texte"])):
+                    post = self.postings.get(terme)
+                    if post is not None:
+                        post.pop(pid, None)
+                        if not post:
+                            del self.postings[terme]
+
+    def version(self, file_id: str) -> Optional[str]:
+        info = self.fichiers.get(file_id)
+        return info["version"] if info else None
+
+    # ----- lecture -----
+    def _scores(self, requete: str) -> Dict[str, float]:
+        termes = set(tokeniser(requete))
+        n = len(self.passages)
+        if not termes or not n:
+            return {}
+        moy = self._longueur_totale / n
+        scores: Dict[str, float] = {}
+        for terme in termes:
+            post = self.postings.get(terme)
+            if not post:
+                continue
+            idf = math.log(1 + (n - len(post) + 0.5) / (len(post) + 0.5))
+            for pid, tf in post.items():
+                dl = self.passages[pid]["n"]
+                scores[pid] = scores.get(pid, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / moy))
+        return scores
+
+    def rechercher(self, requete: str, k: int = 5, filtre: Optional[Callable[[str], bool]] = None) -> List[Dict[str, Any]]:
+        """Fichiers classés (meilleur passage + bonus des autres passages) avec l'extrait le plus pertinent."""
+        with self._lock:
+            par_fichier: Dict[str, List] = {}
+            for pid, sc in self._scores(requete).items():
+                fid = self.passages[pid]["file_id"]
+                if filtre and not filtre(fid):
+                    continue
+                par_fichier.setdefault(fid, []).append((sc, pid))
+            out = []
+            for fid, lst in par_fichier.items():
+                lst.sort(reverse=True)
+                score = lst[0][0] + 0.25 * sum(s for s, _ in lst[1:4])
+                # extrait : meilleur passage de contenu (le passage « nom » seulement à défaut)
+                pid_extrait = next((pid for _, pid in lst if not pid.endswith("#nom")), lst[0][1])
+                out.append({
+                    "id": fid,
+                    "name": self.fichiers[fid]["name"],
+                    "score": round(score, 3),
+                    "extrait": extrait(self.passages[pid_extrait]["texte"], requete),
+                })
+            out.sort(key=lambda r: r["score"], reverse=True)
+            return out[:k]
+
+    def passages_pertinents(self, requete: str, k: int = 6, score_min: float = 0.0) -> List[Dict[str, Any]]:
+        with self._lock:
+            classes = sorted(
+                ((pid, sc) for pid, sc in self._scores(requete).items() if not pid.endswith("#nom")),
+                key=lambda x: x[1], reverse=True,
+            )[:k]
+            return [
+                {"name": self.fichiers[self.passages[pid]["file_id"]]["name"], "texte": self.passages[pid]["texte"], "score": round(sc, 3)}
+                for pid, sc in classes if sc >= score_min
+            ]
+
+    def taille(self) -> Dict[str, int]:
+        with self._lock:
+            return {"fichiers": len(self.fichiers), "passages": len(self.passages), "termes": len(self.postings)}
+
+    # ----- persistance -----
+    def sauver(self, chemin: Path = CHEMIN) -> None:
+        with self._lock:
+            data = {"fichiers": self.fichiers, "passages": self.passages}
+        try:
+            chemin.parent.mkdir(parents=True, exist_ok=True)
+            tmp = chemin.with_suffix(".part")
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, chemin)
+        except OSError:
+            pass
+
+    def charger(self, chemin: Path = CHEMIN) -> bool:
+        try:
+            with gzip.open(chemin, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self.fichiers = data.get("fichiers", {})
+            self.passages = data.get("passages", {})
+            self.postings, self._longueur_totale = {}, 0
+            for pid, p in self.passages.items():
+                self._longueur_totale += p["n"]
+                for terme, tf in Counter(tokeniser(p["texte"])).items():
+                    self.postings.setdefault(terme, {})[pid] = tf
+        return True
+
+def extrait(texte: str, requete: str, largeur: int = 220) -> str:
+    """Fenêtre de texte autour du premier terme de la requête, termes trouvés en gras."""
+    termes = set(tokeniser(requete))
+    mots = texte.split()
+    debut = 0
+    for i, m in enumerate(mots):
+        if set(tokeniser(m)) & termes:
+            debut = max(0, i - 8)
+            break
+    out = " ".join(mots[debut:])
+    if len(out) > largeur:
+        out = out[:largeur].rsplit(" ", 1)[0] + " …"
+    if debut > 0:
+        out = "… " + out
+    return " ".join(f"**{m}**" if set(tokeniser(m)) & termes else m for m in out.split())
+
+INDEX = IndexContenu()
+
+# ====================== Indexation en tâche de fond ======================
+_thread: Optional[threading.Thread] = None
+_etat = {"en_cours": False, "derniere_passe": None, "indexes": 0, "erreurs": 0}
+_demarrage_lock = threading.Lock()
+
+def passe_indexation(progression: Optional[Callable[[int, int], None]] = None) -> int:
+    """Une passe incrémentale sur l'arbre Drive ; retourne le nb de fichiers (ré)indexés."""
+    from connexiongoogledrive import ARBRE, FOLDER_ID, lire_contenu_fichier, _arbre_pret
+
+    arbre = _arbre_pret(FOLDER_ID)
+    if arbre is None:
+        return 0
+    vus, a_faire = set(), []
+    for n in arbre.descendants(FOLDER_ID):
+        if n.get("mimeType") not in TYPES_INDEXABLES:
+            continue
+        vus.add(n["id"])
+        version = n.get("md5Checksum") or n.get("modifiedTime")
+        if INDEX.version(n["id"]) != version:
+            a_faire.append((n, version))
+    for fid in [f for f in list(INDEX.fichiers) if f not in vus]:
+        INDEX.retirer(fid)
+
+    faits = 0
+    for i, (n, version) in enumerate(a_faire, 1):
+        texte = lire_contenu_fichier(file_id=n["id"], pdf_max_pages=PDF_PAGES_INDEXEES)
+        if texte.startswith(("❌", "⚠️")):
+            # échec de lecture (téléchargement, quota…) : nom indexé, contenu retenté à la passe suivante
+            _etat["erreurs"] += 1
+            texte, version = "", None
+        elif texte.startswith("Format non pris en charge"):
+            texte = ""
+        INDEX.indexer(n["id"], n.get("name", ""), version, texte)
+        faits += 1
+        if progression:
+            progression(i, len(a_faire))
+        if faits % 20 == 0:
+            INDEX.sauver()
+    if faits or len(vus) != len(INDEX.fichiers):
+        INDEX.sauver()
+    return faits
+
+def _boucle() -> None:
+    while True:
+        _etat["en_cours"] = True
+        try:
+            _etat["indexes"] += passe_indexation()
+        except Exception:
+            _etat["erreurs"] += 1
+        _etat["en_cours"] = False
+        _etat["derniere_passe"] = time.time()
+        time.sleep(INTERVALLE_S)
+
+def demarrer_indexation() -> bool:
+    """Lance (une seule fois) l'indexeur de fond ; recharge d'abord l'index persisté."""
+    global _thread
+    if not ACTIF:
+        return False
+    with _demarrage_lock:
+        if _thread is None:
+            INDEX.charger()
+            _thread = threading.Thread(target=_boucle, name="alfred-index-contenu", daemon=True)
+            _thread.start()
+    return True
+
+def etat_indexation() -> Dict[str, Any]:
+    return {**_etat, **INDEX.taille()}
+
+# ====================== API pour le routeur / le LLM ======================
+def rechercher(requete: str, k: int = 5, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    filtre = None
+    if parent_id:
+        from connexiongoogledrive import ARBRE
+        filtre = lambda fid: ARBRE.est_descendant(fid, parent_id)
+    return INDEX.rechercher(requete, k=k, filtre=filtre)
+
+def contexte_passages(question: str, k: int = 5, score_min: float = 2.0) -> Optional[str]:
+    """Bloc de contexte « documents Drive » pour le LLM de réponse (None si rien d'assez pertinent)."""
+    if not INDEX.passages:
+        return None
+    found = INDEX.passages_pertinents(question, k=k, score_min=score_min)
+    if not found:
+        return None
+    lignes = [f"- ({p['name']}) {p['texte']}" for p in found]
+    return "[Contexte — Extraits de documents Drive]\n" + "\n".join(lignes)
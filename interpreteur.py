@@ -1,6 +1,6 @@
 import json
 import re
-from llm import repondre_chat, get_model
+from llm import repondre_chat, get_model, PURPOSE_INTENT
 
 # -------------------------------
 # Helpers de détection / slots
@@ -11,8 +11,15 @@ def _mentions_drive(u: str) -> bool:
 def _mentions_fichier_ou_dossier(u: str) -> bool:
     return any(k in u for k in ["fichier", "dossier", "sous dossier", "sous-dossier"])
 
+# « dossier Voyages » : un dossier précis est nommé (pas le Drive lui-même ni la racine)
+_RX_DOSSIER_NOMME = re.compile(
+    r"\b(?:sous[- ]?)?(?:dossier|r[ée]pertoire)\s+(?!(?:de\s+|du\s+)?(?:mon\s+|le\s+)?(?:google\s+)?drive\b|racine\b)\w"
+)
+
 def _aliases_drive_vers_racine(utterance: str):
     u = (utterance or "").strip().lower()
+    if _RX_DOSSIER_NOMME.search(u):
+        return None  # laisser la grammaire locale ou le LLM extraire le dossier
     if re.search(r"\b(mon\s+)?(google\s+)?drive\b", u) and any(
         k in u for k in ["contenu", "dossier", "affiche", "montre", "voir", "liste"]
     ):
@@ -34,9 +41,308 @@ def _detect_confirme_annule(u: str):
         return {"action": "annuler"}
     return None
 
+# -------------------------------
+# Pré-classifieur : la phrase concerne-t-elle Drive ?
+# -------------------------------
+# Score lexical bon marché ; sous le seuil, on n'appelle PAS le LLM d'intention
+# (la conversation ordinaire part directement en réponse enrichie par la mémoire).
+SEUIL_SIGNAL_DRIVE = 2.0
+
+_LEXIQUE_DRIVE = [
+    (re.compile(r"\b(?:pdf|docx?|xlsx?|csv|txt|pptx?|odt|ods)\b"), 2.0),
+    (re.compile(r"\.[a-z0-9]{2,5}\b"), 1.0),
+    (re.compile(r"\b(?:documents?|r[ée]pertoires?|classeurs?|tableurs?|feuilles?\s+de\s+calcul|pi[èe]ces?\s+jointes?)\b"), 1.5),
+    (re.compile(r"\b(?:arborescence|corbeille|partag[ée]s?|t[ée]l[ée]charge[rz]?|enregistre[rz]?|sauvegarde[rz]?)\b"), 1.0),
+    (re.compile(r"\b(?:lis|lire|ouvre|ouvrir|cr[ée]{1,2}r?|supprime[rz]?|efface[rz]?|renomme[rz]?|d[ée]place[rz]?|range[rz]?|liste[rz]?|cherche[rz]?|recherche[rz]?|trouve[rz]?|r[ée]sume[rz]?|affiche[rz]?)\b"), 0.5),
+]
+
+def score_signal_drive(prompt_utilisateur: str) -> float:
+    """Score de « signal Drive » d'une phrase (mots-clés forts + petit lexique pondéré)."""
+    u = (prompt_utilisateur or "").strip().lower()
+    if not u:
+        return 0.0
+    score = 0.0
+    if _mentions_drive(u):
+        score += 3.0
+    if _mentions_fichier_ou_dossier(u):
+        score += 2.0
+    for rx, poids in _LEXIQUE_DRIVE:
+        if rx.search(u):
+            score += poids
+    return score
+
+def a_signal_drive(prompt_utilisateur: str) -> bool:
+    return score_signal_drive(prompt_utilisateur) >= SEUIL_SIGNAL_DRIVE
+
+# -------------------------------
+# Grammaire locale (sans LLM) des commandes Drive courantes
+# -------------------------------
+# Les formes fréquentes sont résolues par motifs compilés ; tout ce qui est
+# ambigu renvoie None et part au LLM.
+_DET = r"(?:(?:le|la|les|un|une|du|des|mon|ma|mes|ce|cette)\s+|l['’]\s*)?"
+_NOM = r"[«\"']?\s*(?P<nom>.+?)\s*[»\"']?"
+_PARENT = r"(?:\s+(?:dans|sous)\s+" + _DET + r"(?:sous[- ]?dossier\s+|dossier\s+)?[«\"']?\s*(?P<parent>.+?)\s*[»\"']?)?"
+
+_RX_CHOIX = re.compile(
+    r"^(?:choisis|choisir|prends|prend|s[ée]lectionne|ouvre|lis)?\s*(?:le\s+)?"
+    r"(?:(?:num[ée]ro|n°|no|#)\s*)(?P<index>\d{1,3})$"
+    r"|^(?:choisis|choisir|prends|prend|s[ée]lectionne)\s+(?:le\s+)?(?P<index2>\d{1,3})$"
+)
+_RX_SUITE = re.compile(
+    r"(?:(?:la|et\s+la)\s+)?suite|page\s+suivante|(?:la\s+)?page\s+d['’]apr[èe]s"
+    r"|(?:affiche|montre|donne)(?:[- ]moi)?\s+la\s+suite|continue(?:\s+(?:le\s+)?listage)?"
+)
+_RX_CREER = re.compile(
+    r"^(?:cr[ée]{1,2}r?|fais|ajoute)(?:[- ]moi)?\s+" + _DET + r"(?:nouveau\s+)?"
+    r"(?P<type>sous[- ]?dossier|dossier)\s+(?:nomm[ée]|appel[ée]|intitul[ée]\s+)?" + _NOM + _PARENT + r"$"
+)
+_RX_SUPPRIMER = re.compile(
+    r"^(?:supprime|supprimer|efface|effacer|mets\s+(?:à|a)\s+la\s+corbeille)\s+" + _DET +
+    r"(?P<type>fichiers?|sous[- ]?dossiers?|dossiers?)\s+" + _NOM + _PARENT + r"$"
+)
+_RX_LIRE = re.compile(
+    r"^(?:lis|lire|ouvre|ouvrir|affiche|montre)(?:[- ]moi)?\s+" + _DET +
+    r"(?:fichier|document|doc)\s+" + _NOM + _PARENT + r"$"
+)
+_RX_LIRE_NOM_EXT = re.compile(
+    r"^(?:lis|lire|ouvre|ouvrir)(?:[- ]moi)?\s+" + _DET + r"(?P<nom>[^\s]+\.[a-z0-9]{2,5})" + _PARENT + r"$"
+)
+_RX_RECHERCHER_CONTENU = re.compile(
+    r"^(?:trouve|cherche|recherche|retrouve)(?:[- ]moi)?\s+" + _DET +
+    r"(?:document|fichier|doc|pdf|texte|contrat)s?\s+"
+    r"(?:qui\s+parlen?t?\s+(?:de\s+(?:la\s+|l['’]\s*)?|du\s+|des\s+|d['’]\s*)|parlant\s+(?:de|du|des)\s+"
+    r"|o[uù]\s+(?:il\s+est|on)\s+(?:question|parle)\s+(?:de|du|des|d['’])\s*"
+    r"|(?:à|a)\s+propos\s+(?:de|du|des|d['’])\s*|concernant\s+|sur\s+)"
+    r"(?P<terme>.+)$"
+    r"|^(?:quels?|quelles?)\s+(?:documents?|fichiers?)\s+(?:parlen?t?|traitent?|mentionnen?t?)\s+(?:de\s+(?:la\s+|l['’]\s*)?|du\s+|des\s+|d['’]\s*)?(?P<terme2>.+)$"
+)
+_RX_RECHERCHER = re.compile(
+    r"^(?:cherche|recherche|trouve)(?:[- ]moi)?\s+" + _DET +
+    r"(?:fichiers?|documents?)\s+(?:nomm[ée]s?\s+|appel[ée]s?\s+|intitul[ée]s?\s+)?" + _NOM + _PARENT + r"$"
+)
+_RX_LISTER = re.compile(
+    r"^(?:liste|lister|affiche|montre|ouvre|voir)(?:[- ]moi)?\s+" + _DET +
+    r"(?:contenu\s+(?:du|de\s+la|de)\s+)?(?:sous[- ]?dossier|dossier)\s+" + _NOM + r"$"
+)
+_RX_RESUMER = re.compile(
+    r"^(?:r[ée]sume|r[ée]sumer|fais(?:[- ]moi)?\s+un\s+r[ée]sum[ée]\s+(?:du|de\s+la|de))"
+    r"(?:[- ](?:le|la|moi)\b)?"
+    r"(?:\s+" + _DET + r"(?:fichier|document|doc)(?:\s+" + _NOM + r")?)?$"
+)
+_RX_ENREGISTRER = re.compile(
+    r"^(?:enregistre|sauvegarde|sauve|range|d[ée]pose|t[ée]l[ée]verse|exporte|mets)(?:[- ]moi)?\s+"
+    r"(?P<quoi>ça|ca|cela|celui-ci|(?:le|ce|ton)\s+r[ée]sum[ée]|(?:ta|cette)\s+r[ée]ponse"
+    r"|(?:la|cette|notre)\s+(?:conversation|discussion)|(?:la|cette)\s+pi[èe]ce\s+jointe|le\s+fichier\s+joint)"
+    r"(?:\s+sur\s+(?:le\s+|mon\s+)?(?:google\s+)?drive)?"
+    r"(?:\s+(?:dans|sous(?!\s+le\s+nom\b))\s+" + _DET + r"(?:sous[- ]?dossier\s+|dossier\s+)?[«\"']?\s*(?P<parent>.+?)\s*[»\"']?)?"
+    r"(?:\s+(?:sous\s+le\s+nom(?:\s+de)?|en\s+tant\s+que|comme)\s+[«\"']?\s*(?P<nom>.+?)\s*[»\"']?)?$"
+)
+_EXT_DOC = r"pdf|docx?|txt|csv|xlsx?"
+_RX_RESUMER_DOSSIER = re.compile(
+    r"^(?:r[ée]sume|r[ée]sumer|synth[ée]tise|fais(?:[- ]moi)?\s+(?:un\s+r[ée]sum[ée]|une\s+synth[èe]se)\s+(?:des|du|de\s+la|de))\s+"
+    r"(?:(?:tous\s+|toutes\s+)?(?:les\s+|mes\s+)?"
+    r"(?:(?:fichiers?|documents?|docs?)(?:\s+(?P<ext>" + _EXT_DOC + r")s?)?|(?P<ext2>" + _EXT_DOC + r")s?)"
+    r"\s+(?:du|de\s+la|de|dans\s+(?:le\s+)?)\s*)?"
+    r"(?:le\s+|mon\s+|ce\s+)?(?:sous[- ]?dossier|dossier)\s+" + _NOM + r"$"
+)
+_RX_NOM_DEJA_LU = re.compile(r"^(?:que\s+tu\s+viens\s+de\s+lire|pr[ée]c[ée]dent|d['’]avant|ouvert)$")
+_RX_EXTENSION = re.compile(r"\.([a-z0-9]{2,5})$", flags=re.IGNORECASE)
+_RACINES = {"drive", "mon drive", "le drive", "google drive", "mon google drive", "racine"}
+
+def _nettoyer_slot(val):
+    if val is None:
+        return None
+    val = re.sub(r"\s+(?:sur|de)\s+(?:mon\s+|le\s+)?(?:google\s+)?drive$", "", val.strip(), flags=re.IGNORECASE)
+    val = val.strip(" «»\"'")
+    return val or None
+
+def _extension_de(nom):
+    m = _RX_EXTENSION.search(nom or "")
+    return m.group(1).lower() if m else None
+
+def _type_normalise(t: str) -> str:
+    t = (t or "").lower().replace(" ", "-").rstrip("s")
+    return "sous-dossier" if t.startswith("sous") else t
+
+_RX_NOM_FICHIER = re.compile(r"\.\w{1,5}$")
+
+def separer_noms(nom):
+    """
+    « a.pdf, b.pdf et c.txt » -> ['a.pdf', 'b.pdf', 'c.txt'].
+    Virgules / points-virgules toujours ; « et » seulement en fin d'énumération ou entre
+    deux noms de fichier (« Paul et Marie » reste un seul nom).
+    """
+    morceaux = [m.strip(" «»\"'") for m in re.split(r"\s*[,;]\s*", nom or "") if m.strip()]
+    if not morceaux:
+        return []
+    dernier = re.split(r"\s+et\s+", morceaux[-1], maxsplit=1)
+    if len(dernier) == 2 and (len(morceaux) > 1 or all(_RX_NOM_FICHIER.search(d) for d in dernier)):
+        morceaux[-1:] = [d.strip(" «»\"'") for d in dernier]
+    return [m for m in morceaux if m]
+
+def analyser_commande_locale(prompt_utilisateur: str):
+    """
+    Résout localement (sans LLM) les commandes Drive courantes.
+    Retourne un dict d'intention (même schéma que le LLM) ou None si la phrase
+    n'est pas reconnue / ambiguë.
+    """
+    u = (prompt_utilisateur or "").strip()
+    u = re.sub(r"\s+", " ", u).rstrip(" .!?")
+    low = u.lower()
+    if len(low) != len(u):  # casse non alignable (rare) : on garde les minuscules
+        u = low
+    if not low:
+        return None
+
+    # Suite d'un listage paginé (le routeur rend la main au LLM s'il n'y a pas de listage en cours)
+    if _RX_SUITE.fullmatch(low):
+        return {"action": "suite"}
+
+    m = _RX_CHOIX.match(low)
+    if m:
+        return {"action": "lire_match", "index": int(m.group("index") or m.group("index2"))}
+
+    # Les motifs sont évalués sur la version minuscule ; on réinjecte la casse d'origine
+    # des noms via les positions des groupes (même longueur).
+    def _slot(m, name):
+        if m.group(name) is None:
+            return None
+        return _nettoyer_slot(u[m.start(name):m.end(name)])
+
+    def _parent(m):
+        if m.groupdict().get("parent") is None:
+            return None
+        parent = _slot(m, "parent")
+        return None if (parent and parent.lower() in _RACINES) else parent
+
+    m = _RX_CREER.match(low)
+    if m:
+        nom = _slot(m, "nom")
+        if not nom:
+            return None
+        return {"action": "creer", "type": _type_normalise(m.group("type")), "nom": nom,
+                "extension": None, "parent": _parent(m)}
+
+    m = _RX_SUPPRIMER.match(low)
+    if m:
+        nom = _slot(m, "nom")
+        if not nom:
+            return None
+        intent = {"action": "supprimer", "type": _type_normalise(m.group("type")), "nom": nom,
+                  "extension": _extension_de(nom), "parent": _parent(m)}
+        noms = separer_noms(nom)
+        if len(noms) > 1:
+            intent["noms"] = noms
+        return intent
+
+    m = _RX_LISTER.match(low)
+    if m:
+        nom = _slot(m, "nom")
+        if not nom:
+            return None
+        if nom.lower() in _RACINES:
+            return {"action": "lister", "type": "dossier", "nom": None, "extension": None}
+        return {"action": "lister", "type": "dossier", "nom": nom, "extension": None, "parent": nom}
+
+    m = _RX_LIRE.match(low) or _RX_LIRE_NOM_EXT.match(low)
+    if m:
+        nom = _slot(m, "nom")
+        if not nom:
+            return None
+        return {"action": "lire", "type": "fichier", "nom": nom,
+                "extension": _extension_de(nom), "parent": _parent(m)}
+
+    m = _RX_RECHERCHER_CONTENU.match(low)
+    if m:
+        grp = "terme" if m.group("terme") is not None else "terme2"
+        terme = _slot(m, grp)
+        return {"action": "rechercher_contenu", "type": "fichier", "terme": terme} if terme else None
+
+    m = _RX_RECHERCHER.match(low)
+    if m:
+        nom = _slot(m, "nom")
+        # "trouve le document qui parle de ..." : recherche de contenu, pas de nom -> LLM
+        if not nom or re.match(r"^(?:qui|dont|o[uù]|avec|sur|parlant)\b", nom.lower()):
+            return None
+        return {"action": "rechercher", "type": "fichier", "nom": nom,
+                "extension": _extension_de(nom), "parent": _parent(m)}
+
+    m = _RX_ENREGISTRER.match(low)
+    if m:
+        quoi = m.group("quoi")
+        if re.search(r"conversation|discussion", quoi):
+            quoi = "conversation"
+        elif re.search(r"joint", quoi):
+            quoi = "piece_jointe"
+        else:
+            quoi = "dernier"
+        nom = _slot(m, "nom")
+        return {"action": "enregistrer", "type": "fichier", "quoi": quoi, "nom": nom,
+                "extension": _extension_de(nom), "parent": _parent(m)}
+
+    m = _RX_RESUMER_DOSSIER.match(low)
+    if m:
+        nom = _slot(m, "nom")
+        if not nom:
+            return None
+        ext = m.group("ext") or m.group("ext2")
+        return {"action": "resumer_dossier", "type": "dossier", "nom": nom, "extension": ext,
+                "parent": None if nom.lower() in _RACINES else nom}
+
+    m = _RX_RESUMER.match(low)
+    if m:
+        nom = _slot(m, "nom") if m.groupdict().get("nom") is not None else None
+        if nom and _RX_NOM_DEJA_LU.match(nom.lower()):
+            nom = None
+        return {"action": "resumer", "type": "fichier", "nom": nom, "extension": _extension_de(nom)}
+
+    return None
+
+# -------------------------------
+# Prompt système (STATIQUE : préfixe identique à chaque appel => cache de prompt)
+# -------------------------------
+_SYSTEM_PROMPT_DRIVE = (
+    "Tu es un routeur d'ordres pour Google Drive. Convertis la phrase en JSON compact.\n"
+    "Réponds UNIQUEMENT avec un JSON valide.\n"
+    "Champs possibles:\n"
+    "- action: {lister|lire|creer|supprimer|lire_match|resumer|resumer_dossier|rechercher_contenu|enregistrer|clarifier|confirmer|annuler}\n"
+    "- type: {fichier|dossier|sous-dossier}\n"
+    "- nom: string (nom fichier/dossier ciblé)\n"
+    "- extension: string|null\n"
+    "- parent: string|null (dossier parent si précisé par 'dans ...')\n"
+    "- manque: array de champs manquants si action=clarifier\n"
+    "- index: entier pour lire_match\n"
+    "- terme: string (sujet cherché DANS le contenu des documents, pour rechercher_contenu)\n"
+    "- quoi: {dernier|conversation|piece_jointe} pour enregistrer (ce qui est sauvegardé sur Drive)\n\n"
+    "Règles:\n"
+    "1) Si la phrase parle de 'fichier/dossier' (ou 'Drive'), suppose espace=Drive.\n"
+    "2) Pour SUPPRIMER (action destructrice), exige au moins: action='supprimer', type, nom. Si ambigu -> action='clarifier' avec manque.\n"
+    "3) 'Crée un dossier X dans Y' => {action:'creer', type:'dossier', nom:'X', parent:'Y'}\n"
+    "4) 'Supprime le sous dossier X dans Y' => {action:'supprimer', type:'sous-dossier', nom:'X', parent:'Y'}\n"
+    "5) 'Lis le fichier contrat.pdf' => {action:'lire', type:'fichier', nom:'contrat.pdf', extension:'pdf'}\n"
+    "6) 'Choisis 2' => {action:'lire_match', index:2}\n"
+    "7) 'Résume le document que tu viens de lire' => {action:'resumer'}\n"
+    "8) 'Trouve le document qui parle du bail' => {action:'rechercher_contenu', terme:'bail'}\n"
+    "9) 'Résume tous les PDF du dossier Contrats' => {action:'resumer_dossier', type:'dossier', nom:'Contrats', extension:'pdf', parent:'Contrats'}\n"
+    "10) 'Enregistre ça dans le dossier Notes' => {action:'enregistrer', type:'fichier', quoi:'dernier', parent:'Notes'}\n"
+    "11) Si incompris -> {action:'fallback'}\n"
+)
+
 # -------------------------------
 # Analyseur principal
 # -------------------------------
+def resolution_sans_llm(prompt_utilisateur: str):
+    """Intention résolue sans LLM (confirmation, grammaire locale, alias racine), sinon None."""
+    return (
+        _detect_confirme_annule(prompt_utilisateur)
+        or analyser_commande_locale(prompt_utilisateur)
+        or _aliases_drive_vers_racine(prompt_utilisateur)
+    )
+
+def appellera_llm_intention(prompt_utilisateur: str) -> bool:
+    """True si analyser_prompt_drive passera par le LLM d'intention (même ordre de décision)."""
+    return bool(prompt_utilisateur) and resolution_sans_llm(prompt_utilisateur) is None and a_signal_drive(prompt_utilisateur)
+
 def analyser_prompt_drive(prompt_utilisateur: str):
     """
     Retourne un JSON d'intention Drive **strict**.
@@ -46,51 +352,25 @@ def analyser_prompt_drive(prompt_utilisateur: str):
     if not prompt_utilisateur:
         return {"action": "fallback"}
 
-    # 1) confirmations
-    ca = _detect_confirme_annule(prompt_utilisateur)
-    if ca:
-        return ca
-
-    # 2) alias "Drive" vers racine
-    direct = _aliases_drive_vers_racine(prompt_utilisateur)
+    # 1) confirmations, 2) grammaire locale, 2b) alias "Drive" vers racine
+    direct = resolution_sans_llm(prompt_utilisateur)
     if direct:
         return direct
 
     # 3) extraction parent
     parent_nom = _extraire_parent(prompt_utilisateur or "")
 
-    u = (prompt_utilisateur or "").strip().lower()
-    espace = "drive" if (_mentions_drive(u) or _mentions_fichier_ou_dossier(u)) else None
-
-    # 4) Prompt système : on force une grammaire d'action stricte
-    system_prompt = (
-        "Tu es un routeur d'ordres pour Google Drive. Convertis la phrase en JSON compact.\n"
-        "Réponds UNIQUEMENT avec un JSON valide.\n"
-        "Champs possibles:\n"
-        "- action: {lister|lire|creer|supprimer|lire_match|resumer|clarifier|confirmer|annuler}\n"
-        "- type: {fichier|dossier|sous-dossier}\n"
-        "- nom: string (nom fichier/dossier ciblé)\n"
-        "- extension: string|null\n"
-        "- parent: string|null (dossier parent si précisé par 'dans ...')\n"
-        "- manque: array de champs manquants si action=clarifier\n"
-        "- index: entier pour lire_match\n\n"
-        "Règles:\n"
-        "1) Si la phrase parle de 'fichier/dossier' (ou 'Drive'), suppose espace=Drive.\n"
-        "2) Pour SUPPRIMER (action destructrice), exige au moins: action='supprimer', type, nom. Si ambigu -> action='clarifier' avec manque.\n"
-        "3) 'Crée un dossier X dans Y' => {action:'creer', type:'dossier', nom:'X', parent:'Y'}\n"
-        "4) 'Supprime le sous dossier X dans Y' => {action:'supprimer', type:'sous-dossier', nom:'X', parent:'Y'}\n"
-        "5) 'Lis le fichier contrat.pdf' => {action:'lire', type:'fichier', nom:'contrat.pdf', extension:'pdf'}\n"
-        "6) 'Choisis 2' => {action:'lire_match', index:2}\n"
-        "7) 'Résume le document que tu viens de lire' => {action:'resumer'}\n"
-        "8) Si incompris -> {action:'fallback'}\n"
-    )
+    # 3b) pré-classifieur : aucun signal Drive => pas d'appel LLM d'intention
+    if not a_signal_drive(prompt_utilisateur):
+        return {"action": "fallback"}
 
     try:
         messages = [
-            {"role": "system", "content": system_prompt},
+            # 4) préfixe statique d'abord, tour utilisateur ensuite
+            {"role": "system", "content": _SYSTEM_PROMPT_DRIVE},
             {"role": "user",    "content": (prompt_utilisateur or "").strip()},
         ]
-        texte = repondre_chat(messages, temperature=0)
+        texte = repondre_chat(messages, temperature=0, purpose=PURPOSE_INTENT, site="interpreteur.drive", cache_key="alfred-drive-router")
         data = json.loads(texte)
 
         # 5) injections post-parse : parent issu du 'dans ...'
@@ -1,9 +1,14 @@
 import io
+import os
 import fitz  # PyMuPDF
 import docx
 import pandas as pd
 
 PDF_MAX_PAGES_DEFAULT = 10
+TXT_MAX_OCTETS_DEFAULT = 2 * 1024 * 1024   # lecture texte bornée (fichiers de logs géants…)
+
+MIME_DOCX = ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", "application/msword")
+MIME_EXCEL = ("application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
 
 
 # ======================================================
@@ -55,6 +60,84 @@ def lire_csv_bytes(data: bytes, limit_rows: int = 50) -> str:
     return out
 
 
+# ======================================================
+# 📂 Lecture depuis un chemin ou un flux (gros fichiers)
+# ======================================================
+# "source" = chemin (str / PathLike) ou flux binaire positionné au début.
+# Rien n'est chargé en bloc : PyMuPDF ouvre le fichier et ne lit que les pages demandées.
+
+def _est_chemin(source) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+def lire_txt_source(source, max_octets: int = TXT_MAX_OCTETS_DEFAULT, encoding: str = "utf-8") -> str:
+    """Texte brut, lu au plus sur max_octets."""
+    if _est_chemin(source):
+        with open(source, "rb") as f:
+            data = f.read(max_octets + 1)
+    else:
+        data = source.read(max_octets + 1)
+    out = lire_txt_bytes(data[:max_octets], encoding)
+    if len(data) > max_octets:
+        out += f"\n\n---\n[Texte tronqué : premiers {max_octets // 1024} Ko]"
+    return out
+
+def lire_pdf_source(source, max_pages: int = PDF_MAX_PAGES_DEFAULT) -> str:
+    """PDF page par page ; un chemin est ouvert paresseusement (pas de copie en mémoire)."""
+    if not _est_chemin(source):
+        return lire_pdf_bytes(source.read(), max_pages=max_pages)
+    with fitz.open(source) as doc:
+        total = len(doc)
+        pages = min(total, max_pages) if (isinstance(max_pages, int) and max_pages > 0) else total
+        textes = []
+        for i in range(pages):
+            try:
+                textes.append(doc.load_page(i).get_text())
+            except Exception:
+                pass
+        out = "\n".join(textes)
+        if pages < total:
+            out += f"\n\n---\n[Texte tronqué : {pages} / {total} pages affichées]"
+        return out.strip()
+
+def lire_docx_source(source) -> str:
+    document = docx.Document(source)
+    return "\n".join(p.text for p in document.paragraphs)
+
+def lire_csv_source(source, limit_rows: int = 50) -> str:
+    """Premières lignes d'un CSV (pandas ne lit que nrows lignes)."""
+    try:
+        df = pd.read_csv(source, nrows=limit_rows)
+    except Exception:
+        if not _est_chemin(source):
+            source.seek(0)
+        df = pd.read_csv(source, sep=";", nrows=limit_rows)
+    out = df.to_string(index=False)
+    if len(df) == limit_rows:
+        out += f"\n\n---\n[Affichage partiel : premières {limit_rows} lignes]"
+    return out
+
+def lire_excel_source(source, limit_rows: int = 50) -> str:
+    df = pd.read_excel(source, nrows=limit_rows + 1)
+    out = df.head(limit_rows).to_string(index=False)
+    if len(df) > limit_rows:
+        out += f"\n\n---\n[Affichage partiel : premières {limit_rows} lignes]"
+    return out
+
+def lire_source(source, mime_type: str, pdf_max_pages: int = PDF_MAX_PAGES_DEFAULT) -> str:
+    """Extraction texte selon le type MIME, depuis un chemin ou un flux."""
+    if mime_type == "text/plain":
+        return lire_txt_source(source)
+    if mime_type == "application/pdf":
+        return lire_pdf_source(source, max_pages=pdf_max_pages)
+    if mime_type == "text/csv":
+        return lire_csv_source(source)
+    if mime_type in MIME_DOCX:
+        return lire_docx_source(source)
+    if mime_type in MIME_EXCEL:
+        return lire_excel_source(source)
+    return "Format non pris en charge pour la lecture texte."
+
+
 # ======================================================
 # 🔄 Compatibilité avec les fichiers uploadés (local)
 # ======================================================
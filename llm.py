@@ -1,52 +1,206 @@
 # llm.py — version SAFE (n’envoie jamais 'temperature' ni 'response_format')
 
 from __future__ import annotations
-import os, json
-from typing import List, Dict, Optional, Any
+import os, json, hashlib, threading
+from typing import List, Dict, Optional, Any, Iterator
 from openai import OpenAI
 
+from mesures_llm import record_call, Chrono
+
 _client = OpenAI()
 _RUNTIME_MODEL: Optional[str] = None
 
+# ====================== Routage par usage ======================
+# Chaque appel LLM déclare son usage ; la table fixe modèle, plafond de tokens
+# et timeout. model=None => modèle global (sidebar / OPENAI_MODEL).
+# Surcharge possible par variable d'env : OPENAI_MODEL_<USAGE> (ex. OPENAI_MODEL_INTENT).
+PURPOSE_INTENT = "intent"      # parsing JSON d'intention (Drive, etc.)
+PURPOSE_EMAIL = "email"        # rédaction de courriels
+PURPOSE_RESUME = "resume"      # résumés de documents
+PURPOSE_REPONSE = "reponse"    # réponse conversationnelle (défaut)
+
+MODEL_ROUTES: Dict[str, Dict[str, Any]] = {
+    PURPOSE_INTENT:  {"model": "gpt-5-mini", "max_tokens": 2000, "timeout": 20.0},
+    PURPOSE_EMAIL:   {"model": "gpt-5-mini", "max_tokens": None, "timeout": 60.0},
+    PURPOSE_RESUME:  {"model": "gpt-5-mini", "max_tokens": None, "timeout": 90.0},
+    PURPOSE_REPONSE: {"model": None,         "max_tokens": None, "timeout": 120.0},
+}
+
+# Surcharges à chaud (sidebar) : usage -> {"model": ..., "max_tokens": ..., "timeout": ...}
+_ROUTE_OVERRIDES: Dict[str, Dict[str, Any]] = {}
+
 def set_runtime_model(model_name: Optional[str]) -> None:
     global _RUNTIME_MODEL
     _RUNTIME_MODEL = model_name
 
-def get_model(default: str = "gpt-5") -> str:
+def set_route_override(purpose: str, model: Optional[str] = None,
+                       max_tokens: Optional[int] = None, timeout: Optional[float] = None) -> None:
+    """Surcharge (ou réinitialise si tout est None) la route d'un usage."""
+    over = {k: v for k, v in {"model": model, "max_tokens": max_tokens, "timeout": timeout}.items() if v is not None}
+    if over:
+        _ROUTE_OVERRIDES[purpose] = over
+    else:
+        _ROUTE_OVERRIDES.pop(purpose, None)
+
+def get_route(purpose: Optional[str] = None) -> Dict[str, Any]:
+    """Route effective d'un usage : table < env < surcharge sidebar ; modèle global si non fixé."""
+    p = purpose if purpose in MODEL_ROUTES else PURPOSE_REPONSE
+    route = dict(MODEL_ROUTES[p])
+    env_model = os.getenv(f"OPENAI_MODEL_{p.upper()}")
+    if env_model:
+        route["model"] = env_model
+    route.update(_ROUTE_OVERRIDES.get(p, {}))
+    if not route.get("model"):
+        route["model"] = get_model()
+    route["purpose"] = p
+    return route
+
+def get_model(default: str = "gpt-5", purpose: Optional[str] = None) -> str:
+    if purpose:
+        return get_route(purpose)["model"]
     return _RUNTIME_MODEL or os.getenv("OPENAI_MODEL", default)
 
+def _build_kwargs(messages: List[Dict[str, str]], max_tokens: Optional[int], route: Dict[str, Any],
+                  cache_key: Optional[str] = None) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"model": route["model"], "messages": messages}
+    if cache_key:
+        # Regroupe les requêtes de même préfixe sur le même cache côté fournisseur
+        kwargs["extra_body"] = {"prompt_cache_key": cache_key}
+    limit = max_tokens if max_tokens is not None else route.get("max_tokens")
+    if limit is not None:
+        # GPT-5 / 4.1 / 4o : 'max_completion_tokens' (max_tokens est refusé par les modèles de raisonnement)
+        kwargs["max_completion_tokens"] = int(limit)
+    if route.get("timeout"):
+        kwargs["timeout"] = float(route["timeout"])
+    # ⚠️ NE PAS envoyer temperature / response_format (GPT-5)
+    return kwargs
+
+# ====================== Single-flight ======================
+# Requêtes identiques EN COURS (sessions Streamlit multiples, double-submit) :
+# un seul appel amont, les autres appelants attendent et partagent le résultat.
+class _Flight:
+    __slots__ = ("done", "result")
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+
+_INFLIGHT: Dict[str, _Flight] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+def _flight_key(kwargs: Dict[str, Any]) -> str:
+    raw = json.dumps(
+        {k: kwargs.get(k) for k in ("model", "messages", "max_completion_tokens")},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _single_flight(key: str, call, wait_timeout: Optional[float]):
+    """Retourne (résultat, partagé?) ; 'call' n'est exécuté que par le premier appelant."""
+    with _INFLIGHT_LOCK:
+        flight = _INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight()
+            _INFLIGHT[key] = flight
+    if not leader:
+        if flight.done.wait(timeout=wait_timeout) and flight.result is not None:
+            return flight.result, True
+        return call(), False  # le leader a expiré : on tente nous-mêmes
+    try:
+        flight.result = call()
+        return flight.result, False
+    finally:
+        flight.done.set()
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(key, None)
+
 def _create_chat_completion(
     messages: List[Dict[str, str]],
     temperature: Optional[float] = None,   # ignoré
     max_tokens: Optional[int] = None,
     response_format: Optional[Dict[str, Any]] = None,  # ignoré
+    purpose: Optional[str] = None,
+    site: Optional[str] = None,
+    cache_key: Optional[str] = None,
+    stream: bool = False,
 ) -> str:
+    """stream=True : réponse reçue en flux puis assemblée (mesure le time-to-first-token)."""
+    route = get_route(purpose)
+    label = site or route["purpose"]
+    kwargs = _build_kwargs(messages, max_tokens, route, cache_key)
+
+    def _call() -> str:
+        if stream:
+            try:
+                return "".join(_flux(kwargs, route, label))
+            except Exception as e:
+                return f"Erreur LLM : {e}"
+        chrono = Chrono()
+        try:
+            resp = _client.chat.completions.create(**kwargs)
+            record_call(label, getattr(resp, "model", None) or route["model"], chrono.elapsed(), usage=getattr(resp, "usage", None))
+            return resp.choices[0].message.content
+        except Exception as e:
+            record_call(label, route["model"], chrono.elapsed(), error=str(e))
+            return f"Erreur LLM : {e}"
+
+    chrono = Chrono()
+    wait = (route.get("timeout") or 120.0) + 5.0
+    result, shared = _single_flight(_flight_key(kwargs), _call, wait)
+    if shared:
+        # Appel mutualisé : aucune requête amont, on trace l'attente comme hit
+        record_call(label, route["model"], chrono.elapsed(), cache_hit=True)
+    return result
+
+def _flux(kwargs: Dict[str, Any], route: Dict[str, Any], label: str) -> Iterator[str]:
+    """Fragments de texte d'un appel en flux ; trace l'appel (TTFT compris) puis relance l'erreur éventuelle."""
+    chrono = Chrono()
+    usage = None
+    try:
+        for chunk in _client.chat.completions.create(**kwargs, stream=True, stream_options={"include_usage": True}):
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                chrono.mark_first()
+                yield delta
+        record_call(label, route["model"], chrono.elapsed(), usage=usage, ttft_s=chrono.ttft)
+    except Exception as e:
+        record_call(label, route["model"], chrono.elapsed(), usage=usage, ttft_s=chrono.ttft, error=str(e))
+        raise
+
+# ====================== Embeddings ======================
+EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+
+def embed_texts(texts: List[str], site: Optional[str] = None) -> Optional[List[List[float]]]:
+    """Vecteurs d'embedding (None en cas d'erreur : l'appelant continue sans)."""
+    chrono = Chrono()
     try:
-        kwargs: Dict[str, Any] = {"model": get_model(), "messages": messages}
-        if max_tokens is not None:
-            kwargs["max_tokens"] = int(max_tokens)
-        # ⚠️ NE PAS envoyer temperature / response_format (GPT-5)
-        resp = _client.chat.completions.create(**kwargs)
-        return resp.choices[0].message.content
+        resp = _client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+        record_call(site or "embeddings", EMBEDDING_MODEL, chrono.elapsed(), usage=getattr(resp, "usage", None))
+        return [d.embedding for d in resp.data]
     except Exception as e:
-        return f"Erreur LLM : {e}"
+        record_call(site or "embeddings", EMBEDDING_MODEL, chrono.elapsed(), error=str(e))
+        return None
 
-def repondre_simple(prompt: str, temperature: Optional[float] = 0.2, max_tokens: Optional[int] = None, system_msg: Optional[str] = None) -> str:
+def repondre_simple(prompt: str, temperature: Optional[float] = 0.2, max_tokens: Optional[int] = None, system_msg: Optional[str] = None, purpose: Optional[str] = None, site: Optional[str] = None) -> str:
     msgs = [{"role":"system","content":system_msg}] if system_msg else []
     msgs.append({"role":"user","content":prompt})
-    return _create_chat_completion(msgs, temperature=temperature, max_tokens=max_tokens)
+    return _create_chat_completion(msgs, temperature=temperature, max_tokens=max_tokens, purpose=purpose, site=site)
 
-def repondre_avec_context(system_msg: str, user_msg: str, temperature: Optional[float] = 0.2, max_tokens: Optional[int] = None) -> str:
+def repondre_avec_context(system_msg: str, user_msg: str, temperature: Optional[float] = 0.2, max_tokens: Optional[int] = None, purpose: Optional[str] = None, site: Optional[str] = None) -> str:
     msgs = [{"role":"system","content":system_msg},{"role":"user","content":user_msg}]
-    return _create_chat_completion(msgs, temperature=temperature, max_tokens=max_tokens)
+    return _create_chat_completion(msgs, temperature=temperature, max_tokens=max_tokens, purpose=purpose, site=site)
 
-def repondre_chat(messages: List[Dict[str,str]], temperature: Optional[float]=0.2, max_tokens: Optional[int]=None) -> str:
-    return _create_chat_completion(messages, temperature=temperature, max_tokens=max_tokens)
+def repondre_chat(messages: List[Dict[str,str]], temperature: Optional[float]=0.2, max_tokens: Optional[int]=None, purpose: Optional[str] = None, site: Optional[str] = None, cache_key: Optional[str] = None, stream: bool = False) -> str:
+    return _create_chat_completion(messages, temperature=temperature, max_tokens=max_tokens, purpose=purpose, site=site, cache_key=cache_key, stream=stream)
 
-def repondre_json(system_msg: str, user_msg: str, temperature: Optional[float]=0.0, max_tokens: Optional[int]=None, strict_json: bool=False) -> Any:
+def repondre_json(system_msg: str, user_msg: str, temperature: Optional[float]=0.0, max_tokens: Optional[int]=None, strict_json: bool=False, purpose: Optional[str] = PURPOSE_INTENT, site: Optional[str] = None) -> Any:
     raw = _create_chat_completion(
         [{"role":"system","content":system_msg},{"role":"user","content":user_msg}],
-        temperature=temperature, max_tokens=max_tokens
+        temperature=temperature, max_tokens=max_tokens, purpose=purpose, site=site
     )
     if isinstance(raw, str) and raw.startswith("Erreur LLM :"):
         return raw
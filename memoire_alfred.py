@@ -5,6 +5,8 @@ from __future__ import annotations
 import json, os, re, time, datetime, io
 from typing import Dict, Any, Optional, Tuple, List, Set
 
+import cache_semantique
+
 # ====================== Réglages ======================
 LOCAL_MEMORY_FILE = "memoire_persistante.json"
 AUTOSAVE_INTERVAL_MIN = 5
@@ -13,9 +15,9 @@ MEMORY_FOLDER_HINT = "Mémoire Alfred"  # sous-dossier historique
 
 # ================== Intégration Drive =================
 try:
-    from google.oauth2.service_account import Credentials
-    from googleapiclient.discovery import build
     from googleapiclient.http import MediaIoBaseUpload
+    import clientsgoogle                                    # client Drive partagé
+    from quota_google import executer as _executer_google   # limiteur + reprises partagés
     GOOGLE_OK = True
 except Exception:
     GOOGLE_OK = False
@@ -26,21 +28,11 @@ try:
 except Exception:
     FOLDER_ID = None
 
-DRIVE_SCOPE = ["https://www.googleapis.com/auth/drive"]
-
 def _drive_service():
     if not GOOGLE_OK:
         return None
     try:
-        if "GOOGLE_DRIVE_JSON" in os.environ:
-            creds = Credentials.from_service_account_info(
-                json.loads(os.environ["GOOGLE_DRIVE_JSON"]), scopes=DRIVE_SCOPE
-            )
-        else:
-            creds = Credentials.from_service_account_file(
-                os.environ["GOOGLE_DRIVE_JSON_PATH"], scopes=DRIVE_SCOPE
-            )
-        return build("drive", "v3", credentials=creds)
+        return clientsgoogle.drive()
     except Exception:
         return None
 
@@ -49,14 +41,14 @@ def _drive_find_folder_by_name(service, parent_id: str, name: str) -> Optional[s
     if not service or not parent_id or not name:
         return None
     try:
-        res = service.files().list(
+        res = _executer_google(service.files().list(
             q=(
                 f"'{parent_id}' in parents and "
                 "mimeType='application/vnd.google-apps.folder' and "
                 f"name='{name}' and trashed=false"
             ),
             fields="files(id,name)", pageSize=10
-        ).execute()
+        ))
         files = res.get("files", [])
         return files[0]["id"] if files else None
     except Exception:
@@ -67,17 +59,17 @@ def _drive_list_files_named(service, parent_id: str, name: str) -> List[Dict[str
     if not service or not parent_id or not name:
         return []
     try:
-        res = service.files().list(
+        res = _executer_google(service.files().list(
             q=f"'{parent_id}' in parents and name='{name}' and trashed=false",
             fields="files(id,name,modifiedTime,size,mimeType,parents)", pageSize=10
-        ).execute()
+        ))
         return res.get("files", []) or []
     except Exception:
         return []
 
 def _drive_get_bytes(service, file_id: str) -> Optional[bytes]:
     try:
-        data = service.files().get_media(fileId=file_id).execute()
+        data = _executer_google(service.files().get_media(fileId=file_id))
         return data if isinstance(data, (bytes, bytearray)) else str(data).encode("utf-8", "ignore")
     except Exception:
         return None
@@ -87,10 +79,10 @@ def _drive_write_json(service, parent_id: str, file_id: Optional[str], obj: Dict
         body = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
         media = MediaIoBaseUpload(io.BytesIO(body), mimetype="application/json", resumable=True)
         if file_id:
-            service.files().update(fileId=file_id, media_body=media).execute()
+            _executer_google(service.files().update(fileId=file_id, media_body=media))
         else:
             meta = {"name": MEMORY_DRIVE_NAME, "parents": [parent_id]}
-            service.files().create(body=meta, media_body=media, fields="id").execute()
+            _executer_google(service.files().create(body=meta, media_body=media, fields="id"), idempotent=False)
         return True
     except Exception:
         return False
@@ -306,6 +298,18 @@ def _apply_rules(texte: str):
 def _now_item(texte: str) -> Dict[str, Any]:
     return {"date": _now_str(), "texte": (texte or "").strip(), "importance": 0.0, "fb": 0.0}
 
+def memory_key(item: Dict[str, Any]) -> str:
+    """Clé stable d'un souvenir (même format que search_contextual_memories)."""
+    return f"{item.get('date','')}|{str(item.get('texte','')).strip()}"
+
+def _live_memory_keys() -> Set[str]:
+    mem = get_memory()
+    keys = {memory_key(it) for it in mem.get("souvenirs", []) or [] if isinstance(it, dict)}
+    for group in ("souvenirs_par_categorie", "souvenirs_par_domaine"):
+        for lst in (mem.get(group, {}) or {}).values():
+            keys.update(memory_key(it) for it in lst or [] if isinstance(it, dict))
+    return keys
+
 def remember_freeform(souvenir: str) -> str:
     texte = (souvenir or "").strip()
     if not texte:
@@ -318,6 +322,7 @@ def remember_freeform(souvenir: str) -> str:
     mem = get_memory()
     mem["souvenirs"].append(_now_item(texte))
     save_memory(mem); log_event(f"Souvenir ajouté (libre) : {texte}")
+    cache_semantique.invalidate_unsupported()
     return "🧠 C’est noté, je m’en souviendrai."
 
 def remember_categorized(categorie: str, texte: str) -> str:
@@ -326,6 +331,7 @@ def remember_categorized(categorie: str, texte: str) -> str:
     mem["souvenirs_par_categorie"].setdefault(cat, [])
     mem["souvenirs_par_categorie"][cat].append(_now_item(texte))
     save_memory(mem); log_event(f"Souvenir (cat='{cat}') ajouté.")
+    cache_semantique.invalidate_unsupported()
     return f"🧠 C’est noté dans la catégorie **{cat}**."
 
 def remember_in_domain(domaine: str, texte: str) -> str:
@@ -334,6 +340,7 @@ def remember_in_domain(domaine: str, texte: str) -> str:
     mem["souvenirs_par_domaine"].setdefault(dom, [])
     mem["souvenirs_par_domaine"][dom].append(_now_item(texte))
     save_memory(mem); log_event(f"Souvenir (domaine='{dom}') ajouté.")
+    cache_semantique.invalidate_unsupported()
     return f"🧠 C’est noté dans le domaine **{dom}**."
 
 def list_memories(limit: int = 10) -> List[Dict[str, Any]]:
@@ -381,6 +388,7 @@ def confirm_delete(payload: dict) -> str:
         arr = mem.get("souvenirs", [])
         if 0 <= payload["index"] < len(arr):
             removed = arr.pop(payload["index"])
+            cache_semantique.invalidate_memory(memory_key(removed))
             save_memory(mem); log_event(f"Souvenir supprimé: {removed.get('texte','')}")
             return "🧽 Souvenir effacé."
         return "Le souvenir n’existe plus."
@@ -389,6 +397,7 @@ def confirm_delete(payload: dict) -> str:
         lst = mem.get("souvenirs_par_categorie", {}).get(cat, [])
         if 0 <= payload["index"] < len(lst):
             removed = lst.pop(payload["index"])
+            cache_semantique.invalidate_memory(memory_key(removed))
             save_memory(mem); log_event(f"Souvenir supprimé (cat={cat})")
             return f"🧽 Souvenir effacé dans la catégorie **{cat}**."
         return "Le souvenir n’existe plus."
@@ -397,6 +406,7 @@ def confirm_delete(payload: dict) -> str:
         lst = mem.get("souvenirs_par_domaine", {}).get(dom, [])
         if 0 <= payload["index"] < len(lst):
             removed = lst.pop(payload["index"])
+            cache_semantique.invalidate_memory(memory_key(removed))
             save_memory(mem); log_event(f"Souvenir supprimé (domaine={dom})")
             return f"🧽 Souvenir effacé dans le domaine **{dom}**."
         return "Le souvenir n’existe plus."
@@ -660,58 +670,100 @@ def try_handle_memory_command(user_input: str) -> Tuple[bool, Optional[object]]:
 # ================================================================
 # Réponse enrichie par les souvenirs pertinents (API publique)
 # ================================================================
-def answer_with_memories(user_prompt: str, k: int = 7) -> str:
+# Mise en page "cache-friendly" des messages (cache de prompt côté fournisseur) :
+#   1) instructions système STATIQUES (identiques d'un appel à l'autre),
+#   2) contexte mémoire (change lentement ; ordre stable par date),
+#   3) tour utilisateur (variable) en dernier.
+ALFRED_SYSTEM_PROMPT = (
+    "Tu es Alfred, assistant personnel. Réponds en français, de façon claire et concise.\n"
+    "Un message système « [Contexte — Souvenirs pertinents] » peut suivre : "
+    "si c'est pertinent, utilise ce contexte mémoire pour répondre ; sinon, réponds normalement."
+)
+
+def _format_memory_context(mems: List[Any]) -> str:
+    """Bloc de contexte mémoire, trié par date pour que le préfixe reste stable."""
+    def _key(m):
+        return (m.get("date") or "", m.get("texte") or "") if isinstance(m, dict) else ("", str(m))
+    lignes = []
+    for m in sorted(mems, key=_key):
+        if isinstance(m, dict):
+            d = m.get("date") or ""
+            t = m.get("texte") or ""
+            lignes.append(f"- [{d}] {t}" if d else f"- {t}")
+        else:
+            lignes.append(f"- {str(m)}")
+    return "[Contexte — Souvenirs pertinents]\n" + "\n".join(lignes)
+
+def build_memory_messages(user_prompt: str, mems: List[Any], system_msg: Optional[str] = None,
+                          contexte_extra: Optional[str] = None) -> List[Dict[str, str]]:
+    """Construit [système statique, contexte mémoire, contexte extra (ex. extraits Drive), question] dans l'ordre cacheable."""
+    messages = [{"role": "system", "content": system_msg or ALFRED_SYSTEM_PROMPT}]
+    if mems:
+        messages.append({"role": "system", "content": _format_memory_context(mems)})
+    if contexte_extra:
+        messages.append({"role": "system", "content": contexte_extra})
+    messages.append({"role": "user", "content": user_prompt})
+    return messages
+
+def retrieve_memories(user_prompt: str, k: int = 7) -> List[Dict[str, Any]]:
+    """Jusqu'à k souvenirs pertinents pour le prompt (recherche locale, sans LLM)."""
+    try:
+        mems = search_contextual_memories(user_prompt, k=k)
+    except TypeError:
+        # compat : certaines versions n'acceptent pas k
+        mems = search_contextual_memories(user_prompt)
+        if isinstance(mems, list):
+            mems = mems[:k]
+    return mems or []
+
+def answer_with_memories(user_prompt: str, k: int = 7, purpose: Optional[str] = None,
+                         site: str = "memoire.reponse", system_msg: Optional[str] = None,
+                         use_cache: bool = True, mems: Optional[List[Dict[str, Any]]] = None,
+                         contexte_extra: Optional[str] = None) -> str:
     """
     Prend le prompt utilisateur, récupère jusqu'à k souvenirs pertinents,
     construit un petit contexte propre, et appelle le LLM.
-    - Si aucun souvenir n'est pertinent, on laisse le prompt tel quel.
+    - Si aucun souvenir n'est pertinent, seul le message système statique précède la question.
     - Ne modifie rien d'autre (pas d'écriture mémoire).
+    - purpose : usage LLM (voir llm.MODEL_ROUTES), "reponse" par défaut.
+    - site : libellé du site d'appel pour l'instrumentation (mesures_llm).
+    - system_msg : instructions statiques propres à l'appelant (remplacent celles d'Alfred).
+    - use_cache : consulte le cache sémantique (opt-in, voir cache_semantique) pour les
+      réponses conversationnelles simples (pas d'instructions système propres).
+    - mems : souvenirs déjà récupérés (ex. en parallèle par pipeline_tour) ; sinon recherche ici.
+    - contexte_extra : bloc système supplémentaire (ex. extraits de documents Drive) ; désactive le cache sémantique.
     """
     # Import local pour éviter les dépendances circulaires au chargement du module
     try:
-        from llm import repondre_simple
+        from llm import repondre_chat
     except Exception:
         # Fallback défensif : si jamais l'import échoue, on répond directement
-        def repondre_simple(txt, temperature=None):
-            return txt
-
-    # Récupère k souvenirs pertinents pour ce prompt
-    try:
-        mems = search_contextual_memories(user_prompt, k=k)
-    except TypeError:
-        # compat : certaines versions n'acceptent pas k
-        mems = search_contextual_memories(user_prompt)
-        if isinstance(mems, list):
-            mems = mems[:k]
-
-    # Si pas de souvenirs, répondre normalement
-    if not mems:
-        return repondre_simple(user_prompt, temperature=None)
-
-    # Mise en forme du contexte mémoire (sobre et robuste)
-    lignes = []
-    for m in mems:
-        if isinstance(m, dict):
-            d = m.get("date") or ""
-            t = m.get("texte") or ""
-            if d:
-                lignes.append(f"- [{d}] {t}")
-            else:
-                lignes.append(f"- {t}")
-        else:
-            lignes.append(f"- {str(m)}")
-
-    contexte = "\n".join(lignes)
-
-    # Prompt enrichi : on indique au modèle comment utiliser (ou ignorer) le contexte
-    prompt_enrichi = (
-        "Tu es Alfred. Si c'est pertinent, utilise le contexte mémoire ci-dessous pour répondre ; "
-        "sinon, réponds normalement.\n\n"
-        "[Contexte — Souvenirs pertinents]\n"
-        f"{contexte}\n\n"
-        "[Question]\n"
-        f"{user_prompt}"
-    )
-
-    return repondre_simple(prompt_enrichi, temperature=None)
-
+        def repondre_chat(messages, temperature=None, purpose=None, site=None, cache_key=None, stream=False):
+            return messages[-1]["content"]
+
+    # Cache sémantique : question quasi identique déjà répondue, souvenirs supports inchangés
+    vec = None
+    if use_cache and system_msg is None and not contexte_extra and cache_semantique.is_enabled():
+        t0 = time.perf_counter()
+        vec = cache_semantique.embed_question(user_prompt)
+        hit = cache_semantique.lookup(vec, _live_memory_keys()) if vec else None
+        if hit:
+            try:
+                from mesures_llm import record_call
+                record_call(site, "cache_semantique", time.perf_counter() - t0, cache_hit=True)
+            except Exception:
+                pass
+            log_event(f"Cache sémantique : hit (sim={hit['similarity']}) pour « {user_prompt[:60]} »")
+            return hit["answer"]
+
+    # Récupère k souvenirs pertinents pour ce prompt (sauf s'ils ont déjà été récupérés en parallèle)
+    if mems is None:
+        mems = retrieve_memories(user_prompt, k=k)
+
+    messages = build_memory_messages(user_prompt, mems or [], system_msg=system_msg, contexte_extra=contexte_extra)
+    # Réponse reçue en flux : le time-to-first-token des vraies réponses est mesuré (mesures_llm)
+    answer = repondre_chat(messages, temperature=None, purpose=purpose, site=site, cache_key=f"alfred-{site}", stream=True)
+
+    if vec is not None:
+        cache_semantique.store(user_prompt, vec, answer, [memory_key(m) for m in mems or [] if isinstance(m, dict)])
+    return answer
@@ -0,0 +1,133 @@
+# mesures_llm.py — Instrumentation des appels LLM (latence, tokens, coût par site d'appel)
+# - Chaque appel est enregistré dans un tampon circulaire en RAM + un fichier JSONL append-only.
+# - Les agrégats (p50/p95, totaux de tokens, coût) alimentent le panneau de la sidebar.
+
+from __future__ import annotations
+import os, json, time, threading, datetime
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# ====================== Réglages ======================
+RING_SIZE = 500
+JSONL_PATH = os.getenv("ALFRED_LLM_LOG", "llm_calls.jsonl")
+
+# Tarifs indicatifs en $ / 1M tokens : (entrée, entrée en cache, sortie)
+PRICES_PER_MTOK: Dict[str, tuple] = {
+    "gpt-5":      (1.25, 0.125, 10.0),
+    "gpt-5-mini": (0.25, 0.025, 2.0),
+    "gpt-4.1":    (2.0, 0.5, 8.0),
+    "gpt-4o":     (2.5, 1.25, 10.0),
+}
+
+_ring: deque = deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+
+# ====================== Enregistrement ======================
+def _usage_to_dict(usage: Any) -> Dict[str, int]:
+    """Extrait prompt/completion/cached tokens d'un objet usage OpenAI (ou d'un dict)."""
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    get = (lambda o, k: o.get(k) if isinstance(o, dict) else getattr(o, k, None))
+    details = get(usage, "prompt_tokens_details")
+    cached = get(details, "cached_tokens") if details is not None else 0
+    return {
+        "prompt_tokens": int(get(usage, "prompt_tokens") or 0),
+        "completion_tokens": int(get(usage, "completion_tokens") or 0),
+        "cached_tokens": int(cached or 0),
+    }
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    """Coût estimé en dollars (0 si modèle inconnu)."""
+    price = None
+    for name in sorted(PRICES_PER_MTOK, key=len, reverse=True):
+        if (model or "").startswith(name):
+            price = PRICES_PER_MTOK[name]; break
+    if not price:
+        return 0.0
+    p_in, p_cached, p_out = price
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return round((uncached * p_in + cached_tokens * p_cached + completion_tokens * p_out) / 1_000_000, 6)
+
+def record_call(
+    site: str,
+    model: str,
+    wall_s: float,
+    usage: Any = None,
+    ttft_s: Optional[float] = None,
+    cache_hit: bool = False,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Enregistre un appel (RAM + JSONL) et renvoie l'entrée créée."""
+    u = _usage_to_dict(usage)
+    entry = {
+        "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+        "site": site or "inconnu",
+        "model": model,
+        "wall_s": round(float(wall_s), 4),
+        "ttft_s": round(float(ttft_s), 4) if ttft_s is not None else None,
+        **u,
+        "cost_usd": 0.0 if cache_hit else estimate_cost(model, u["prompt_tokens"], u["completion_tokens"], u["cached_tokens"]),
+        "cache_hit": bool(cache_hit),
+        "error": error,
+    }
+    with _lock:
+        _ring.append(entry)
+        try:
+            with open(JSONL_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception:
+            pass
+    return entry
+
+class Chrono:
+    """Petit chronomètre : t.mark_first() au premier token (streaming), t.elapsed() à la fin."""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.ttft: Optional[float] = None
+
+    def mark_first(self) -> None:
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.t0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t0
+
+# ====================== Lecture / agrégats ======================
+def recent_calls(limit: int = RING_SIZE) -> List[Dict[str, Any]]:
+    with _lock:
+        items = list(_ring)
+    return items[-limit:]
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    idx = min(len(vals) - 1, max(0, int(round(q * (len(vals) - 1)))))
+    return vals[idx]
+
+def _ratio(part: int, total: int) -> float:
+    return round(part / total, 3) if total else 0.0
+
+def stats_by_site() -> Dict[str, Dict[str, Any]]:
+    """Agrégats par site d'appel : nb, p50/p95 latence, tokens, coût, hits de cache."""
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for e in recent_calls():
+        groups.setdefault(e["site"], []).append(e)
+    out: Dict[str, Dict[str, Any]] = {}
+    for site, entries in groups.items():
+        walls = [e["wall_s"] for e in entries if not e.get("cache_hit")]
+        ttfts = [e["ttft_s"] for e in entries if e.get("ttft_s") is not None]
+        out[site] = {
+            "calls": len(entries),
+            "p50_s": round(_percentile(walls, 0.50), 3),
+            "p95_s": round(_percentile(walls, 0.95), 3),
+            "ttft_p50_s": round(_percentile(ttfts, 0.50), 3) if ttfts else None,
+            "prompt_tokens": sum(e["prompt_tokens"] for e in entries),
+            "completion_tokens": sum(e["completion_tokens"] for e in entries),
+            "cached_tokens": sum(e["cached_tokens"] for e in entries),
+            "cached_ratio": _ratio(sum(e["cached_tokens"] for e in entries), sum(e["prompt_tokens"] for e in entries)),
+            "cost_usd": round(sum(e["cost_usd"] for e in entries), 4),
+            "cache_hits": sum(1 for e in entries if e.get("cache_hit")),
+            "errors": sum(1 for e in entries if e.get("error")),
+        }
+    return out
@@ -0,0 +1,237 @@
+# moteur_alfred.py — Moteur Alfred sans interface (headless)
+# - SessionAlfred : état de conversation explicite (remplace st.session_state hors UI)
+# - AlfredEngine.handle(prompt, session) -> ReponseAlfred (dict structuré, sérialisable en JSON)
+# - CLI : rejoue un fichier de prompts (un par ligne) et mesure le débit
+#
+# Usage :
+#   python moteur_alfred.py prompts.txt                      # une session, prompts enchaînés
+#   python moteur_alfred.py prompts.txt --out reponses.jsonl # sortie JSONL
+#   python moteur_alfred.py prompts.txt --sessions 4         # 4 sessions indépendantes en parallèle
+#   echo "liste mes souvenirs" | python moteur_alfred.py -
+
+from __future__ import annotations
+import sys, json, time, argparse, datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# ====================== Session ======================
+@dataclass
+class SessionAlfred:
+    """
+    État d'une conversation. S'utilise comme un mapping (get / [] / setdefault),
+    exactement comme st.session_state : les briques acceptent l'un ou l'autre.
+    Les clés hors champs déclarés (ex. email_local_files) vont dans 'extra'.
+    """
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    pending_drive: Optional[Dict[str, Any]] = None    # suppression Drive en attente de confirmation
+    drive_listing_cursor: Optional[Dict[str, Any]] = None   # suite d'un listage Drive paginé
+    dernier_fichier: Optional[Dict[str, Any]] = None        # dernier fichier Drive lu (id, name, mimeType)
+    drive_resultats: Optional[List[Dict[str, Any]]] = None  # derniers résultats numérotés (« choisis N »)
+    pending_delete: Optional[Dict[str, Any]] = None   # suppression de souvenir en attente
+    email_ctx: Optional[Dict[str, Any]] = None        # brouillon email en cours
+    email_result: Optional[Dict[str, Any]] = None
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def _champ(self, key: str) -> bool:
+        return key != "extra" and key in self.__dataclass_fields__
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if self._champ(key):
+            return getattr(self, key)
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        if self._champ(key):
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if self._champ(key):
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return self._champ(key) or key in self.extra
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if self._champ(key):
+            if getattr(self, key) is None:
+                setattr(self, key, default)
+            return getattr(self, key)
+        return self.extra.setdefault(key, default)
+
+    def push(self, role: str, content: str, subtype: Optional[str] = None) -> None:
+        self.messages.append({
+            "role": role,
+            "content": content,
+            "subtype": subtype,
+            "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+
+# ====================== Réponse ======================
+@dataclass
+class ReponseAlfred:
+    """
+    kind :
+      - "message"        : réponse texte (brique ou LLM)
+      - "confirm_delete" : suppression de souvenir à confirmer (répondre « confirme » / « annule »)
+      - "email_draft"    : brouillon prêt dans data (from/to/subject/text/html)
+    """
+    content: str
+    subtype: Optional[str] = None
+    skill: str = "llm"
+    kind: str = "message"
+    data: Optional[Dict[str, Any]] = None
+    latence_s: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+# ====================== Moteur ======================
+class AlfredEngine:
+    """Un tour = un appel à handle() ; aucun import Streamlit, l'état vit dans la session passée."""
+
+    def __init__(self, k: int = 7, use_cache: bool = True, historiser: bool = True):
+        self.k = k
+        self.use_cache = use_cache
+        self.historiser = historiser   # False quand l'appelant tient déjà l'historique (UI)
+
+    def nouvelle_session(self) -> SessionAlfred:
+        return SessionAlfred()
+
+    def _confirmation_souvenir(self, prompt: str, session) -> Optional[ReponseAlfred]:
+        """
+        Équivalent texte de la bannière « Confirmer la suppression » de l'UI.
+        Suppression irréversible : seuls « confirme » / « annule » explicites (mêmes mots que l'interpréteur).
+        """
+        payload = session.get("pending_delete")
+        if not payload:
+            return None
+        from interpreteur import _detect_confirme_annule
+        choix = (_detect_confirme_annule((prompt or "").strip().rstrip(".! ")) or {}).get("action")
+        if choix == "confirmer":
+            from memoire_alfred import confirm_delete
+            session["pending_delete"] = None
+            return ReponseAlfred(confirm_delete(payload), "success", skill="memoire")
+        if choix == "annuler":
+            session["pending_delete"] = None
+            return ReponseAlfred("Suppression annulée.", "info", skill="memoire")
+        return None
+
+    def _structurer(self, brut: Any, session) -> ReponseAlfred:
+        if not isinstance(brut, dict):
+            return ReponseAlfred(str(brut))
+        kind = brut.get("_type")
+        skill = brut.get("skill", "llm")
+        if kind == "confirm_delete":
+            session["pending_delete"] = brut["payload"]
+            return ReponseAlfred(brut["content"], "warning", skill=skill, kind="confirm_delete", data=brut["payload"])
+        if kind == "email_bootstrap":
+            ctx = brut.get("email_ctx") or session.get("email_ctx") or {}
+            apercu = f"✉️ Brouillon pour {ctx.get('to_address') or '(destinataire ?)'} — « {ctx.get('subject', '')} »"
+            return ReponseAlfred(apercu, "info", skill=skill, kind="email_draft", data=ctx)
+        return ReponseAlfred(brut.get("content", "") or "", brut.get("subtype"), skill=skill)
+
+    def handle(self, prompt: str, session=None, prompt_reponse: Optional[Union[str, Callable[[], str]]] = None,
+               use_cache: Optional[bool] = None) -> ReponseAlfred:
+        """
+        Traite un prompt dans la session donnée (SessionAlfred ou st.session_state).
+        - prompt_reponse : texte envoyé au LLM de réponse (ex. prompt + contenu d'un fichier joint),
+          ou fonction qui le produit, appelée seulement si le tour finit en réponse LLM.
+        """
+        from pipeline_tour import traiter_tour
+
+        if session is None:
+            session = self.nouvelle_session()
+        t0 = time.perf_counter()
+        if self.historiser:
+            self._historiser(session, "user", prompt)
+
+        rep = self._confirmation_souvenir(prompt, session)
+        if rep is None:
+            brut = traiter_tour(
+                prompt, session, prompt_reponse=prompt_reponse, k=self.k,
+                use_cache=self.use_cache if use_cache is None else use_cache,
+            )
+            rep = self._structurer(brut, session)
+
+        rep.latence_s = round(time.perf_counter() - t0, 4)
+        if self.historiser:
+            self._historiser(session, "assistant", rep.content, rep.subtype)
+        return rep
+
+    @staticmethod
+    def _historiser(session, role: str, content: str, subtype: Optional[str] = None) -> None:
+        if isinstance(session, SessionAlfred):
+            session.push(role, content, subtype)
+        else:
+            session.setdefault("messages", []).append({"role": role, "content": content, "subtype": subtype})
+
+# ====================== CLI ======================
+def _lire_prompts(path: str) -> List[str]:
+    flux = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+    try:
+        return [l.strip() for l in flux if l.strip() and not l.lstrip().startswith("#")]
+    finally:
+        if flux is not sys.stdin:
+            flux.close()
+
+def _rejouer(engine: AlfredEngine, prompts: List[str], session_id: int) -> List[Dict[str, Any]]:
+    session = engine.nouvelle_session()
+    lignes = []
+    for i, p in enumerate(prompts):
+        try:
+            rep = engine.handle(p, session).to_dict()
+        except Exception as e:
+            rep = ReponseAlfred(f"Erreur moteur : {e}", "error", skill="moteur").to_dict()
+        lignes.append({"session": session_id, "index": i, "prompt": p, **rep})
+    return lignes
+
+def _pct(vals: List[float], q: float) -> float:
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))] if vals else 0.0
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Moteur Alfred sans interface : rejoue un fichier de prompts")
+    ap.add_argument("prompts", help="fichier texte, un prompt par ligne ('-' pour stdin, '#' = commentaire)")
+    ap.add_argument("--out", help="écrit les réponses en JSONL dans ce fichier (sinon stdout)")
+    ap.add_argument("--sessions", type=int, default=1, help="nb de sessions indépendantes rejouées en parallèle")
+    ap.add_argument("--no-cache", action="store_true", help="désactive le cache sémantique des réponses")
+    args = ap.parse_args(argv)
+
+    prompts = _lire_prompts(args.prompts)
+    engine = AlfredEngine(use_cache=not args.no_cache)
+
+    t0 = time.perf_counter()
+    n = max(1, args.sessions)
+    if n == 1:
+        lignes = _rejouer(engine, prompts, 0)
+    else:
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            lots = list(pool.map(lambda sid: _rejouer(engine, prompts, sid), range(n)))
+        lignes = [l for lot in lots for l in lot]
+    duree = time.perf_counter() - t0
+
+    sortie = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for l in lignes:
+            sortie.write(json.dumps(l, ensure_ascii=False) + "\n")
+    finally:
+        if sortie is not sys.stdout:
+            sortie.close()
+
+    lat = [l["latence_s"] for l in lignes]
+    par_skill: Dict[str, int] = {}
+    for l in lignes:
+        par_skill[l["skill"]] = par_skill.get(l["skill"], 0) + 1
+    print(
+        f"== {len(lignes)} tours / {n} session(s) en {duree:.2f} s — {len(lignes) / duree if duree else 0:.2f} tours/s"
+        f" — latence p50={_pct(lat, 0.5):.3f}s p95={_pct(lat, 0.95):.3f}s — briques : {par_skill}",
+        file=sys.stderr,
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# pipeline_tour.py — Orchestrateur d'un tour de conversation (étapes en parallèle)
+# - La récupération des souvenirs démarre tout de suite, en parallèle du dispatch des briques.
+# - Quand c'est sans risque (aucun déclencheur mémoire/email, signal Drive ambigu qui
+#   va coûter un appel LLM d'intention), la réponse LLM est lancée aussi en spéculatif.
+# - Si une brique prend le prompt, le travail spéculatif est annulé (ou ignoré s'il tourne déjà).
+# La latence d'un tour tend ainsi vers celle de l'étape la plus lente plutôt que vers leur somme.
+# Si l'index de contenu Drive est chargé, ses passages pertinents accompagnent la réponse LLM.
+
+from __future__ import annotations
+import os
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional, Union
+
+from skills.registry import candidate_skills, dispatch
+from memoire_alfred import get_memory, retrieve_memories, answer_with_memories
+import index_contenu
+
+SPECULER_REPONSE = os.getenv("ALFRED_SPECULATIVE_ANSWER", "1") == "1"
+PASSAGES_DRIVE = os.getenv("ALFRED_DRIVE_PASSAGES", "1") == "1"
+
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="alfred-tour")
+
+def _reponse_speculable(prompt: str) -> bool:
+    """
+    La réponse peut partir en parallèle si seule la brique Drive est candidate et que
+    son interprétation passera par le LLM (signal présent, ni grammaire locale ni alias racine).
+    Sinon l'interpréteur tranche en quelques µs : un appel spéculatif serait payé pour rien.
+    """
+    if candidate_skills(prompt) != ["drive"]:
+        return False
+    try:
+        from interpreteur import appellera_llm_intention
+    except Exception:
+        return False
+    return appellera_llm_intention(prompt)
+
+def _contexte_drive(texte: str):
+    return index_contenu.contexte_passages(texte) if PASSAGES_DRIVE else None
+
+def _repondre(texte: str, k: int, use_cache: bool, fut_mems: Future) -> str:
+    return answer_with_memories(
+        texte, k=k, use_cache=use_cache, mems=fut_mems.result(), contexte_extra=_contexte_drive(texte),
+    )
+
+def _annuler(*futures: Optional[Future]) -> None:
+    for fut in futures:
+        if fut is not None:
+            fut.cancel()  # sans effet si déjà en cours : le résultat sera simplement ignoré
+
+def traiter_tour(
+    prompt: str,
+    etat=None,
+    prompt_reponse: Optional[Union[str, Callable[[], str]]] = None,
+    k: int = 7,
+    use_cache: bool = True,
+) -> Dict[str, Any]:
+    """
+    Exécute un tour : dispatch des briques (thread appelant, il peut toucher à la session)
+    en parallèle de la récupération mémoire et, si possible, de la réponse LLM.
+    - prompt_reponse : texte envoyé au LLM de réponse (ex. prompt + contenu d'un fichier joint).
+      Fonction : appelée seulement si aucune brique ne prend le prompt (lecture différée) ;
+      les souvenirs sont alors cherchés sur le prompt seul, sans réponse spéculative.
+    Retourne le dict de la brique ({content, subtype, ...}) ou {"content": réponse, "subtype": None}.
+    """
+    differe = callable(prompt_reponse)
+    texte_reponse = prompt if differe else (prompt_reponse or prompt)
+
+    # Mémoire chargée AVANT de lancer les threads (évite deux chargements Drive concurrents)
+    get_memory()
+    fut_mems = _POOL.submit(retrieve_memories, texte_reponse, k)
+    fut_rep: Optional[Future] = None
+    if SPECULER_REPONSE and not differe and _reponse_speculable(prompt):
+        fut_rep = _POOL.submit(_repondre, texte_reponse, k, use_cache, fut_mems)
+
+    try:
+        reponse = dispatch(prompt, etat)
+    except Exception:
+        _annuler(fut_rep, fut_mems)
+        raise
+
+    if reponse is not None:
+        _annuler(fut_rep, fut_mems)
+        return reponse
+
+    if fut_rep is not None:
+        text = fut_rep.result()
+    else:
+        text = _repondre(prompt_reponse() if differe else texte_reponse, k, use_cache, fut_mems)
+    return {"content": text, "subtype": None, "skill": "llm"}
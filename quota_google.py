@@ -0,0 +1,140 @@
+# quota_google.py — Limiteur de débit et politique de reprise partagés (API Google : Drive, Gmail)
+# - Un seau à jetons par API : les rafales (parcours récursif, import en masse, batchs) sont
+#   lissées sous le quota au lieu de se heurter à 403 userRateLimitExceeded / 429.
+# - executer(req) : prend un jeton, exécute, et reprend avec backoff exponentiel + gigue sur
+#   429 / 5xx / 403 rateLimitExceeded… ; un refus de quota ralentit aussi les autres threads.
+# - Requêtes non idempotentes (création, envoi d'email) : reprises seulement si Drive/Gmail a
+#   refusé la requête pour quota (jamais après 5xx / coupure : risque de doublon).
+# - compteurs() : requêtes, attentes du limiteur, refus de quota, reprises, échecs (sidebar).
+
+from __future__ import annotations
+import os, json, time, random, threading
+from typing import Any, Dict
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import clientsgoogle
+
+# ====================== Réglages ======================
+# Requêtes / seconde. Quotas Google par utilisateur : Drive ~12 000 / 60 s (les écritures soutenues
+# tolèrent bien moins) ; Gmail 250 unités / s (messages.get = 5, send = 100).
+DEBIT = {
+    "drive": float(os.getenv("ALFRED_DRIVE_QPS", "20")),
+    "gmail": float(os.getenv("ALFRED_GMAIL_QPS", "10")),
+}
+RAFALE = {"drive": 100, "gmail": 20}   # un batch Drive complet (100 appels) passe d'un coup
+ESSAIS_MAX = int(os.getenv("ALFRED_GOOGLE_RETRIES", "5"))
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 32.0
+
+RAISONS_QUOTA = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded", "dailyLimitExceeded"}
+RAISONS_TRANSITOIRES = {"backendError", "internalError"}
+
+# ====================== Seau à jetons ======================
+class SeauJetons:
+    """Débit moyen 'debit' jetons/s, rafale jusqu'à 'capacite'. Réservation : l'attente se fait hors verrou."""
+
+    def __init__(self, debit: float, capacite: float):
+        self.debit = max(0.1, debit)
+        self.capacite = max(1.0, capacite)
+        self._jetons = self.capacite
+        self._horodatage = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _remplir(self) -> None:
+        maintenant = time.monotonic()
+        self._jetons = min(self.capacite, self._jetons + (maintenant - self._horodatage) * self.debit)
+        self._horodatage = maintenant
+
+    def acquerir(self, n: float = 1.0) -> float:
+        """Prend n jetons (dort si besoin) ; retourne le temps d'attente en secondes."""
+        with self._lock:
+            self._remplir()
+            self._jetons -= n
+            attente = -self._jetons / self.debit if self._jetons < 0 else 0.0
+        if attente > 0:
+            time.sleep(attente)
+        return attente
+
+    def suspendre(self, secondes: float) -> None:
+        """Refus de quota : plus aucun jeton pendant 'secondes' (pour tous les threads)."""
+        with self._lock:
+            self._remplir()
+            self._jetons = min(self._jetons, -secondes * self.debit)
+
+_SEAUX = {api: SeauJetons(DEBIT[api], RAFALE[api]) for api in DEBIT}
+_compteurs: Dict[str, Dict[str, float]] = {
+    api: {"requetes": 0, "limitees": 0, "attente_s": 0.0, "refus_quota": 0, "reprises": 0, "echecs": 0}
+    for api in DEBIT
+}
+_lock_compteurs = threading.Lock()
+
+def _compter(api: str, cle: str, n: float = 1) -> None:
+    with _lock_compteurs:
+        _compteurs[api][cle] += n
+
+def acquerir(api: str = "drive", n: int = 1) -> None:
+    """Jeton(s) pour un appel qui ne passe pas par executer() (morceaux de téléchargement / upload)."""
+    attente = _SEAUX[api].acquerir(n)
+    _compter(api, "requetes", n)
+    if attente > 0:
+        _compter(api, "limitees")
+        _compter(api, "attente_s", attente)
+
+# ====================== Classification des erreurs ======================
+def _raisons(e: HttpError) -> set:
+    try:
+        err = json.loads(e.content.decode("utf-8") if isinstance(e.content, bytes) else e.content).get("error", {})
+        return {x.get("reason") for x in err.get("errors", []) if x.get("reason")}
+    except Exception:
+        return set()
+
+def est_refus_quota(e: BaseException) -> bool:
+    """429, ou 403 motivé par un dépassement de quota : la requête n'a pas été traitée."""
+    if not isinstance(e, HttpError):
+        return False
+    statut = getattr(e.resp, "status", 0)
+    return statut == 429 or (statut == 403 and bool(_raisons(e) & RAISONS_QUOTA))
+
+def est_transitoire(e: BaseException) -> bool:
+    """5xx, backendError, coupure réseau : la requête a pu être (partiellement) traitée."""
+    if isinstance(e, HttpError):
+        statut = getattr(e.resp, "status", 0)
+        return statut >= 500 or bool(_raisons(e) & RAISONS_TRANSITOIRES)
+    return isinstance(e, (httplib2.HttpLib2Error, ConnectionError, TimeoutError, OSError))
+
+def delai_reprise(essai: int) -> float:
+    """Backoff exponentiel plafonné, gigue « égale » (moitié fixe, moitié aléatoire)."""
+    d = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** essai))
+    return d / 2 + random.uniform(0, d / 2)
+
+# ====================== Exécution ======================
+def executer(req, api: str = "drive", http=None, idempotent: bool = True, cout: int = 1, essais: int = ESSAIS_MAX) -> Any:
+    """
+    req.execute() sous le limiteur de l'API, avec reprises.
+    - http : transport à utiliser ; par défaut celui du thread courant (clientsgoogle.http_local).
+    - idempotent=False : ne reprend que les refus de quota (création, envoi).
+    - cout : nb de jetons (un batch de N appels compte N).
+    """
+    for essai in range(essais):
+        acquerir(api, cout)
+        try:
+            return req.execute(http=http or clientsgoogle.http_local(api))
+        except Exception as e:
+            quota = est_refus_quota(e)
+            if quota:
+                _compter(api, "refus_quota")
+            if essai == essais - 1 or not (quota or (idempotent and est_transitoire(e))):
+                _compter(api, "echecs")
+                raise
+            delai = delai_reprise(essai)
+            _compter(api, "reprises")
+            if quota:
+                _SEAUX[api].suspendre(delai)   # l'attente se fera à la prise du prochain jeton
+            else:
+                time.sleep(delai)
+
+def compteurs() -> Dict[str, Dict[str, float]]:
+    with _lock_compteurs:
+        return {api: {k: (round(v, 2) if isinstance(v, float) else v) for k, v in c.items()} for api, c in _compteurs.items()}
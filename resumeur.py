@@ -0,0 +1,227 @@
+# resumeur.py — Résumés de documents Drive (un ou plusieurs fichiers)
+# - Un document long est découpé en morceaux de ~TOKENS_PAR_MORCEAU tokens, résumés en
+#   parallèle (map), puis les résumés sont fusionnés par niveaux jusqu'à un seul (reduce).
+# - Résumés mis en cache par empreinte du texte (cache_extraction : mémoire + disque) : le même
+#   document avec la même consigne est servi sans appel LLM ; avec une autre consigne, seule la
+#   réduction finale est refaite (les résumés de morceaux sont réutilisés).
+# - Plusieurs fichiers : lecture / extraction en parallèle (pool borné), résumé de chacun,
+#   puis réduction en une réponse unique.
+# - Un fichier en échec n'interrompt pas les autres : il est signalé en fin de réponse.
+# - progression(faits, total, nom) est appelée dans le thread appelant (compatible Streamlit).
+
+from __future__ import annotations
+import os, re, hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+
+import cache_extraction
+from llm import repondre_avec_context, get_model, PURPOSE_RESUME
+
+# ====================== Réglages ======================
+WORKERS = int(os.getenv("ALFRED_RESUME_WORKERS", "4"))
+WORKERS_LLM = int(os.getenv("ALFRED_RESUME_WORKERS_LLM", "6"))   # appels LLM simultanés (tous fichiers confondus)
+MAX_FICHIERS = int(os.getenv("ALFRED_RESUME_MAX_FICHIERS", "20"))
+TOKENS_PAR_MORCEAU = int(os.getenv("ALFRED_RESUME_TOKENS_MORCEAU", "3000"))
+CARACTERES_PAR_TOKEN = 4          # estimation (texte français), sans tokenizer
+NIVEAUX_MAX = 6                   # garde-fou de la réduction hiérarchique
+PDF_PAGES_RESUME = 0              # 0 = toutes les pages : le découpage remplace la troncature
+
+_ECHECS_LECTURE = ("❌", "⚠️", "Format non pris en charge", "(Fichier vide")
+
+SYSTEM_RESUME = (
+    "Tu résumes des documents en français pour Alfred, un assistant personnel. "
+    "Résumé fidèle et concis : l'objet du document, les points clés, les chiffres, dates, "
+    "montants et parties en présence. N'invente rien."
+)
+SYSTEM_MORCEAU = (
+    "Tu reçois un extrait d'un document plus long. Résume-le en français, fidèlement : "
+    "faits, chiffres, dates, montants, noms, engagements. Pas d'introduction ni de conclusion. N'invente rien."
+)
+SYSTEM_FUSION = (
+    "Tu reçois, dans l'ordre, les résumés des parties successives d'un même document. "
+    "Fusionne-les en français en un résumé unique et structuré, sans répétitions, en conservant "
+    "chiffres, dates et montants. N'invente rien."
+)
+SYSTEM_REDUCTION = (
+    "Tu reçois les résumés de plusieurs documents d'un même dossier. Rédige en français une "
+    "synthèse unique : vue d'ensemble, puis les points essentiels de chaque document "
+    "(cite son nom en gras), enfin les points communs, écarts ou échéances à signaler. N'invente rien."
+)
+
+# Pool partagé des appels LLM de morceaux : borne la concurrence même si plusieurs fichiers
+# sont résumés en même temps (ses tâches n'y soumettent rien : pas d'interblocage).
+_POOL_LLM = ThreadPoolExecutor(max_workers=WORKERS_LLM, thread_name_prefix="alfred-resume-llm")
+
+class ErreurResume(Exception):
+    pass
+
+def _llm(system: str, texte: str, site: str) -> str:
+    rep = repondre_avec_context(system, texte, temperature=None, purpose=PURPOSE_RESUME, site=site)
+    if rep.startswith("Erreur LLM :"):
+        raise ErreurResume(rep)
+    return rep.strip()
+
+# ====================== Découpage ======================
+def decouper(texte: str, tokens_max: int = TOKENS_PAR_MORCEAU) -> List[str]:
+    """Morceaux de ~tokens_max tokens, coupés aux paragraphes (puis aux phrases si besoin)."""
+    limite = max(200, tokens_max * CARACTERES_PAR_TOKEN)
+    morceaux: List[str] = []
+    courant = ""
+    for para in re.split(r"\n\s*\n", texte or ""):
+        para = para.strip()
+        if not para:
+            continue
+        blocs = [para] if len(para) <= limite else re.split(r"(?<=[.!?;])\s+", para)
+        for bloc in blocs:
+            while len(bloc) > limite:   # phrase démesurée (tableau aplati…) : coupe franche
+                if courant:
+                    morceaux.append(courant)
+                    courant = ""
+                morceaux.append(bloc[:limite])
+                bloc = bloc[limite:]
+            if courant and len(courant) + len(bloc) + 2 > limite:
+                morceaux.append(courant)
+                courant = ""
+            courant = f"{courant}\n\n{bloc}" if courant else bloc
+    if courant:
+        morceaux.append(courant)
+    return morceaux
+
+# ====================== Map / reduce d'un document ======================
+def _cle_resume(texte: str, etape: str, **options) -> str:
+    empreinte = hashlib.sha256(texte.encode("utf-8")).hexdigest()
+    return cache_extraction.cle("resume", empreinte, etape=etape, modele=get_model(purpose=PURPOSE_RESUME), **options)
+
+def _resumer_morceau(morceau: str, system: str = SYSTEM_MORCEAU, site: str = "resume.morceau") -> str:
+    """Résumé d'un morceau, servi par le cache si ce texte exact a déjà été résumé."""
+    k = _cle_resume(morceau, site)
+    deja = cache_extraction.lire(k)
+    if deja is not None:
+        return deja
+    rep = _llm(system, morceau, site)
+    cache_extraction.ecrire(k, rep)
+    return rep
+
+def _paquets(resumes: List[str], limite: int) -> List[List[str]]:
+    """Regroupe des résumés consécutifs tant qu'ils tiennent dans 'limite' caractères."""
+    paquets: List[List[str]] = [[]]
+    taille = 0
+    for r in resumes:
+        if paquets[-1] and taille + len(r) > limite:
+            paquets.append([])
+            taille = 0
+        paquets[-1].append(r)
+        taille += len(r)
+    return paquets
+
+def resumer_texte(
+    texte: str,
+    nom: str = "",
+    consigne: Optional[str] = None,
+    progression: Optional[Callable[[int, int, str], None]] = None,
+) -> str:
+    """
+    Résumé LLM d'un texte extrait, quelle que soit sa longueur.
+    - Déjà résumé (même texte, même nom, même consigne, même modèle) : servi par le cache.
+    - Tient en un morceau : un seul appel.
+    - Sinon : morceaux résumés en parallèle, puis fusion par niveaux (paquets de résumés
+      tenant dans un morceau) jusqu'à un résumé unique ; la consigne n'intervient qu'à la fin.
+    """
+    k = _cle_resume(texte, "resume.document", nom=nom, consigne=consigne or "")
+    deja = cache_extraction.lire(k)
+    if deja is not None:
+        return deja
+    resume = _resumer_document(texte, nom, consigne, progression)
+    cache_extraction.ecrire(k, resume)
+    return resume
+
+def _resumer_document(
+    texte: str,
+    nom: str,
+    consigne: Optional[str],
+    progression: Optional[Callable[[int, int, str], None]],
+) -> str:
+    entete = f"Document : {nom}\n" if nom else ""
+    if consigne:
+        entete += f"Consigne : {consigne}\n"
+    morceaux = decouper(texte)
+    if len(morceaux) <= 1:
+        return _llm(SYSTEM_RESUME, f"{entete}\n{texte}", "resume.fichier")
+
+    limite = TOKENS_PAR_MORCEAU * CARACTERES_PAR_TOKEN
+    resumes: List[Optional[str]] = [None] * len(morceaux)
+    futs = {_POOL_LLM.submit(_resumer_morceau, m): i for i, m in enumerate(morceaux)}
+    for n, fut in enumerate(as_completed(futs), 1):
+        resumes[futs[fut]] = fut.result()
+        if progression:
+            progression(n, len(morceaux), nom or "document")
+
+    niveau: List[str] = [r for r in resumes if r]
+    for _ in range(NIVEAUX_MAX):
+        if len(niveau) <= 1 or sum(len(r) for r in niveau) <= limite:
+            break
+        paquets = _paquets(niveau, limite)
+        if len(paquets) == len(niveau):   # résumés trop longs pour être regroupés : on fusionne par deux
+            paquets = [niveau[i:i + 2] for i in range(0, len(niveau), 2)]
+        niveau = list(_POOL_LLM.map(
+            lambda p: _resumer_morceau("\n\n---\n\n".join(p), SYSTEM_FUSION, "resume.fusion"), paquets,
+        ))
+    parties = "\n\n".join(f"[Partie {i}]\n{r}" for i, r in enumerate(niveau, 1))
+    return _llm(SYSTEM_FUSION, f"{entete}\n{parties}", "resume.final")
+
+def resumer_fichier(
+    f: Dict[str, Any],
+    consigne: Optional[str] = None,
+    progression: Optional[Callable[[int, int, str], None]] = None,
+) -> str:
+    """Lit (cache d'extraction) puis résume le fichier Drive {id, name} ; lève ErreurResume si illisible."""
+    from connexiongoogledrive import lire_contenu_fichier
+
+    texte = lire_contenu_fichier(file_id=f["id"], pdf_max_pages=PDF_PAGES_RESUME)
+    if texte.startswith(_ECHECS_LECTURE):
+        raise ErreurResume(texte.lstrip("❌⚠️ ").strip())
+    return resumer_texte(texte, f.get("name", ""), consigne, progression)
+
+# ====================== Plusieurs fichiers ======================
+def reduire(resumes: List[Dict[str, str]], consigne: Optional[str] = None) -> str:
+    """Fusionne les résumés [{name, resume}] en une réponse (un seul résumé : rendu tel quel)."""
+    if len(resumes) == 1:
+        return f"**{resumes[0]['name']}**\n\n{resumes[0]['resume']}"
+    corps = "\n\n".join(f"### {r['name']}\n{r['resume']}" for r in resumes)
+    if consigne:
+        corps = f"Consigne : {consigne}\n\n{corps}"
+    try:
+        return _llm(SYSTEM_REDUCTION, corps, "resume.reduction")
+    except ErreurResume:
+        return corps  # la réduction a échoué : les résumés individuels restent utiles
+
+def resumer_fichiers(
+    fichiers: List[Dict[str, Any]],
+    consigne: Optional[str] = None,
+    workers: int = WORKERS,
+    progression: Optional[Callable[[int, int, str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Résume chaque fichier ({id, name}) en parallèle puis réduit.
+    Retourne {texte, ok, echecs: [(nom, erreur)]} ; texte est None si aucun fichier n'a abouti.
+    """
+    resumes: Dict[str, str] = {}
+    echecs: List[tuple] = []
+    total = len(fichiers)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, total or 1)), thread_name_prefix="alfred-resume") as pool:
+        futs = {pool.submit(resumer_fichier, f, consigne): f for f in fichiers}
+        for i, fut in enumerate(as_completed(futs), 1):
+            f = futs[fut]
+            try:
+                resumes[f["id"]] = fut.result()
+            except Exception as e:
+                echecs.append((f.get("name", f["id"]), str(e)))
+            if progression:
+                progression(i, total, f.get("name", ""))
+
+    # Ordre d'origine (celui du listage), pas l'ordre d'achèvement
+    ordonnes = [{"name": f.get("name", ""), "resume": resumes[f["id"]]} for f in fichiers if f["id"] in resumes]
+    if progression and ordonnes:
+        progression(total, total, "synthèse")
+    texte = reduire(ordonnes, consigne) if ordonnes else None
+    return {"texte": texte, "ok": len(ordonnes), "echecs": echecs}
@@ -5,24 +5,33 @@
 # - Drive : confirmations destructives, suppression par NOM (alignée avec connexiongoogledrive.py).
 
 from __future__ import annotations
-import streamlit as st
+import os
+import datetime
 
 from interpreteur import analyser_prompt_drive
+from index_contenu import demarrer_indexation, etat_indexation, rechercher as rechercher_contenu
+from resumeur import resumer_fichier, resumer_fichiers, ErreurResume, MAX_FICHIERS as RESUME_MAX_FICHIERS
 from llm import repondre_simple as _llm_repondre_simple
 
 from connexiongoogledrive import (
-    lister_fichiers_dossier,
+    lister_page,
     creer_dossier,
+    creer_chemin_dossiers,
     supprimer_element,              # ⚠️ supprime PAR NOM (et parent_id optionnel)
-    lire_contenu_fichier,
+    supprimer_elements,             # plusieurs noms : un seul batch
+    lire_contenu_precharge,         # reprend le préchargement lancé pendant le choix
+    precharger,
+    chemin_dossier,
     rechercher_fichiers,
+    televerser_fichier,
+    ErreurTeleversement,
     trouver_id_dossier_recursif,
     FOLDER_ID,
 )
 
 # petit alias, au cas où on en ait besoin plus tard
 def _llm(prompt: str) -> str:
-    return _llm_repondre_simple(prompt, temperature=None)
+    return _llm_repondre_simple(prompt, temperature=None, site="router")
 
 # Helpers de réponse standardisées
 def _ok(msg: str)   -> dict: return {"content": msg, "subtype": "success"}
@@ -41,14 +50,72 @@ def _fmt_liste(items: list[dict], maxn: int = 100) -> str:
         out.append(f"{i}. {prefix} {name}")
     return "\n".join(out)
 
-def router(prompt: str) -> dict | None:
+def _page_listage(page: dict, etat) -> str:
+    """Mémorise le curseur en session et ajoute l'invite « suite » si le listage continue."""
+    etat["drive_listing_cursor"] = page.get("curseur")
+    texte = page.get("texte") or "_Fin du listage._"
+    if page.get("curseur"):
+        texte += "\n\n➡️ Dis **« suite »** pour la page suivante."
+    return texte
+
+def _proposer_choix(fichiers: list[dict], etat, entete: str = "") -> str:
+    """Mémorise un jeu de résultats numéroté en session, précharge les premiers et invite à choisir."""
+    etat["drive_resultats"] = [{k: f.get(k) for k in ("id", "name", "mimeType")} for f in fichiers]
+    precharger(fichiers)
+    lignes = []
+    for i, f in enumerate(fichiers, 1):
+        dossier = chemin_dossier(f["id"])
+        lignes.append(f"{i}. 📄 {f.get('name')}" + (f" — _{dossier}_" if dossier else ""))
+    texte = "\n".join(lignes)
+    if entete:
+        texte = f"{entete}\n{texte}"
+    return texte + "\n\n➡️ Dis **« choisis N »** pour ouvrir le fichier N."
+
+def _nom_exact(f: dict, nom: str) -> bool:
+    n, t = (f.get("name") or "").strip().lower(), (nom or "").strip().lower()
+    return n == t or os.path.splitext(n)[0] == t
+
+def _ouvrir(fichier: dict, etat) -> dict:
+    contenu = lire_contenu_precharge(fichier["id"])
+    if not contenu.startswith("❌"):
+        # Fichier courant : « résume-le » & co. repartent de là (extrait servi par le cache)
+        etat["dernier_fichier"] = {k: fichier.get(k) for k in ("id", "name", "mimeType")}
+    return _info(contenu)
+
+def _dernier_message_alfred(etat) -> str:
+    for m in reversed(etat.get("messages") or []):
+        if m.get("role") == "assistant" and (m.get("content") or "").strip():
+            return m["content"]
+    return ""
+
+def _transcription(messages: list[dict]):
+    """Conversation en Markdown, produite message par message (téléversée au fil de l'eau)."""
+    yield "# Conversation avec Alfred\n\n"
+    for m in messages:
+        qui = "Toi" if m.get("role") == "user" else "Alfred"
+        horodatage = f" _{m['ts']}_" if m.get("ts") else ""
+        yield f"**{qui}**{horodatage}\n\n{m.get('content') or ''}\n\n---\n\n"
+
+def _taille_lisible(octets) -> str:
+    o = int(octets or 0)
+    return f"{o / (1024 * 1024):.1f} Mo" if o >= 1024 * 1024 else f"{max(1, o // 1024)} Ko"
+
+def _session_streamlit():
+    """État de session par défaut (UI) ; import paresseux pour rester utilisable hors Streamlit."""
+    import streamlit as st
+    return st.session_state
+
+def router(prompt: str, etat=None) -> dict | None:
     """
     Retourne :
       - None quand aucune brique n’a pris en charge (=> fallback LLM dans alfred.py)
       - dict {content, subtype} quand une brique a répondu (Drive, etc.)
+    etat : mapping de session (st.session_state par défaut, ou moteur_alfred.SessionAlfred).
     """
     if not prompt or not isinstance(prompt, str):
         return None
+    if etat is None:
+        etat = _session_streamlit()
 
     # --- Interprétation Drive (brique) ---
     try:
@@ -66,8 +133,8 @@ def router(prompt: str) -> dict | None:
         return None
 
     # --------- CONFIRMATIONS / ANNULATIONS ---------
-    # On mémorise l'ordre destructif dans l'état; ce routeur utilise la session Streamlit.
-    pending = st.session_state.get("pending_drive")
+    # On mémorise l'ordre destructif dans l'état de session (Streamlit ou moteur headless).
+    pending = etat.get("pending_drive")
 
     if action == "confirmer":
         if not pending:
@@ -80,11 +147,16 @@ def router(prompt: str) -> dict | None:
 
                 # suppression PAR NOM (alignée avec connexiongoogledrive.supprimer_element)
                 nom = pending.get("nom") or ""
-                if not nom:
-                    st.session_state["pending_drive"] = None
+                noms = pending.get("noms") or []
+                if not nom and not noms:
+                    etat["pending_drive"] = None
                     return _err("Suppression impossible : nom de l’élément manquant.")
+                if len(noms) > 1:
+                    msg = supprimer_elements(noms, parent_id=parent_id)
+                    etat["pending_drive"] = None
+                    return _err(msg) if msg.startswith("0/") or msg.startswith("❌") else _ok(msg)
                 msg = supprimer_element(nom, parent_id=parent_id)
-                st.session_state["pending_drive"] = None
+                etat["pending_drive"] = None
                 # Les helpers Drive renvoient déjà un message prêt à afficher
                 # mais on garde un cadre "success" pour cohérence UI
                 if msg.strip().startswith("❌"):
@@ -93,15 +165,15 @@ def router(prompt: str) -> dict | None:
                     return _ok(msg)
                 return _ok(msg or "Élément supprimé.")
             except Exception as e:
-                st.session_state["pending_drive"] = None
+                etat["pending_drive"] = None
                 return _err(f"Erreur lors de la suppression : {e}")
         # autre ordre en attente non géré ici
-        st.session_state["pending_drive"] = None
+        etat["pending_drive"] = None
         return _warn("Rien à confirmer.")
 
     if action == "annuler":
         if pending:
-            st.session_state["pending_drive"] = None
+            etat["pending_drive"] = None
             return _info("Suppression annulée.")
         return _info("Aucune action en attente.")
 
@@ -116,46 +188,179 @@ def router(prompt: str) -> dict | None:
             return _warn("Précise le **nom** de l’élément.")
         return _warn("Ta demande est ambiguë. Donne : action + type + nom (+ parent si nécessaire).")
 
+    # --------- SUITE D’UN LISTAGE ---------
+    if action == "suite":
+        curseur = etat.get("drive_listing_cursor")
+        if not curseur:
+            return None  # « suite » hors listage : laisser le LLM répondre
+        try:
+            return _info(_page_listage(lister_page(curseur=curseur), etat))
+        except Exception as e:
+            etat["drive_listing_cursor"] = None
+            return _err(f"Erreur Drive : {e}")
+
     # --------- ACTIONS DRIVE RECONNUES ---------
     try:
         parent_name = intent.get("parent") or ""
         parent_id = trouver_id_dossier_recursif(parent_name) if parent_name else FOLDER_ID
 
-        # LISTER / AFFICHER
+        # LISTER / AFFICHER (une page ; la suite est gardée en session)
         if action in {"lister", "afficher"}:
-            listing = lister_fichiers_dossier(None, parent_id)
-            return _info(listing)
+            if parent_name and not parent_id:
+                return _warn(f"Le dossier « {parent_name} » est introuvable.")
+            profondeur = intent.get("profondeur")
+            page = lister_page(parent_id, **({"profondeur_max": int(profondeur)} if profondeur else {}))
+            return _info(_page_listage(page, etat))
 
         # RECHERCHER
         if action == "rechercher":
             terme = intent.get("nom") or intent.get("terme") or ""
             if not terme:
                 return _warn("Dis-moi ce que tu veux chercher.")
-            res = rechercher_fichiers(terme, parent_id=parent_id)
-            if not res:
-                res = rechercher_fichiers(terme)  # secours global
+            res = rechercher_fichiers(terme, parent_id=parent_id or FOLDER_ID)
             if not res:
                 return _info("Aucun élément trouvé.")
-            return _info(_fmt_liste(res))
+            return _info(_proposer_choix(res[:100], etat))
+
+        # RECHERCHER DANS LE CONTENU (index plein texte, alimenté en tâche de fond)
+        if action == "rechercher_contenu":
+            terme = intent.get("terme") or intent.get("nom") or ""
+            if not terme:
+                return _warn("Dis-moi de quoi doit parler le document.")
+            demarrer_indexation()
+            res = rechercher_contenu(terme, k=5, parent_id=parent_id if parent_name else None)
+            if not res:
+                ei = etat_indexation()
+                if ei["en_cours"] or not ei["derniere_passe"]:
+                    return _info(f"🔄 Indexation du contenu en cours ({ei['fichiers']} fichier(s) indexé(s)) : réessaie dans un instant.")
+                return _info(f"Aucun document ne parle de « {terme} ».")
+            etat["drive_resultats"] = [{"id": r["id"], "name": r["name"]} for r in res]
+            precharger(res)
+            lignes = [f"{i}. 📄 **{r['name']}**\n    {r['extrait']}" for i, r in enumerate(res, 1)]
+            return _info("\n".join(lignes) + "\n\n➡️ Dis **« choisis N »** pour ouvrir le fichier N.")
+
+        # CHOISIR DANS LES DERNIERS RÉSULTATS (« choisis 2 ») : pas de nouvelle recherche
+        if action == "lire_match":
+            resultats = etat.get("drive_resultats") or []
+            if not resultats:
+                return None  # aucun choix en cours : laisser le LLM répondre
+            try:
+                index = int(intent.get("index"))
+            except (TypeError, ValueError):
+                return _warn("Donne le numéro du fichier à ouvrir.")
+            if not 1 <= index <= len(resultats):
+                return _warn(f"Choisis un numéro entre 1 et {len(resultats)}.")
+            return _ouvrir(resultats[index - 1], etat)
 
         # LIRE / OUVRIR
         if action in {"lire", "ouvrir"}:
             nom = intent.get("nom") or ""
             if not nom:
                 return _warn("Précise le nom du fichier à lire.")
-            candidats = rechercher_fichiers(nom, parent_id=parent_id) or rechercher_fichiers(nom)
+            candidats = rechercher_fichiers(nom, parent_id=parent_id or FOLDER_ID, limite=5)
             if not candidats:
                 return _info("Je n’ai trouvé aucun fichier correspondant.")
-            file_id = candidats[0]["id"]
-            contenu = lire_contenu_fichier(file_id)
-            return _info(contenu)
+            # Un seul nom exact (ou un seul candidat) : ouverture directe ; sinon on fait choisir
+            exacts = [c for c in candidats if _nom_exact(c, nom)]
+            if len(exacts) == 1 or len(candidats) == 1:
+                return _ouvrir((exacts or candidats)[0], etat)
+            choix = exacts or candidats
+            return _info(_proposer_choix(choix, etat, f"Plusieurs fichiers correspondent à « {nom} » :"))
+
+        # RÉSUMER UN FICHIER (nommé, ou le dernier lu) : découpage + map-reduce, sans troncature
+        if action == "resumer":
+            nom = intent.get("nom") or ""
+            if nom:
+                candidats = rechercher_fichiers(nom, extension=intent.get("extension"), parent_id=parent_id or FOLDER_ID, limite=5)
+                if not candidats:
+                    return _info("Je n’ai trouvé aucun fichier correspondant.")
+                fichier = {k: candidats[0].get(k) for k in ("id", "name", "mimeType")}
+            else:
+                fichier = etat.get("dernier_fichier")
+                if not fichier:
+                    return None  # « résume » sans fichier ouvert : laisser le LLM répondre (ex. la conversation)
+            afficher = etat.get("progression")
+            progression = (lambda i, n, _nom: afficher(f"🧩 Résumé : partie {i}/{n}")) if callable(afficher) else None
+            try:
+                texte = resumer_fichier(fichier, progression=progression)
+            except ErreurResume as e:
+                return _err(f"❌ Résumé impossible : {e}")
+            etat["dernier_fichier"] = fichier
+            return _info(f"📝 Résumé de **{fichier.get('name')}**\n\n{texte}")
+
+        # RÉSUMER UN DOSSIER (fichiers lus et résumés en parallèle, puis synthèse)
+        if action == "resumer_dossier":
+            if parent_name and not parent_id:
+                return _warn(f"Le dossier « {parent_name} » est introuvable.")
+            ext = intent.get("extension")
+            fichiers = rechercher_fichiers(None, extension=ext, parent_id=parent_id or FOLDER_ID)
+            if not fichiers:
+                quoi = f"fichier {ext.upper()}" if ext else "fichier"
+                return _info(f"Aucun {quoi} à résumer dans « {parent_name or 'Drive'} ».")
+            note = ""
+            if len(fichiers) > RESUME_MAX_FICHIERS:
+                note = f"\n\n_Seuls les {RESUME_MAX_FICHIERS} fichiers les plus récents (sur {len(fichiers)}) ont été résumés._"
+                fichiers = fichiers[:RESUME_MAX_FICHIERS]
+            afficher = etat.get("progression")
+            progression = (lambda i, n, nom: afficher(f"📚 Résumés : {i}/{n} — {nom}")) if callable(afficher) else None
+            res = resumer_fichiers(fichiers, progression=progression)
+            echecs = "".join(f"\n- {nom} : {e}" for nom, e in res["echecs"])
+            if not res["texte"]:
+                return _err(f"❌ Aucun fichier n’a pu être résumé :{echecs}")
+            texte = f"📚 Synthèse de {res['ok']} fichier(s) de « {parent_name or 'Drive'} »\n\n{res['texte']}{note}"
+            if echecs:
+                texte += f"\n\n⚠️ Non résumés :{echecs}"
+            return _info(texte)
+
+        # ENREGISTRER SUR DRIVE (dernière réponse, conversation ou pièce jointe) : upload résumable
+        if action == "enregistrer":
+            if parent_name and not parent_id:
+                return _warn(f"Le dossier « {parent_name} » est introuvable.")
+            quoi = intent.get("quoi") or "dernier"
+            horodatage = datetime.datetime.now().strftime("%Y-%m-%d %Hh%M")
+            nom = intent.get("nom")
+            taille, mime = None, None
+            if quoi == "piece_jointe":
+                piece = etat.get("piece_jointe")
+                if piece is None:
+                    return _warn("Joins d’abord le fichier à enregistrer.")
+                piece.seek(0)
+                source, nom = piece, nom or getattr(piece, "name", None) or f"Pièce jointe {horodatage}"
+                taille, mime = getattr(piece, "size", None), getattr(piece, "type", None) or None
+            elif quoi == "conversation":
+                messages = [m for m in (etat.get("messages") or []) if m.get("role") in ("user", "assistant")]
+                if not messages:
+                    return _warn("La conversation est vide pour l’instant.")
+                source = (bloc.encode("utf-8") for bloc in _transcription(messages))
+                nom = nom or f"Conversation Alfred {horodatage}.md"
+            else:
+                texte = _dernier_message_alfred(etat)
+                if not texte:
+                    return _warn("Je n’ai encore rien produit à enregistrer.")
+                source = texte.encode("utf-8")
+                nom = nom or f"Alfred {horodatage}.md"
+            if not os.path.splitext(nom)[1] and quoi != "piece_jointe":
+                nom += ".md"
+            if (mime is None) and nom.lower().endswith(".md"):
+                mime = "text/markdown"
+            afficher = etat.get("progression")
+            progression = (lambda o, t: afficher(f"⬆️ Envoi : {_taille_lisible(o)}" + (f" / {_taille_lisible(t)}" if t else ""))) if callable(afficher) else None
+            try:
+                cree = televerser_fichier(source, nom, parent_id=parent_id or FOLDER_ID, mime_type=mime, taille=taille, progression=progression)
+            except ErreurTeleversement as e:
+                return _err(f"❌ Enregistrement impossible : {e}")
+            return _ok(f"✅ « {cree.get('name', nom)} » enregistré dans « {parent_name or 'Drive'} ».")
 
         # CRÉER DOSSIER
         if action in {"creer_dossier", "créer_dossier", "creer", "créer"}:
             nom = intent.get("nom") or ""
             if not nom:
                 return _warn("Donne le nom du dossier à créer.")
-            msg = creer_dossier(nom, parent_id=parent_id)
+            if "/" in nom.strip("/"):
+                # « A/B/C » : dossiers manquants créés en un seul batch
+                msg = creer_chemin_dossiers(nom, parent_id=parent_id or FOLDER_ID)
+            else:
+                msg = creer_dossier(nom, parent_id=parent_id)
             # la brique Drive renvoie déjà un message prêt à afficher
             if msg.strip().startswith("❌"):
                 return _err(msg)
@@ -167,13 +372,21 @@ def router(prompt: str) -> dict | None:
             nom = intent.get("nom") or ""
             if not typ or not nom:
                 return _warn("Pour supprimer : précise **type** (fichier/dossier) et **nom**.")
-            st.session_state["pending_drive"] = {
+            noms = intent.get("noms") or [nom]   # énumération découpée par la grammaire locale seulement
+            etat["pending_drive"] = {
                 "action": "supprimer",
                 "type": typ,
                 "nom": nom,
+                "noms": noms if len(noms) > 1 else [],
                 "parent": parent_name or "",
             }
             where = f" dans « {parent_name} »" if parent_name else ""
+            if len(noms) > 1:
+                liste = "\n".join(f"- « {n} »" for n in noms)
+                return _warn(
+                    f"⚠️ Tu me demandes de **supprimer** ces {len(noms)} éléments{where} sur Drive :\n{liste}\n"
+                    f"Confirme avec **« confirme »** ou annule avec **« annule »**."
+                )
             return _warn(
                 f"⚠️ Tu me demandes de **supprimer** le **{typ}** « {nom} »{where} sur Drive.\n"
                 f"Confirme avec **« confirme »** ou annule avec **« annule »**."
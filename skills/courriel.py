@@ -0,0 +1,12 @@
+# skills/courriel.py — Adaptateur "email" pour le dispatcher (skills/registry.py)
+# La brique gestionemails (Streamlit + Gmail + Drive) n'est importée qu'au premier email.
+
+def executer(prompt: str, etat=None):
+    """Prépare le brouillon (contexte email en session) ; l'UI persistante (ou le moteur) prend le relais."""
+    from gestionemails import is_email_intent, maybe_bootstrap_email
+
+    if not is_email_intent(prompt):
+        return None
+    maybe_bootstrap_email(prompt, etat)
+    ctx = etat.get("email_ctx") if etat is not None else None
+    return {"_type": "email_bootstrap", "content": "", "subtype": None, "email_ctx": ctx}
@@ -0,0 +1,7 @@
+# skills/drive.py — Adaptateur "Drive" pour le dispatcher (skills/registry.py)
+# router/connexiongoogledrive ne sont importés qu'au premier prompt candidat.
+
+def executer(prompt: str, etat=None):
+    """Délègue au routeur Drive (None si aucune action Drive reconnue)."""
+    from router import router
+    return router(prompt, etat)
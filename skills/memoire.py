@@ -0,0 +1,76 @@
+# skills/memoire.py — Adaptateur "mémoire" pour le dispatcher (skills/registry.py)
+# Normalise les retours multi-formes de try_handle_memory_command en dict {content, subtype}.
+
+import re
+
+def preprocess_delete_command(raw: str):
+    """Réécrit « supprime le souvenir que ... » en « supprime souvenir ... » (None si non concerné)."""
+    if not raw:
+        return None
+    s = raw.strip()
+    low = s.lower()
+    if low.startswith(("supprime", "oublie", "efface")):
+        mentions_memory = any(k in low for k in ["souvenir", "souvenirs", "mémoire", "memoire"])
+        verb = low.split()[0]
+        cleaned = re.sub(r"\b(le|la|les|un|une)\s+souvenir(s)?\b", "souvenir", low)
+        cleaned = re.sub(r"\b(le|la|les|un|une)\s+mémoire\b", "mémoire", cleaned)
+        if ("souvenir" not in cleaned) and mentions_memory:
+            parts = s.split(" ", 1)
+            payload = parts[1] if len(parts) > 1 else ""
+            cleaned = f"{verb} souvenir {payload}".strip()
+        if not any(k in cleaned for k in ["souvenir", "mémoire", "memoire"]):
+            return None
+        cleaned = re.sub(r"\b(souvenir|mémoire|memoire)\s+(que|qui|de|du|des)\s+", r"\1 ", cleaned)
+        cleaned = re.sub(r"\s{2,}", " ", cleaned).strip()
+        return cleaned
+    return None
+
+def render_mem_list(items):
+    if not items:
+        return "_Aucun souvenir._"
+    lines = []
+    for it in items:
+        if isinstance(it, dict):
+            d = it.get("date") or ""
+            txt = it.get("texte") or ""
+            lines.append(f"- **[{d}]** {txt}" if d else f"- {txt}")
+        else:
+            lines.append(f"- {str(it)}")
+    return "\n".join(lines)
+
+def _confirm_payload(payload: dict) -> dict:
+    txt_preview = payload.get("item", {}).get("texte", "") or payload.get("texte", "")
+    return {
+        "_type": "confirm_delete",
+        "payload": payload,
+        "content": f"⚠️ Tu me demandes d’effacer ce souvenir : “{txt_preview}”.",
+        "subtype": "warning",
+    }
+
+def executer(prompt: str, etat=None):
+    """Exécuteur manifest : None si la brique mémoire ne prend pas la commande."""
+    from memoire_alfred import try_handle_memory_command
+
+    pre = preprocess_delete_command(prompt)
+    prompt_for_memory = pre if (pre and pre != prompt) else prompt
+
+    result = try_handle_memory_command(prompt_for_memory)
+    handled = False; mem_resp = None; mem_subtype = None; pending_payload = None
+    if isinstance(result, tuple):
+        if   len(result) == 4: handled, mem_resp, mem_subtype, pending_payload = result
+        elif len(result) == 3: handled, mem_resp, mem_subtype = result
+        elif len(result) == 2: handled, mem_resp = result
+    if not handled:
+        return None
+
+    if isinstance(mem_resp, dict) and mem_resp.get("_type") == "confirm_delete":
+        return _confirm_payload(mem_resp)
+    if pending_payload:
+        return _confirm_payload(pending_payload)
+
+    if isinstance(mem_resp, list):
+        mem_resp = render_mem_list(mem_resp)
+    elif isinstance(mem_resp, dict):
+        # ex. liste des règles : {mot-clé: {domaine, categorie}}
+        mem_resp = "\n".join(f"- « {k} » -> {v}" for k, v in mem_resp.items()) or "_Aucune règle._"
+    return {"content": mem_resp, "subtype": mem_subtype or "info"}
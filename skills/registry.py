@@ -1,7 +1,9 @@
 import os
+import re
 import json
 import importlib
 from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 # --- Localisation automatique du manifest ---
 _MANIFEST_PATH = os.path.join(os.path.dirname(__file__), "manifest.json")
@@ -26,15 +28,78 @@ def _intent_map():
             }
     return m
 
+@lru_cache(maxsize=None)
+def _import_callable(path: str):
+    """Import paresseux 'module.fonction' (le module n'est chargé qu'au premier besoin)."""
+    module_name, func_name = path.rsplit(".", 1)
+    mod = importlib.import_module(module_name)
+    return getattr(mod, func_name)
+
 def get_executor(intent: str):
     """Retourne (fonction_exécuteur, ui_bool) ou None."""
     info = _intent_map().get(intent)
     if not info:
         return None
-    module_name, func_name = info["executor"].rsplit(".", 1)
-    mod = importlib.import_module(module_name)
-    return getattr(mod, func_name), info["ui"]
+    return _import_callable(info["executor"]), info["ui"]
 
 def known_intents():
     """Liste tous les intents connus."""
     return list(_intent_map().keys())
+
+# ======================================================
+# 🔎 Index des déclencheurs (une seule passe regex)
+# ======================================================
+
+@lru_cache(maxsize=1)
+def _skills_by_name() -> Dict[str, Dict[str, Any]]:
+    return {s["name"]: s for s in _load_manifest()}
+
+@lru_cache(maxsize=1)
+def _trigger_index():
+    """
+    Compile tous les déclencheurs du manifest en UNE regex (plus longs d'abord)
+    + table déclencheur -> noms de briques.
+    """
+    owners: Dict[str, set] = {}
+    for skill in _load_manifest():
+        for trig in skill.get("triggers", []):
+            t = (trig or "").strip().lower()
+            if t:
+                owners.setdefault(t, set()).add(skill["name"])
+    if not owners:
+        return None, owners
+    alternation = "|".join(re.escape(t) for t in sorted(owners, key=len, reverse=True))
+    return re.compile(alternation), owners
+
+def triggers(name: str) -> List[str]:
+    """Déclencheurs d'une brique, tels que déclarés dans le manifest (source unique)."""
+    skill = _skills_by_name().get(name) or {}
+    return [t.lower() for t in skill.get("triggers", [])]
+
+def candidate_skills(prompt: str) -> List[str]:
+    """
+    Briques candidates pour un prompt, triées par priorité du manifest :
+    celles dont un déclencheur apparaît + celles marquées "always".
+    """
+    low = (prompt or "").lower()
+    rx, owners = _trigger_index()
+    hits = set()
+    if rx is not None:
+        for m in rx.finditer(low):
+            hits.update(owners.get(m.group(0), ()))
+    skills = _skills_by_name()
+    names = [n for n, s in skills.items() if n in hits or s.get("always")]
+    return sorted(names, key=lambda n: skills[n].get("priority", 100))
+
+def dispatch(prompt: str, etat=None) -> Optional[Dict[str, Any]]:
+    """
+    Passe le prompt aux briques candidates, dans l'ordre, jusqu'à ce qu'une le prenne.
+    Retourne None (=> réponse LLM) ou le dict de la brique, complété par "skill".
+    """
+    for name in candidate_skills(prompt):
+        executor = _import_callable(_skills_by_name()[name]["executor"])
+        result = executor(prompt, etat)
+        if result is not None:
+            result.setdefault("skill", name)
+            return result
+    return None